@@ -3,7 +3,7 @@
 import React, { useEffect, useRef, useState } from "react";
 import Link from "next/link";
 import { getJobById } from "@/lib/actions/jobs";
-import type { Job } from "@/types/database";
+import type { Job, JobProgressReport } from "@/types/database";
 import { Card, CardContent, CardHeader, CardTitle } from "@/components/ui/card";
 import { Button } from "@/components/ui/button";
 
@@ -24,6 +24,14 @@ const statusStep = (status: Job["status"]) => {
   }
 };
 
+const progressOf = (job: Job | null): JobProgressReport | null => {
+  const p = job?.progress as JobProgressReport | null | undefined;
+  return p && typeof p === "object" && typeof p.done === "number" ? p : null;
+};
+
+const progressLabel = (p: JobProgressReport) =>
+  `${p.stage} ${p.done.toLocaleString()}${p.total != null ? `/${p.total.toLocaleString()}` : ""}${p.message ? ` — ${p.message}` : ""}`;
+
 export function JobProgress({
   jobId,
   actionLabel,
@@ -72,6 +80,8 @@ export function JobProgress({
   const { step, label } = job ? statusStep(job.status) : { step: 0, label: "Loading…" };
   const logText = job?.log ?? "";
   const errText = job?.error ?? "";
+  const progress = job?.status === "running" ? progressOf(job) : null;
+  const percent = progress?.total ? Math.min(100, Math.round((progress.done / progress.total) * 100)) : null;
 
   return (
     <Card className="border-primary/20 bg-muted/30 dark:bg-muted/20">
@@ -89,10 +99,18 @@ export function JobProgress({
             <StepDot active={step >= 3} done={step >= 3 && job?.status === "success"} failed={job?.status === "failed"} label={terminal ? (job?.status === "success" ? "Done" : "Failed") : "Done"} />
           </div>
           <span className="text-muted-foreground text-sm">{label}</span>
+          {progress && (
+            <span className="text-muted-foreground text-sm tabular-nums">
+              {progressLabel(progress)}
+              {percent != null && ` (${percent}%)`}
+            </span>
+          )}
         </div>
         {/* Progress bar */}
         <div className="h-1.5 w-full overflow-hidden rounded-full bg-muted">
-          {!terminal ? (
+          {!terminal && percent != null ? (
+            <div className="h-full rounded-full bg-primary/70 transition-[width]" style={{ width: `${percent}%` }} />
+          ) : !terminal ? (
             <div className="h-full w-[40%] animate-pulse rounded-full bg-primary/70" />
           ) : (
             <div
@@ -124,7 +142,7 @@ export function JobProgress({
             <div ref={logEndRef} />
           </div>
         ) : (
-          !terminal && <p className="text-muted-foreground text-sm">Waiting for worker… Log will appear when the job runs.</p>
+          !terminal && <p className="text-muted-foreground text-sm">Waiting for worker… The log streams in here while the job runs.</p>
         )}
         {error && <p className="text-destructive text-sm">{error}</p>}
         {terminal && (
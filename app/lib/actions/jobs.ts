@@ -34,6 +34,9 @@ export type JobAction =
   | "send_warm_lead_message"
   | "send_single_sms";
 
+// Actions that send from a Twilio number; they run one at a time per number (jobs.lane)
+const SEND_ACTIONS: JobAction[] = ["send_campaign", "send_warm_lead_message"];
+
 export async function createJob(
   action: JobAction,
   payload: Record<string, unknown> = {}
@@ -42,6 +45,11 @@ export async function createJob(
   if (!supabase) {
     return { ok: false, error: "Supabase not configured. Set env vars." };
   }
+  // Resolve the sending number now, so the job's lane (set on insert) is the same for every worker
+  const from = process.env.TWILIO_FROM;
+  if (SEND_ACTIONS.includes(action) && from && !payload.from_number) {
+    payload = { ...payload, from_number: from };
+  }
   const insert: JobInsert = {
     action,
     payload: payload as Json,
@@ -9,6 +9,7 @@ import type {
   ListMetadata,
   ListPreview,
   SmsCellListRow,
+  SmsSend,
 } from "@/types/database";
 
 const PAGE_SIZE = 50;
@@ -68,6 +69,47 @@ export async function getWarmLeadCounts(): Promise<{ today: number; thisWeek: nu
   };
 }
 
+export async function getSmsSends(
+  page = 0,
+  campaignId?: string
+): Promise<{ rows: SmsSend[]; total: number }> {
+  const supabase = getSupabase();
+  if (!supabase) return { rows: [], total: 0 };
+  const from = page * PAGE_SIZE;
+  const to = from + PAGE_SIZE - 1;
+  let countQuery = supabase.from("sms_sends").select("id", { count: "exact", head: true });
+  let dataQuery = supabase.from("sms_sends").select("*").order("updated_at", { ascending: false }).range(from, to);
+  if (campaignId) {
+    countQuery = countQuery.eq("campaign_id", campaignId);
+    dataQuery = dataQuery.eq("campaign_id", campaignId);
+  }
+  const [countRes, dataRes] = await Promise.all([countQuery, dataQuery]);
+  const total = countRes.count ?? 0;
+  const rows = (dataRes.data ?? []) as SmsSend[];
+  return { rows, total };
+}
+
+/** Statuses that count as sent (sms_send_counts() in schema.sql, the ledger's COUNTED_STATUSES). */
+const COUNTED_SEND_STATUSES = ["queued", "sent", "delivered", "undelivered"];
+
+/** Messages queued or sent in the rolling last 24h (what the daily cap counts: sends_last_24h() in schema.sql). */
+export async function getSendCountLast24h(): Promise<number> {
+  const supabase = getSupabase();
+  if (!supabase) return 0;
+  const { data, error } = await (supabase as unknown as {
+    rpc: (fn: string) => Promise<{ data: number | null; error: { message: string } | null }>;
+  }).rpc("sends_last_24h");
+  if (!error) return data ?? 0;
+  // Schema without sends_last_24h(): same count over the table
+  const since = new Date(Date.now() - 24 * 60 * 60 * 1000).toISOString();
+  const { count } = await supabase
+    .from("sms_sends")
+    .select("id", { count: "exact", head: true })
+    .gte("queued_at", since)
+    .in("status", COUNTED_SEND_STATUSES);
+  return count ?? 0;
+}
+
 export async function getOptOuts(page = 0): Promise<{ rows: OptOut[]; total: number }> {
   const supabase = getSupabase();
   if (!supabase) return { rows: [], total: 0 };
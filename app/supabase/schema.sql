@@ -29,6 +29,135 @@ create table if not exists jobs (
 
 create index if not exists jobs_status_created on jobs (status, created_at desc);
 
+-- Worker leases (several workers can share the queue): the claiming worker renews
+-- lease_expires_at by heartbeat; requeue_expired_jobs() puts jobs of dead workers back to pending
+alter table jobs add column if not exists worker_id text;
+alter table jobs add column if not exists lease_expires_at timestamptz;
+alter table jobs add column if not exists heartbeat_at timestamptz;
+alter table jobs add column if not exists attempts integer not null default 0;
+-- Latest progress report of a running job (scripts/job_progress.py): {stage, done, total, message, updated_at}
+alter table jobs add column if not exists progress jsonb;
+create index if not exists jobs_pending_created on jobs (created_at) where status = 'pending';
+create index if not exists jobs_running_lease on jobs (lease_expires_at) where status = 'running';
+
+-- Wake listening workers (scripts/job_wakeup.py): a job was queued or requeued, or a running job
+-- ended and freed its lane
+create or replace function notify_jobs_pending() returns trigger language plpgsql as $$
+begin
+  perform pg_notify('jobs_pending', new.action);
+  return null;
+end;
+$$;
+
+drop trigger if exists jobs_notify_insert on jobs;
+create trigger jobs_notify_insert after insert on jobs
+  for each row when (new.status = 'pending') execute function notify_jobs_pending();
+
+drop trigger if exists jobs_notify_update on jobs;
+create trigger jobs_notify_update after update of status on jobs
+  for each row when (new.status is distinct from old.status and (new.status = 'pending' or old.status = 'running'))
+  execute function notify_jobs_pending();
+
+-- Concurrency lane of a job: sends get one lane per sending number, other jobs one per action
+create or replace function job_lane(p_action text, p_payload jsonb, p_default_from text default '')
+returns text language sql immutable as $$
+  select case when p_action in ('send_campaign', 'send_warm_lead_message')
+    then 'send:' || coalesce(nullif(p_payload->>'from_number', ''), p_default_from)
+    else p_action end;
+$$;
+
+-- Lane of a job, resolved once when it is inserted, so every worker sees the same lane for it
+-- (a send without payload.from_number is in lane 'send:', the default number, for all workers;
+-- the app stamps its TWILIO_FROM into the payload when it has one)
+alter table jobs add column if not exists lane text;
+update jobs set lane = job_lane(action, payload) where lane is null;
+
+create or replace function set_job_lane() returns trigger language plpgsql as $$
+begin
+  new.lane := coalesce(new.lane, job_lane(new.action, new.payload));
+  return new;
+end;
+$$;
+
+drop trigger if exists jobs_set_lane on jobs;
+create trigger jobs_set_lane before insert on jobs for each row execute function set_job_lane();
+
+-- One running send per sending number, enforced in the data: two workers that claim different
+-- pending jobs of one send lane at the same moment can't both start (the second gets a
+-- unique violation, which claim_job turns into "nothing to claim")
+create unique index if not exists jobs_running_send_lane on jobs (lane)
+  where status = 'running' and lane like 'send:%';
+
+-- Atomically claim the oldest pending job this worker may run; returns the claimed row (or none).
+-- p_actions: actions this worker runs (null = all); p_exclude_actions: actions that would conflict
+-- with its running jobs; p_blocked_lanes: lanes it has no room in.
+-- A send lane is also blocked while any worker is running a job in it (one sender per number).
+-- p_default_from is no longer used (lanes are stored on the job); kept so older workers match.
+create or replace function claim_job(
+  p_worker_id text,
+  p_lease_seconds integer default 120,
+  p_actions text[] default null,
+  p_exclude_actions text[] default '{}',
+  p_blocked_lanes text[] default '{}',
+  p_default_from text default ''
+) returns setof jobs language plpgsql as $$
+begin
+  return query
+  update jobs j set
+    status = 'running',
+    started_at = now(),
+    worker_id = p_worker_id,
+    lease_expires_at = now() + make_interval(secs => p_lease_seconds),
+    heartbeat_at = now(),
+    progress = null,
+    attempts = j.attempts + 1
+  where j.id = (
+    select c.id from jobs c
+    where c.status = 'pending'
+      and (p_actions is null or c.action = any(p_actions))
+      and c.action <> all(p_exclude_actions)
+      and c.lane <> all(p_blocked_lanes)
+      and not (c.lane like 'send:%' and exists (
+        select 1 from jobs r where r.status = 'running' and r.lane = c.lane))
+    order by c.created_at
+    for update skip locked
+    limit 1
+  )
+  returning j.*;
+exception when unique_violation then
+  return;  -- another worker started a send in this lane at the same moment; poll again
+end;
+$$;
+
+-- Renew the leases this worker still holds; returns their ids (a missing id was reaped: stop it)
+create or replace function heartbeat_jobs(p_worker_id text, p_job_ids uuid[], p_lease_seconds integer default 120)
+returns setof uuid language sql as $$
+  update jobs set lease_expires_at = now() + make_interval(secs => p_lease_seconds), heartbeat_at = now()
+  where id = any(p_job_ids) and worker_id = p_worker_id and status = 'running'
+  returning id;
+$$;
+
+-- Requeue running jobs whose lease expired (run_cbc resumes from its journal); fail them after
+-- p_max_attempts claims. Workers call this periodically; or schedule it with pg_cron.
+create or replace function requeue_expired_jobs(p_max_attempts integer default 3)
+returns setof jobs language sql as $$
+  update jobs j set
+    status = case when j.attempts >= p_max_attempts then 'failed' else 'pending' end,
+    finished_at = case when j.attempts >= p_max_attempts then now() end,
+    error = case when j.attempts >= p_max_attempts
+      then 'Worker lease expired ' || j.attempts || ' times (worker ' || coalesce(j.worker_id, '?') || ')' end,
+    log = 'Requeued: lease of worker ' || coalesce(j.worker_id, '?') || ' expired at ' || j.lease_expires_at,
+    payload = case when j.action = 'run_cbc' then coalesce(j.payload, '{}') || '{"resume": true}' else j.payload end,
+    started_at = case when j.attempts >= p_max_attempts then j.started_at end,
+    worker_id = null,
+    lease_expires_at = null
+  where j.id in (
+    select id from jobs where status = 'running' and lease_expires_at < now()
+    for update skip locked
+  )
+  returning j.*;
+$$;
+
 -- Optional: opt_outs and warm_leads (mirror CSV; inbound webhook or worker can write here)
 create table if not exists opt_outs (
   id uuid primary key default gen_random_uuid(),
@@ -89,7 +218,7 @@ create table if not exists list_preview (
   updated_at timestamptz default now()
 );
 
--- Full SMS list rows (worker replaces on each Build SMS list; UI reads from here)
+-- Full SMS list rows (worker syncs the changes after each Build SMS list; UI reads from here)
 create table if not exists sms_cell_list_rows (
   id uuid primary key default gen_random_uuid(),
   phone_number text not null,
@@ -101,7 +230,156 @@ create table if not exists sms_cell_list_rows (
   created_at timestamptz default now()
 );
 
-create index if not exists sms_cell_list_rows_phone on sms_cell_list_rows (phone_number);
+-- Incremental sync (scripts/list_sync.py): one row per phone with a content hash, so a rebuild
+-- only sends new, changed and removed rows
+alter table sms_cell_list_rows add column if not exists row_hash text;
+alter table sms_cell_list_rows add column if not exists updated_at timestamptz default now();
+delete from sms_cell_list_rows a using sms_cell_list_rows b
+  where a.phone_number = b.phone_number and a.ctid > b.ctid;
+drop index if exists sms_cell_list_rows_phone;
+create unique index if not exists sms_cell_list_rows_phone_key on sms_cell_list_rows (phone_number);
+alter table list_metadata add column if not exists content_hash text;
+
+-- Changes of one sync, staged in batches; readers never see them until apply_sms_cell_list_sync
+create table if not exists sms_cell_list_stage (
+  sync_id uuid not null,
+  op text not null check (op in ('upsert', 'delete')),
+  phone_number text not null,
+  full_name text,
+  address text,
+  source_address text,
+  lead_type text,
+  resident_type text,
+  row_hash text,
+  created_at timestamptz default now()
+);
+create index if not exists sms_cell_list_stage_sync on sms_cell_list_stage (sync_id);
+
+-- Apply a staged sync, list_metadata and list_preview in one transaction; returns the list's new
+-- content hash (md5 over phone:row_hash in phone order), which the worker checks next time
+create or replace function apply_sms_cell_list_sync(
+  p_sync_id uuid,
+  p_job_id uuid default null,
+  p_row_count integer default null,
+  p_preview jsonb default '[]'
+) returns text language plpgsql as $$
+declare
+  v_hash text;
+begin
+  delete from sms_cell_list_rows r using sms_cell_list_stage s
+    where s.sync_id = p_sync_id and s.op = 'delete' and r.phone_number = s.phone_number;
+  insert into sms_cell_list_rows (phone_number, full_name, address, source_address, lead_type, resident_type, row_hash, updated_at)
+    select phone_number, full_name, address, source_address, lead_type, resident_type, row_hash, now()
+    from sms_cell_list_stage where sync_id = p_sync_id and op = 'upsert'
+  on conflict (phone_number) do update set
+    full_name = excluded.full_name,
+    address = excluded.address,
+    source_address = excluded.source_address,
+    lead_type = excluded.lead_type,
+    resident_type = excluded.resident_type,
+    row_hash = excluded.row_hash,
+    updated_at = now();
+  -- This sync's batches, and any left behind by a sync that died before applying
+  delete from sms_cell_list_stage where sync_id = p_sync_id or created_at < now() - interval '1 day';
+
+  select md5(coalesce(string_agg(phone_number || ':' || coalesce(row_hash, ''), ',' order by phone_number collate "C"), ''))
+    into v_hash from sms_cell_list_rows;
+  insert into list_metadata (id, name, list_type, source, source_identifier, row_count, last_updated_at, updated_by_job_id, content_hash)
+  values ('sms_cell_list', 'SMS campaign list', 'sms_cell', 'table', 'sms_cell_list_rows',
+          coalesce(p_row_count, (select count(*) from sms_cell_list_rows)), now(), p_job_id, v_hash)
+  on conflict (id) do update set
+    row_count = excluded.row_count,
+    last_updated_at = excluded.last_updated_at,
+    updated_by_job_id = excluded.updated_by_job_id,
+    content_hash = excluded.content_hash;
+  insert into list_preview (list_id, rows, updated_at) values ('sms_cell_list', p_preview, now())
+  on conflict (list_id) do update set rows = excluded.rows, updated_at = excluded.updated_at;
+  return v_hash;
+end;
+$$;
+
+-- Send ledger: one row per (campaign, phone), mirrored from the worker's send_ledger.sqlite3
+-- (send_campaign --sync-ledger). Re-runs skip phones already queued/sent for the campaign.
+create table if not exists sms_sends (
+  id uuid primary key default gen_random_uuid(),
+  campaign_id text not null,
+  phone_number text not null,
+  from_number text,
+  status text not null default 'queued' check (status in ('queued', 'sent', 'failed', 'delivered', 'undelivered')),
+  sid text,
+  error_code integer,
+  error text,
+  attempts integer default 0,
+  queued_at timestamptz default now(),
+  updated_at timestamptz default now(),
+  unique (campaign_id, phone_number)
+);
+
+create index if not exists sms_sends_queued_at on sms_sends (queued_at desc);
+create index if not exists sms_sends_campaign_status on sms_sends (campaign_id, status);
+create index if not exists sms_sends_sid on sms_sends (sid);
+
+-- Campaign audience in the database (scripts/audience.py, send_campaign --from-db).
+-- phone_key() is scripts/phone_utils.phone_key: last 10 digits of a valid NANP number as bigint,
+-- null when invalid. The expression indexes make each exclusion below an index probe.
+create or replace function phone_key(p text) returns bigint language sql immutable parallel safe as $$
+  select case when d ~ '^[2-9][0-9]{2}[2-9][0-9]{6}$' and substr(d, 2, 2) <> '11' and substr(d, 5, 2) <> '11'
+              then d::bigint end
+  from (select right(regexp_replace(coalesce(p, ''), '[^0-9]', '', 'g'), 10) as d) digits;
+$$;
+
+create index if not exists opt_outs_phone_norm on opt_outs (phone_key(phone_number));
+create index if not exists warm_leads_phone_norm on warm_leads (phone_key(phone_number));
+create index if not exists sms_cell_list_rows_phone_norm on sms_cell_list_rows (phone_key(phone_number));
+create index if not exists sms_sends_campaign_phone_norm on sms_sends (campaign_id, phone_key(phone_number));
+create index if not exists sms_sends_from_queued on sms_sends (from_number, queued_at);
+
+-- One definition of "this send happened", shared with the local ledger (scripts/send_ledger.py
+-- DONE_STATUSES / COUNTED_STATUSES) and the dashboard: every status but failed. A queued row
+-- without a sid counts too: its request may have reached Twilio (run died mid-request, or the
+-- request timed out), so it is neither resent nor left out of the daily cap.
+create or replace function sms_send_counts(p_status text) returns boolean language sql immutable parallel safe as $$
+  select p_status in ('queued', 'sent', 'delivered', 'undelivered');
+$$;
+
+-- Sends in the rolling last 24h that count against the daily cap, for one sending number or all
+create or replace function sends_last_24h(p_from_number text default null) returns integer language sql stable as $$
+  select count(*)::integer from sms_sends s
+  where s.queued_at >= now() - interval '24 hours'
+    and sms_send_counts(s.status)
+    and (p_from_number is null or s.from_number = p_from_number);
+$$;
+
+-- Phones of sms_cell_list_rows a campaign may text, in phone-key order: not opted out, not a warm
+-- lead, not already sent for the campaign (sms_send_counts), at most p_limit rows and what
+-- p_daily_cap still allows for p_from_number (or all numbers) in the last 24h (sends_last_24h);
+-- p_after / p_fetched page through it (keyset; rows already returned count against the cap).
+create or replace function campaign_audience(
+  p_campaign_id text,
+  p_from_number text default null,
+  p_daily_cap integer default 0,
+  p_limit integer default null,
+  p_after bigint default null,
+  p_fetched integer default 0
+) returns table (
+  key bigint, phone_number text, full_name text, address text, source_address text, lead_type text, resident_type text
+) language sql stable as $$
+  select distinct on (k.key) k.key, r.phone_number, r.full_name, r.address, r.source_address, r.lead_type, r.resident_type
+  from sms_cell_list_rows r
+  cross join lateral (select phone_key(r.phone_number) as key) k
+  where k.key is not null
+    and (p_after is null or k.key > p_after)
+    and not exists (select 1 from opt_outs o where phone_key(o.phone_number) = k.key)
+    and not exists (select 1 from warm_leads w where phone_key(w.phone_number) = k.key)
+    and not exists (select 1 from sms_sends s
+                    where s.campaign_id = p_campaign_id and phone_key(s.phone_number) = k.key
+                      and sms_send_counts(s.status))
+  order by k.key
+  limit (
+    select least(p_limit, case when coalesce(p_daily_cap, 0) > 0
+      then greatest(0, p_daily_cap - coalesce(p_fetched, 0) - sends_last_24h(p_from_number)) end)
+  );
+$$;
 
 insert into list_metadata (id, name, list_type, source, source_identifier) values
   ('sms_cell_list', 'SMS campaign list', 'sms_cell', 'file', 'sms_cell_list.csv'),
@@ -122,3 +400,4 @@ on conflict (id) do nothing;
 -- alter table list_preview enable row level security;
 -- alter table sms_cell_list_rows enable row level security;
 -- alter table contact_notes enable row level security;
+-- alter table sms_sends enable row level security;
@@ -1,3 +1,5 @@
+export type SmsSendStatus = "queued" | "sent" | "failed" | "delivered" | "undelivered";
+
 export type Json = string | number | boolean | null | { [key: string]: Json | undefined } | Json[];
 
 export interface Database {
@@ -43,6 +45,12 @@ export interface Database {
           finished_at: string | null;
           log: string | null;
           error: string | null;
+          worker_id: string | null;
+          lease_expires_at: string | null;
+          heartbeat_at: string | null;
+          attempts: number;
+          progress: Json | null;
+          lane: string | null;
         };
         Insert: {
           id?: string;
@@ -54,6 +62,12 @@ export interface Database {
           finished_at?: string | null;
           log?: string | null;
           error?: string | null;
+          worker_id?: string | null;
+          lease_expires_at?: string | null;
+          heartbeat_at?: string | null;
+          attempts?: number;
+          progress?: Json | null;
+          lane?: string | null;
         };
         Update: {
           action?: string;
@@ -63,6 +77,12 @@ export interface Database {
           finished_at?: string | null;
           log?: string | null;
           error?: string | null;
+          worker_id?: string | null;
+          lease_expires_at?: string | null;
+          heartbeat_at?: string | null;
+          attempts?: number;
+          progress?: Json | null;
+          lane?: string | null;
         };
       };
       form_submissions: {
@@ -150,6 +170,7 @@ export interface Database {
           row_count: number | null;
           last_updated_at: string | null;
           updated_by_job_id: string | null;
+          content_hash: string | null;
         };
         Insert: {
           id: string;
@@ -160,6 +181,7 @@ export interface Database {
           row_count?: number | null;
           last_updated_at?: string | null;
           updated_by_job_id?: string | null;
+          content_hash?: string | null;
         };
         Update: {
           name?: string;
@@ -169,6 +191,7 @@ export interface Database {
           row_count?: number | null;
           last_updated_at?: string | null;
           updated_by_job_id?: string | null;
+          content_hash?: string | null;
         };
       };
       list_preview: {
@@ -215,7 +238,9 @@ export interface Database {
           source_address: string | null;
           lead_type: string | null;
           resident_type: string | null;
+          row_hash: string | null;
           created_at: string | null;
+          updated_at: string | null;
         };
         Insert: {
           id?: string;
@@ -225,7 +250,9 @@ export interface Database {
           source_address?: string | null;
           lead_type?: string | null;
           resident_type?: string | null;
+          row_hash?: string | null;
           created_at?: string | null;
+          updated_at?: string | null;
         };
         Update: {
           phone_number?: string;
@@ -234,7 +261,46 @@ export interface Database {
           source_address?: string | null;
           lead_type?: string | null;
           resident_type?: string | null;
+          row_hash?: string | null;
           created_at?: string | null;
+          updated_at?: string | null;
+        };
+      };
+      sms_sends: {
+        Row: {
+          id: string;
+          campaign_id: string;
+          phone_number: string;
+          from_number: string | null;
+          status: SmsSendStatus;
+          sid: string | null;
+          error_code: number | null;
+          error: string | null;
+          attempts: number | null;
+          queued_at: string | null;
+          updated_at: string | null;
+        };
+        Insert: {
+          id?: string;
+          campaign_id: string;
+          phone_number: string;
+          from_number?: string | null;
+          status?: SmsSendStatus;
+          sid?: string | null;
+          error_code?: number | null;
+          error?: string | null;
+          attempts?: number | null;
+          queued_at?: string | null;
+          updated_at?: string | null;
+        };
+        Update: {
+          from_number?: string | null;
+          status?: SmsSendStatus;
+          sid?: string | null;
+          error_code?: number | null;
+          error?: string | null;
+          attempts?: number | null;
+          updated_at?: string | null;
         };
       };
     };
@@ -244,6 +310,14 @@ export interface Database {
 export type AppConfig = Database["public"]["Tables"]["app_config"]["Row"];
 export type Job = Database["public"]["Tables"]["jobs"]["Row"];
 export type JobInsert = Database["public"]["Tables"]["jobs"]["Insert"];
+/** Shape of jobs.progress, written by the worker from a script's report_progress() */
+export type JobProgressReport = {
+  stage: string;
+  done: number;
+  total: number | null;
+  message: string;
+  updated_at: string;
+};
 export type FormSubmission = Database["public"]["Tables"]["form_submissions"]["Row"];
 export type FormSubmissionInsert = Database["public"]["Tables"]["form_submissions"]["Insert"];
 export type OptOut = Database["public"]["Tables"]["opt_outs"]["Row"];
@@ -255,3 +329,4 @@ export type ListPreview = Database["public"]["Tables"]["list_preview"]["Row"];
 export type ContactNote = Database["public"]["Tables"]["contact_notes"]["Row"];
 export type ContactNoteInsert = Database["public"]["Tables"]["contact_notes"]["Insert"];
 export type SmsCellListRow = Database["public"]["Tables"]["sms_cell_list_rows"]["Row"];
+export type SmsSend = Database["public"]["Tables"]["sms_sends"]["Row"];
@@ -0,0 +1,100 @@
+"""
+Persistent per-address cache for Cyber Background Checks lookups.
+
+SQLite file keyed by a normalized address; stores the parsed result rows (JSON)
+plus the fetch timestamp. Used by tree_service_lead_automation.run_cbc_lookups so
+re-runs over overlapping address CSVs skip addresses already looked up.
+"""
+
+import json
+import logging
+import re
+import sqlite3
+import time
+from pathlib import Path
+from typing import Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CACHE_DB = "cbc_cache.sqlite3"
+DEFAULT_TTL_DAYS = 30
+DEFAULT_MAX_ENTRIES = 50000
+
+
+def normalize_address(address: str) -> str:
+    """Cache key: uppercase, punctuation dropped, whitespace collapsed ('1 Main St., Town , TN' -> '1 MAIN ST TOWN TN')."""
+    s = re.sub(r"[^\w\s]", " ", str(address or ""))
+    return re.sub(r"\s+", " ", s).strip().upper()
+
+
+class CbcCache:
+    """
+    Address -> list of lead dicts, with a TTL and size-based eviction (oldest fetch first).
+    Only non-empty results are stored so a transient failed lookup is retried next run.
+    """
+
+    def __init__(self, path=DEFAULT_CACHE_DB, ttl_days: float = DEFAULT_TTL_DAYS, max_entries: int = DEFAULT_MAX_ENTRIES):
+        self.path = Path(path)
+        self.ttl_sec = ttl_days * 86400 if ttl_days and ttl_days > 0 else None
+        self.max_entries = max_entries
+        self.conn = sqlite3.connect(str(self.path))
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS cbc_lookups ("
+            " address_key TEXT PRIMARY KEY,"
+            " address TEXT NOT NULL,"
+            " rows_json TEXT NOT NULL,"
+            " fetched_at REAL NOT NULL)"
+        )
+        self.conn.execute("CREATE INDEX IF NOT EXISTS cbc_lookups_fetched_at ON cbc_lookups (fetched_at)")
+        self.conn.commit()
+
+    def get(self, address: str, max_age_sec: Optional[float] = None) -> Optional[List[Dict]]:
+        """
+        Return cached rows for address, or None on miss / expired entry.
+        max_age_sec overrides the TTL (e.g. --refresh-older-than).
+        """
+        row = self.conn.execute(
+            "SELECT rows_json, fetched_at FROM cbc_lookups WHERE address_key = ?",
+            (normalize_address(address),),
+        ).fetchone()
+        if not row:
+            return None
+        max_age = max_age_sec if max_age_sec is not None else self.ttl_sec
+        if max_age is not None and time.time() - row[1] > max_age:
+            return None
+        # Rows were stored under the address as searched then; report the address as given now
+        return [dict(r, Address=address) for r in json.loads(row[0])]
+
+    def put(self, address: str, rows: List[Dict]):
+        """Store rows for address (replaces any previous entry). Empty results are not cached."""
+        if not rows:
+            return
+        self.conn.execute(
+            "INSERT OR REPLACE INTO cbc_lookups (address_key, address, rows_json, fetched_at) VALUES (?, ?, ?, ?)",
+            (normalize_address(address), address, json.dumps(rows), time.time()),
+        )
+        self.conn.commit()
+
+    def evict(self) -> int:
+        """Drop expired entries, then the oldest beyond max_entries. Returns number of rows removed."""
+        removed = 0
+        if self.ttl_sec is not None:
+            cur = self.conn.execute("DELETE FROM cbc_lookups WHERE fetched_at < ?", (time.time() - self.ttl_sec,))
+            removed += cur.rowcount
+        if self.max_entries and self.max_entries > 0:
+            cur = self.conn.execute(
+                "DELETE FROM cbc_lookups WHERE address_key IN ("
+                " SELECT address_key FROM cbc_lookups ORDER BY fetched_at DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,),
+            )
+            removed += cur.rowcount
+        self.conn.commit()
+        if removed:
+            logger.info("CBC cache: evicted %d entries from %s", removed, self.path)
+        return removed
+
+    def __len__(self):
+        return self.conn.execute("SELECT COUNT(*) FROM cbc_lookups").fetchone()[0]
+
+    def close(self):
+        self.conn.close()
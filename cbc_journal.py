@@ -0,0 +1,76 @@
+"""
+Append-only journal of finished CBC lookups so an interrupted run can resume.
+
+One JSON line per address ({"address", "rows", "ts"}), flushed and fsynced as soon
+as the lookup completes. A torn last line (crash mid-write) is ignored on load.
+Empty results are not journaled (as in CbcCache), so an address whose lookup timed
+out or failed is looked up again on --resume.
+Used by tree_service_lead_automation.run_cbc_lookups and its --resume flag.
+"""
+
+import json
+import logging
+import os
+import time
+from pathlib import Path
+from typing import Dict, Iterable, List
+
+from cbc_cache import normalize_address
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_JOURNAL = "cbc_journal.jsonl"
+
+
+class CbcJournal:
+    """Records (address, rows) per finished lookup; open with resume=False to start a new run."""
+
+    def __init__(self, path=DEFAULT_JOURNAL, resume: bool = False):
+        self.path = Path(path)
+        self.entries: Dict[str, Dict] = {}
+        if resume:
+            self._load()
+        elif self.path.exists():
+            self.path.unlink()
+        self._fh = open(self.path, "a", encoding="utf-8")
+
+    def _load(self):
+        if not self.path.exists():
+            return
+        bad = 0
+        with open(self.path, encoding="utf-8") as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    entry = json.loads(line)
+                    self.entries[normalize_address(entry["address"])] = entry
+                except (ValueError, KeyError, TypeError):
+                    bad += 1
+        logger.info("Journal %s: %d addresses already done%s", self.path, len(self.entries), " (%d unreadable lines skipped)" % bad if bad else "")
+
+    def is_done(self, address: str) -> bool:
+        return normalize_address(address) in self.entries
+
+    def record(self, address: str, rows: List[Dict]):
+        """Append one finished address durably (flush + fsync before returning). Empty results are not journaled."""
+        if not rows:
+            return
+        entry = {"address": address, "rows": rows, "ts": time.time()}
+        self._fh.write(json.dumps(entry) + "\n")
+        self._fh.flush()
+        os.fsync(self._fh.fileno())
+        self.entries[normalize_address(address)] = entry
+
+    def rows(self, addresses: Iterable[str] = None) -> List[Dict]:
+        """All journaled lead rows, in journal order; limited to addresses when given."""
+        keys = None if addresses is None else {normalize_address(a) for a in addresses}
+        out = []
+        for key, entry in self.entries.items():
+            if keys is None or key in keys:
+                out.extend(entry["rows"])
+        return out
+
+    def close(self):
+        self._fh.close()
@@ -0,0 +1,212 @@
+"""
+Pure HTML parsers for scraped result pages (HTML string in, list of dicts out).
+
+tree_service_lead_automation grabs driver.page_source once per page and hands it
+here, instead of one chromedriver round trip per find_elements / .text call.
+No browser needed, so the parsers can be run and benchmarked offline on saved pages.
+"""
+
+import re
+from typing import Dict, List
+
+from lxml import html as lxml_html
+
+# Phone like (901) 752-4443, 901-752-4443, 901.752.4443, 901 752 4443
+PHONE_RE = re.compile(r"\(?\d{3}\)?[-.\s]?\d{3}[-.\s]?\d{4}")
+
+# Same containers as the old find_elements selectors:
+# [class*='result'], [class*='person'], [class*='record'], table tbody tr
+CBC_BLOCK_XPATH = (
+    "//*[contains(@class,'result') or contains(@class,'person') or contains(@class,'record')]"
+    " | //table/tbody/tr"
+)
+CBC_NAME_XPATH = (
+    "descendant-or-self::*[contains(@class,'name') or contains(@class,'person')]"
+    "//*[self::span or self::a or self::div] | .//strong"
+)
+CBC_PHONE_LABEL_XPATH = ".//*[contains(.,'Phone') or contains(.,'Mobile') or contains(.,'Cell')]"
+
+
+def _text(el) -> str:
+    """Whitespace-collapsed text of an element (close to Selenium's .text)."""
+    return " ".join(el.text_content().split())
+
+
+def phone_type_from_text(text: str) -> str:
+    """Mobile / Landline / Unknown from a label such as 'Mobile: (901) 555-1234'."""
+    t = (text or "").lower()
+    if "mobile" in t or "cell" in t or "wireless" in t:
+        return "Mobile"
+    if "landline" in t or "home" in t:
+        return "Landline"
+    return "Unknown"
+
+
+def format_phone(text: str) -> str:
+    """'(XXX) XXX-XXXX' from the first phone in text; text unchanged if it has no 10-digit phone."""
+    m = PHONE_RE.search(text or "")
+    if not m:
+        return text
+    digits = re.sub(r"\D", "", m.group(0))
+    return f"({digits[-10:-7]}) {digits[-7:-4]}-{digits[-4:]}"
+
+
+def _cbc_blocks(doc) -> List:
+    """
+    Result blocks holding a name and at least one phone, innermost only: a wrapper like
+    div.results around several div.person cards is dropped in favour of the cards, so
+    rows stay scoped to their own block. Falls back to the whole page.
+    """
+    candidates = [
+        b for b in doc.xpath(CBC_BLOCK_XPATH)
+        if b.xpath(CBC_NAME_XPATH) and _cbc_block_phones(b)
+    ]
+    ids = {id(b) for b in candidates}
+    blocks = [b for b in candidates if not any(id(d) in ids for d in b.iterdescendants())]
+    return blocks or [doc]
+
+
+def _cbc_block_phones(block) -> List[tuple]:
+    """(formatted phone, phone type) for each phone element in a block."""
+    out = []
+    seen = set()
+    parents = {}
+    for label in block.xpath(CBC_PHONE_LABEL_XPATH):
+        parent = label.getparent()
+        if parent is not None:
+            parents[id(parent)] = parent
+    # Outermost parents only: nested labels would re-walk the same subtree
+    roots = [p for p in parents.values() if not any(id(a) in parents for a in p.iterancestors())]
+    for root in roots:
+        for el in root.iter():
+            if not isinstance(el.tag, str):
+                continue
+            text = _text(el)
+            if not PHONE_RE.search(text):
+                continue
+            # Innermost element holding the number; its label may sit in the parent
+            if any(PHONE_RE.search(_text(c)) for c in el if isinstance(c.tag, str)):
+                continue
+            phone = format_phone(text)
+            if phone in seen:
+                continue
+            seen.add(phone)
+            ptype = phone_type_from_text(text)
+            up = el.getparent()
+            if ptype == "Unknown" and up is not None and len(PHONE_RE.findall(_text(up))) == 1:
+                ptype = phone_type_from_text(_text(up))
+            out.append((phone, ptype))
+    return out
+
+
+def _cbc_block_name(block) -> str:
+    """First non-empty name element, preferring leaves (span.name over a header div that also holds 'Age 71')."""
+    els = block.xpath(CBC_NAME_XPATH)
+    for el in [e for e in els if not len(e)] + els:
+        name = _text(el)
+        if name:
+            return name
+    return ""
+
+
+def parse_cbc_results(page_html: str, address: str) -> List[Dict]:
+    """
+    Parse a Cyber Background Checks results page. Returns list of dicts with keys
+    Full_Name, Address, Phone_Number, Phone_Type (one per person/phone pair; all phone types).
+    """
+    if not page_html:
+        return []
+    doc = lxml_html.fromstring(page_html)
+    results = []
+    seen = set()
+    for block in _cbc_blocks(doc):
+        name = _cbc_block_name(block)
+        if not name:
+            continue
+        for phone, ptype in _cbc_block_phones(block):
+            if (name, phone) in seen:
+                continue
+            seen.add((name, phone))
+            results.append({
+                "Full_Name": name,
+                "Address": address,
+                "Phone_Number": phone,
+                "Phone_Type": ptype,
+            })
+    return results
+
+
+# ---------------------------------------------------------------------------
+# Propwire search results
+# ---------------------------------------------------------------------------
+# Same rows as the old find_elements selectors (table/row classes first, then cards)
+PROPWIRE_ROW_XPATH = (
+    "//table//tbody//tr | //*[@data-testid='result-row']"
+    " | //*[contains(@class,'search-result-row') or contains(@class,'property-row') or contains(@class,'listing-row')"
+    " or contains(@class,'ResultRow') or contains(@class,'result-row')]"
+)
+PROPWIRE_CARD_XPATH = (
+    "//*[contains(@class,'property-card') or contains(@class,'listing-card') or contains(@class,'result-card')] | //article"
+)
+# a[href*='property'], a[href*='listing'], td:first-child, [class*='address'], [class*='Address']
+PROPWIRE_ADDRESS_XPATH = (
+    ".//a[contains(@href,'property') or contains(@href,'listing')] | .//td[not(preceding-sibling::*)]"
+    " | .//*[contains(@class,'address') or contains(@class,'Address')]"
+)
+PROPWIRE_COLUMNS = ["Address", "Lead_Type", "Property_Type", "Lot_Size", "Est_Value", "Equity_Pct", "Notes"]
+
+LEAD_TYPE_RE = re.compile(
+    r"pre[- ]?foreclosure|absentee(?: owner)?|high equity|free and clear|vacant|tax lien|auction|"
+    r"bank owned|inherited|cash buyer|tired landlord",
+    re.I,
+)
+PROPERTY_TYPE_RE = re.compile(r"single[- ]family|multi[- ]family|townhouse|condo(?:minium)?|mobile home|vacant land", re.I)
+LOT_SIZE_RE = re.compile(r"lot(?: size)?\W{0,5}([\d,.]+\s*(?:acres?|ac\b|sq\.?\s*ft|sqft))", re.I)
+ACRES_RE = re.compile(r"([\d,.]+\s*acres?)\b", re.I)
+EST_VALUE_RE = re.compile(r"(?:est(?:imated|\.)?\s*)?value\W{0,5}(\$[\d,.]+\s*[KkMm]?)", re.I)
+EQUITY_RE = re.compile(r"(\d{1,3}(?:\.\d+)?)\s*%\s*equity|equity\W{0,5}(\d{1,3}(?:\.\d+)?)\s*%", re.I)
+
+
+def _propwire_fields(row_text: str) -> Dict:
+    """Lead_Type / Property_Type / Lot_Size / Est_Value / Equity_Pct from a result row's text."""
+    lead_types = []
+    for m in LEAD_TYPE_RE.finditer(row_text):
+        label = m.group(0).title()
+        if label not in lead_types:
+            lead_types.append(label)
+    prop = PROPERTY_TYPE_RE.search(row_text)
+    lot = LOT_SIZE_RE.search(row_text) or ACRES_RE.search(row_text)
+    value = EST_VALUE_RE.search(row_text)
+    equity = EQUITY_RE.search(row_text)
+    return {
+        "Lead_Type": "; ".join(lead_types),
+        "Property_Type": prop.group(0).title() if prop else "",
+        "Lot_Size": lot.group(1).strip() if lot else "",
+        "Est_Value": value.group(1).strip() if value else "",
+        "Equity_Pct": (equity.group(1) or equity.group(2)) if equity else "",
+        "Notes": "",
+    }
+
+
+def parse_propwire_results(page_html: str) -> List[Dict]:
+    """
+    Parse one Propwire search results page. Returns one dict per row (PROPWIRE_COLUMNS keys),
+    in page order; rows without a plausible address are skipped. Not deduped across pages.
+    """
+    if not page_html:
+        return []
+    doc = lxml_html.fromstring(page_html)
+    rows = doc.xpath(PROPWIRE_ROW_XPATH) or doc.xpath(PROPWIRE_CARD_XPATH)
+    out = []
+    for row in rows:
+        addr_els = row.xpath(PROPWIRE_ADDRESS_XPATH)
+        if not addr_els:
+            continue
+        address = _text(addr_els[0])
+        if len(address) <= 5:
+            continue
+        rec = {"Address": address}
+        # Join text nodes with spaces so adjacent cells don't run together ("$412,00065% Equity")
+        rec.update(_propwire_fields(" ".join(" ".join(row.itertext()).split())))
+        out.append(rec)
+    return out
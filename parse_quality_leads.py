@@ -5,15 +5,19 @@ Quality over quantity: filter by Resident_Type, Phone_Type, Lead_Type, Lot_Size,
 Run: python parse_quality_leads.py [--input tree_service_leads.csv] [--output quality_leads.csv]
 """
 import argparse
-import pandas as pd
+import sys
 from pathlib import Path
 
+# Shared helpers live in scripts/
+sys.path.insert(0, str(Path(__file__).resolve().parent / "scripts"))
+from file_cache import read_csv_cached  # noqa: E402
+
 DEFAULT_INPUT = "tree_service_leads.csv"
 DEFAULT_OUTPUT = "quality_leads.csv"
 PROPWIRE_CSV = "propwire_addresses.csv"
 
 
-def main():
+def main(argv=None):
     parser = argparse.ArgumentParser(description="Filter leads for quality (parse later)")
     parser.add_argument("--input", default=DEFAULT_INPUT, help="Input leads CSV")
     parser.add_argument("--output", default=DEFAULT_OUTPUT, help="Output quality shortlist CSV")
@@ -21,21 +25,25 @@ def main():
     parser.add_argument("--lives-at-only", action="store_true", default=True, help="Keep only Resident_Type == Lives at (default True)")
     parser.add_argument("--mobile-only", action="store_true", help="Keep only Phone_Type Mobile/Cell when column present")
     parser.add_argument("--dedupe-phone", action="store_true", default=True, help="Dedupe by Phone_Number (default True)")
-    args = parser.parse_args()
-
-    path = Path(args.input)
-    if not path.exists():
-        print(f"Input not found: {path}")
-        return
+    parser.add_argument("--lead-store", default="", metavar="DIR", help="Read leads from the Parquet lead store (scripts/lead_store.py) instead of --input")
+    args = parser.parse_args(argv)
 
-    df = pd.read_csv(path)
+    if args.lead_store:
+        from lead_store import read_leads
+        df = read_leads(args.lead_store, phone_types="mobile|cell" if args.mobile_only else None)
+    else:
+        path = Path(args.input)
+        if not path.exists():
+            print(f"Input not found: {path}")
+            return
+        df = read_csv_cached(path)
     if df.empty:
         print("No rows in input.")
         return
 
     # Merge Propwire fields if requested (add columns from propwire_addresses when not already in df)
     if args.merge_propwire and Path(PROPWIRE_CSV).exists():
-        pw = pd.read_csv(PROPWIRE_CSV)
+        pw = read_csv_cached(PROPWIRE_CSV)
         if "Address" in pw.columns:
             extra = [c for c in ["Lead_Type", "Property_Type", "Lot_Size", "Est_Value", "Equity_Pct", "Notes"] if c in pw.columns and c not in df.columns]
             if extra:
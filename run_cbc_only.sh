@@ -6,6 +6,7 @@
 #   ./run_cbc_only.sh                    # uses propwire_addresses.csv, visible browser
 #   ./run_cbc_only.sh other_addresses.csv
 #   USE_EXISTING=1 ./run_cbc_only.sh     # attach to Chrome on port 9222 (start with start_chrome_for_automation.sh)
+#   RESUME=1 ./run_cbc_only.sh           # continue an interrupted run (skips addresses in cbc_journal.jsonl)
 #
 # Output: tree_service_leads.csv (mobile/cell only from CBC). For full schema + Unknown phone type,
 # capture in Cursor browser and merge, or run parse_quality_leads / build_sms_list on existing data.
@@ -24,6 +25,7 @@ VISIBLE="--no-headless"
 [[ -n "$HEADLESS" ]] && VISIBLE=""
 EXTRA=""
 [[ -n "$USE_EXISTING" ]] && EXTRA="--use-existing-browser"
+[[ -n "$RESUME" ]] && EXTRA="$EXTRA --resume"
 
 if [[ ! -f "$ADDRESSES_CSV" ]]; then
   echo "Addresses file not found: $ADDRESSES_CSV"
@@ -0,0 +1,85 @@
+"""
+Vectorized US address parsing into City / State / Zip columns.
+
+Done once at ingestion (post_process_and_save, merge scripts) so location filters in
+build_sms_list are plain column comparisons instead of a regex per row per build.
+
+Rules (same as the old per-row _parse_address_parts, plus state/zip not set off by a comma):
+  "Street, City, ST 12345"      -> City, ST, 12345
+  "Street, City ST 12345"       -> City, ST, 12345   (city = rest of the last comma part)
+  "Street City , ST 12345"      -> City, ST, 12345   (text before the last comma, street cut off)
+  "Street City ST 12345"        -> City, ST, 12345   (no commas: text before state/zip, street cut off)
+  "..., ST" / "..., 12345"      -> state only / zip only
+
+The street is cut off when the city text starts with a house number: everything up to the
+last street suffix goes ("7038 Huntcliff Cv Germantown" -> Germantown). With no suffix to cut
+at, City is left blank: a stored "1437 Cordova Rd ..." would match --city Cordova.
+"""
+import re
+
+import pandas as pd
+
+ADDRESS_COLUMNS = ["City", "State", "Zip"]
+
+# Last comma part: "[head] ST 12345[-6789]", or exactly "ST" / "12345..."
+_LAST_PART_RE = (
+    r"^(?:(?P<head>.*?)\s*\b(?P<state>[A-Za-z]{2})\s*(?P<zip>\d{5})(?:-\d{4})?"
+    r"|(?P<state_only>[A-Za-z]{2})|(?P<zip_only>\d{5})\S*)$"
+)
+
+_STREET_SUFFIXES = (
+    "St|Street|Rd|Road|Dr|Drive|Ln|Lane|Ave|Av|Avenue|Blvd|Boulevard|Cv|Cove|Ct|Court|Cir|Circle|Pl|Place"
+    "|Pkwy|Parkway|Way|Ter|Terrace|Trl|Trail|Hwy|Highway|Loop|Pike|Sq|Xing|Path|Run|Row|Aly|Walk"
+)
+# "<house number> <street> <suffix>[ <dir>][ <unit>] <city>": the city after the last suffix
+_STREET_CITY_RE = re.compile(
+    rf"^\d+\S*\s+.*\b(?:{_STREET_SUFFIXES})\.?(?:\s+(?:N|S|E|W|NE|NW|SE|SW)\.?)?"
+    r"(?:\s+(?:Apt|Unit|Ste|Suite|#)\s*\S+)?\s+(?P<city>[^\d\s].*)$",
+    re.IGNORECASE,
+)
+
+
+def parse_address_columns(addresses: pd.Series) -> pd.DataFrame:
+    """City/State/Zip for each address (empty strings when unclear), aligned with the input index."""
+    s = addresses.fillna("").astype(str).str.strip()
+    # Lead files repeat each address once per person/phone: parse distinct values only
+    codes, uniques = pd.factorize(s)
+    u = pd.Series(uniques, dtype=object)
+    parts = u.str.rpartition(",")
+    last = parts[2].str.strip()
+    prev = parts[0].str.rpartition(",")[2].str.strip()
+    m = last.str.extract(_LAST_PART_RE)
+    state = m["state"].fillna(m["state_only"]).fillna("").str.upper()
+    zip_ = m["zip"].fillna(m["zip_only"]).fillna("")
+    head = m["head"].fillna("").str.strip(" ,")
+    city = head.where(head != "", prev)
+    street = city.str.match(r"\d")
+    if street.any():
+        city = city.where(~street, city.str.extract(_STREET_CITY_RE)["city"].fillna("").str.strip())
+    return pd.DataFrame(
+        {"City": city.to_numpy()[codes], "State": state.to_numpy()[codes], "Zip": zip_.to_numpy()[codes]},
+        index=s.index,
+    )
+
+
+def add_address_columns(df: pd.DataFrame, address_col: str = "Address") -> pd.DataFrame:
+    """
+    Ensure City/State/Zip columns exist, filling only blank cells from address_col (explicit
+    values and earlier parses are kept; only rows with a blank are parsed). A City starting with a
+    house number was parsed before the street was cut off and counts as blank. Modifies df in place.
+    """
+    if address_col not in df.columns:
+        return df
+    for col in ADDRESS_COLUMNS:
+        if col not in df.columns:
+            df[col] = ""
+        df[col] = df[col].fillna("").astype(str)
+    blank = {col: df[col].str.strip() == "" for col in ADDRESS_COLUMNS}
+    blank["City"] |= df["City"].str.match(r"\s*\d")
+    any_blank = blank["City"] | blank["State"] | blank["Zip"]
+    if any_blank.any():
+        parsed = parse_address_columns(df.loc[any_blank, address_col])
+        for col in ADDRESS_COLUMNS:
+            fill = blank[col]
+            df.loc[fill, col] = parsed.loc[fill[fill].index, col]
+    return df
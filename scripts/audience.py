@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+"""
+Campaign audience selected in the database. campaign_audience() (app/supabase/schema.sql) returns
+the sms_cell_list_rows a campaign may text: opt-outs, warm leads and phones the campaign's
+sms_sends shows as sent are excluded with index probes on phone_key(phone_number), and the result
+is cut to what the rolling 24h cap of the sending number still allows. send_campaign --from-db
+uses it instead of exporting both tables and anti-joining the CSV list in memory.
+
+  df = fetch_audience("spring-germantown", "+19015550000", daily_cap=450)
+  # Phone_Number, Full_Name, Address, ... (list CSV columns) plus _key, in phone-key order
+
+With SUPABASE_DB_URL / DATABASE_URL and psycopg2, rows stream through a server-side cursor
+(CURSOR_ROWS per round trip). Otherwise they are read with the RPC, FETCH_PAGE rows at a time
+(keyset on the phone key, so PostgREST's max-rows never truncates the audience).
+
+Usage:
+  python scripts/audience.py CAMPAIGN [--from +1...] [--daily-cap 450] [--limit N]   # count + sample
+"""
+import argparse
+import os
+import sys
+
+import pandas as pd
+
+from bulk_load import call_with_retry
+from job_wakeup import database_url
+from list_sync import RENAME
+
+FUNCTION = "campaign_audience"
+CURSOR_ROWS = 5000
+FETCH_PAGE = 1000  # PostgREST's default max rows per response
+_COLUMNS = {v: k for k, v in RENAME.items()}  # sms_cell_list_rows column -> list CSV column
+
+
+def audience_missing(error: Exception) -> bool:
+    """campaign_audience() or phone_key() not in the schema yet."""
+    text = str(error)
+    return "PGRST202" in text or ("does not exist" in text and (FUNCTION in text or "phone_key" in text))
+
+
+def _frame(rows, columns=None) -> pd.DataFrame:
+    df = pd.DataFrame(rows, columns=columns)
+    df["_key"] = df.pop("key").astype("int64")
+    return df.rename(columns=_COLUMNS)
+
+
+def _use_cursor(dsn: str) -> bool:
+    if not dsn:
+        return False
+    try:
+        import psycopg2  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def stream_audience(campaign_id: str, from_number: str | None = None, daily_cap: int = 0,
+                    limit: int | None = None, supabase=None, dsn: str | None = None):
+    """Yield the audience as DataFrames (see module docstring); limit caps the total rows."""
+    dsn = database_url() if dsn is None else dsn
+    limit = limit or None
+    params = {"p_campaign_id": campaign_id, "p_from_number": from_number or None,
+              "p_daily_cap": daily_cap, "p_limit": limit or None}
+    if _use_cursor(dsn):
+        import psycopg2
+
+        conn = psycopg2.connect(dsn)
+        try:
+            with conn, conn.cursor(name="campaign_audience") as cur:  # named: a server-side cursor
+                cur.itersize = CURSOR_ROWS
+                cur.execute(f"select * from {FUNCTION}(%(p_campaign_id)s, %(p_from_number)s, "
+                            "%(p_daily_cap)s, %(p_limit)s)", params)
+                while True:
+                    rows = cur.fetchmany(CURSOR_ROWS)
+                    if not rows:
+                        return
+                    yield _frame(rows, [d[0] for d in cur.description])
+        finally:
+            conn.close()
+    if supabase is None:
+        raise RuntimeError("campaign audience needs a Supabase client or a database URL")
+    fetched, after = 0, None
+    while True:
+        page = FETCH_PAGE if limit is None else min(FETCH_PAGE, limit - fetched)
+        if page <= 0:
+            return
+        rows = call_with_retry(supabase.rpc(FUNCTION, {
+            **params, "p_limit": page, "p_after": after, "p_fetched": fetched,
+        }).execute).data or []
+        if rows:
+            yield _frame(rows)
+            fetched += len(rows)
+            after = rows[-1]["key"]
+        if len(rows) < page:
+            return
+
+
+def fetch_audience(campaign_id: str, from_number: str | None = None, daily_cap: int = 0,
+                   limit: int | None = None, supabase=None, dsn: str | None = None) -> pd.DataFrame:
+    """The whole audience as one DataFrame (it is at most the daily cap, or limit, rows)."""
+    chunks = list(stream_audience(campaign_id, from_number, daily_cap, limit, supabase, dsn))
+    if not chunks:
+        return pd.DataFrame(columns=[*_COLUMNS.values(), "_key"]).astype({"_key": "int64"})
+    return pd.concat(chunks, ignore_index=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Show a campaign's audience as selected by campaign_audience()")
+    parser.add_argument("campaign")
+    parser.add_argument("--from", dest="from_number", default=os.environ.get("TWILIO_FROM", ""),
+                        help="Sending number for the daily cap (default $TWILIO_FROM)")
+    parser.add_argument("--daily-cap", type=int, default=450, help="Rolling 24h cap (default 450, 0 = off)")
+    parser.add_argument("--limit", type=int, default=0, help="Max rows (0 = no limit)")
+    args = parser.parse_args()
+    from send_ledger import get_supabase
+    try:
+        df = fetch_audience(args.campaign, args.from_number, args.daily_cap, args.limit or None, get_supabase())
+    except Exception as e:
+        if not audience_missing(e):
+            raise
+        print(f"{FUNCTION}() not found; apply app/supabase/schema.sql.", file=sys.stderr)
+        return
+    print(f"{len(df)} numbers can be texted for {args.campaign}.")
+    print(df.head(5).to_string(index=False))
+
+
+if __name__ == "__main__":
+    main()
@@ -4,37 +4,25 @@ Build campaign-ready SMS list: cell-only, exclude opt-outs.
 Reads tree_service_leads.csv (and optional phone-type filter), excludes opt_outs.csv,
 writes sms_cell_list.csv. Optional --city, --state, --zip to filter by location.
 Run: python scripts/build_sms_list.py [--leads ...] [--opt-outs ...] [--output ...] [--city CITY] [--state ST] [--zip ZIP]
+     [--lead-store lead_store]   # read from the Parquet lead store instead of the CSV
+     [--stream [--chunksize N]]  # chunked, bounded-memory build for very large lead files
 """
 import argparse
 import re
+import numpy as np
 import pandas as pd
 from pathlib import Path
 
+from address_utils import add_address_columns
+from file_cache import read_csv_cached
+from phone_utils import INVALID_KEY, phone_keys
+from suppression import DEFAULT_INDEX, suppressed_keys
+
 DEFAULT_LEADS = "tree_service_leads.csv"
 DEFAULT_OPT_OUTS = "opt_outs.csv"
 DEFAULT_OUTPUT = "sms_cell_list.csv"
-
-
-def _parse_address_parts(addr: str) -> tuple[str, str, str]:
-    """Parse US-style 'Street, City, ST 12345' into (city, state, zip). Returns ('','','') if unclear."""
-    if not addr or not isinstance(addr, str):
-        return ("", "", "")
-    parts = [p.strip() for p in addr.split(",")]
-    city, state, zip_ = "", "", ""
-    if len(parts) >= 2:
-        city = parts[-2].strip()
-    if len(parts) >= 1:
-        last = parts[-1].strip()
-        # e.g. "TN 38101" or "TN"
-        match = re.match(r"^([A-Za-z]{2})\s*(\d{5}(?:-\d{4})?)?$", last)
-        if match:
-            state = (match.group(1) or "").upper()
-            zip_ = (match.group(2) or "").split("-")[0]
-        elif len(last) == 2 and last.isalpha():
-            state = last.upper()
-        elif re.match(r"^\d{5}", last):
-            zip_ = last[:5]
-    return (city, state, zip_)
+DEFAULT_CHUNKSIZE = 100_000
+OUT_COLUMNS = ["Full_Name", "Address", "Phone_Number", "Source_Address", "Lead_Type", "Resident_Type"]
 
 
 def _filter_by_location(
@@ -44,7 +32,11 @@ def _filter_by_location(
     state_filter: str | None,
     zip_filter: str | None,
 ) -> pd.DataFrame:
-    """Filter rows by city, state, and/or zip. Uses City/State/Zip columns if present, else parses Address."""
+    """
+    Filter rows by city, state, and/or zip using City/State/Zip columns. Leads saved by
+    post_process_and_save / merge scripts already have them; rows without are parsed once
+    from address_col (vectorized, see address_utils).
+    """
     if not city_filter and not state_filter and not zip_filter:
         return df
     city_filter = (city_filter or "").strip()
@@ -52,40 +44,90 @@ def _filter_by_location(
     zip_filter = (zip_filter or "").strip()
     zip_filter = re.sub(r"\D", "", zip_filter)[:5] if zip_filter else ""
 
-    # Use explicit columns when present
+    if address_col in df.columns:
+        df = add_address_columns(df.copy(), address_col)
     if city_filter and "City" in df.columns:
-        df = df[df["City"].astype(str).str.strip().str.lower().str.contains(city_filter.lower(), na=False)]
+        df = df[df["City"].astype(str).str.strip().str.lower().str.contains(city_filter.lower(), na=False, regex=False)]
     if state_filter and "State" in df.columns:
         df = df[df["State"].astype(str).str.strip().str.upper().str[:2].eq(state_filter)]
     if zip_filter and "Zip" in df.columns:
         df = df[df["Zip"].astype(str).str.replace(r"\D", "", regex=True).str[:5].eq(zip_filter)]
+    return df
 
-    # When no City/State/Zip columns, parse from Address
-    if address_col in df.columns and (city_filter and "City" not in df.columns or state_filter and "State" not in df.columns or zip_filter and "Zip" not in df.columns):
-
-        def matches(addr: str) -> bool:
-            city, state, zip_ = _parse_address_parts(addr)
-            if city_filter and "City" not in df.columns:
-                if city_filter.lower() not in (city or "").lower():
-                    return False
-            if state_filter and "State" not in df.columns:
-                if state != state_filter:
-                    return False
-            if zip_filter and "Zip" not in df.columns:
-                if (zip_ or "").replace(" ", "") != zip_filter:
-                    return False
-            return True
-
-        mask = df[address_col].astype(str).apply(matches)
-        df = df[mask]
 
-    return df
+def _select_rows(
+    df: pd.DataFrame,
+    require_phone_type: bool,
+    opt_keys: np.ndarray,
+    seen: np.ndarray | None = None,
+) -> tuple[pd.DataFrame, np.ndarray]:
+    """
+    Keep rows with a valid phone (and Mobile/Cell type when required), not opted out, first per
+    phone and not already in seen (streaming). Phone_Number becomes 10 digits.
+    Returns (rows, their int64 phone keys).
+    """
+    # Normalize phone to an int64 key (valid NANP only) for dedupe and opt-out match
+    keys = phone_keys(df["Phone_Number"])
+    mask = keys != INVALID_KEY
+    if require_phone_type and "Phone_Type" in df.columns:
+        mask &= df["Phone_Type"].astype(str).str.lower().str.contains("mobile|cell", na=False)
+    # Exclude opt-outs and phones already written by earlier chunks
+    if len(opt_keys):
+        mask &= ~keys.isin(opt_keys)
+    if seen is not None and len(seen):
+        mask &= ~keys.isin(seen)
+    df, keys = df[mask], keys[mask]
+
+    # Dedupe by phone (keep first)
+    first = ~keys.duplicated(keep="first")
+    df, keys = df[first].copy(), keys[first]
+    df["Phone_Number"] = keys.astype(str)  # 10 digits
 
+    # Prefer Source_Address for context; fall back to Address if Source_Address is missing or looks like a count (e.g. CBC_Result_Count)
+    if "Source_Address" in df.columns and "Address" in df.columns:
+        df["Source_Address"] = df["Source_Address"].astype(str)
+        bad = df["Source_Address"].str.strip().str.match(r"^\d+$") | (df["Source_Address"].str.len() < 10)
+        df.loc[bad, "Source_Address"] = df.loc[bad, "Address"].astype(str).values
+    return df, keys.to_numpy()
+
+
+def _build_streaming(leads_path: Path, out_path: Path, args, require_phone_type: bool, opt_keys: np.ndarray):
+    """
+    --stream: read leads in chunks, filter each chunk, dedupe across chunks with a sorted int64
+    array of phone keys already written, and append to the output. Memory stays ~one chunk.
+    """
+    seen = np.empty(0, dtype=np.int64)
+    read = written = 0
+    first = True
+    for chunk in pd.read_csv(leads_path, dtype={"Zip": str}, chunksize=args.chunksize):
+        if first and "Phone_Number" not in chunk.columns:
+            print("Leads file missing or no Phone_Number column.")
+            return
+        if first and require_phone_type and "Phone_Type" not in chunk.columns:
+            print("Warning: No Phone_Type column; keeping all rows. Add Phone_Type from CBC VIEW DETAILS for cell-only.")
+        read += len(chunk)
+        address_col = "Source_Address" if "Source_Address" in chunk.columns else ("Address" if "Address" in chunk.columns else None)
+        if address_col:
+            chunk = _filter_by_location(chunk, address_col, args.city or None, args.state or None, args.zip_code or None)
+        chunk, keys = _select_rows(chunk, require_phone_type, opt_keys, seen)
+        seen = np.union1d(seen, keys)
+        out_cols = [c for c in OUT_COLUMNS if c in chunk.columns]
+        chunk[out_cols].to_csv(out_path, mode="w" if first else "a", header=first, index=False)
+        written += len(chunk)
+        first = False
+    if first:
+        print("Leads file missing or no Phone_Number column.")
+        return
+    print(f"Streamed {read} leads in chunks of {args.chunksize}")
+    print(f"Wrote {written} rows to {out_path}")
 
-def main():
+
+def main(argv=None):
     parser = argparse.ArgumentParser(description="Build cell-only SMS list, exclude opt-outs")
     parser.add_argument("--leads", default=DEFAULT_LEADS, help="Leads CSV")
-    parser.add_argument("--opt-outs", default=DEFAULT_OPT_OUTS, help="Opt-outs CSV")
+    parser.add_argument("--opt-outs", default=DEFAULT_OPT_OUTS, help="Opt-outs CSV (merged into the suppression index)")
+    parser.add_argument("--suppression-index", default=DEFAULT_INDEX,
+                        help="Persistent opt-out index (scripts/suppression.py, default suppression.sqlite3)")
     parser.add_argument("--output", default=DEFAULT_OUTPUT, help="Output SMS list CSV")
     parser.add_argument("--require-phone-type", action="store_true",
                         help="Only keep rows where Phone_Type is Mobile/Cell")
@@ -94,7 +136,14 @@ def main():
     parser.add_argument("--city", default="", help="Filter leads by city (optional)")
     parser.add_argument("--state", default="", help="Filter leads by state (2-letter, optional)")
     parser.add_argument("--zip", default="", dest="zip_code", help="Filter leads by ZIP code (optional)")
-    args = parser.parse_args()
+    parser.add_argument("--lead-store", default="", metavar="DIR",
+                        help="Read leads from the Parquet lead store (scripts/lead_store.py) instead of --leads; "
+                             "location and phone-type filters are pushed down to matching partitions")
+    parser.add_argument("--stream", action="store_true",
+                        help="Process the leads CSV in chunks with bounded memory (for very large lead files)")
+    parser.add_argument("--chunksize", type=int, default=DEFAULT_CHUNKSIZE,
+                        help=f"Rows per chunk with --stream (default {DEFAULT_CHUNKSIZE})")
+    args = parser.parse_args(argv)
 
     require_phone_type = args.require_phone_type or not args.include_unknown_phone_type
 
@@ -103,52 +152,54 @@ def main():
     opt_path = root / args.opt_outs
     out_path = root / args.output
 
-    if not leads_path.exists():
-        print(f"Leads file not found: {leads_path}")
+    if args.stream and not args.lead_store:
+        if not leads_path.exists():
+            print(f"Leads file not found: {leads_path}")
+            return
+        opt_keys = suppressed_keys(opt_path, index_path=args.suppression_index)
+        _build_streaming(leads_path, out_path, args, require_phone_type, opt_keys)
         return
 
-    df = pd.read_csv(leads_path)
+    if args.lead_store:
+        from lead_store import read_leads, store_path
+        if not store_path(args.lead_store).exists():
+            print(f"Lead store not found: {store_path(args.lead_store)}")
+            return
+        df = read_leads(
+            args.lead_store,
+            city=args.city or None,
+            state=args.state or None,
+            zip_code=args.zip_code or None,
+            phone_types="mobile|cell" if require_phone_type else None,
+        )
+        print(f"Read {len(df)} leads from lead store {store_path(args.lead_store)}")
+        if df.empty:
+            print("No leads match the filters.")
+            return
+    elif not leads_path.exists():
+        print(f"Leads file not found: {leads_path}")
+        return
+    else:
+        df = read_csv_cached(leads_path, dtype={"Zip": str})
     if df.empty or "Phone_Number" not in df.columns:
         print("Leads file missing or no Phone_Number column.")
         return
 
-    # Location filter (before phone normalization to keep messaging accurate)
+    # Location filter (before phone normalization to keep messaging accurate); already applied by the lead store
     address_col = "Source_Address" if "Source_Address" in df.columns else "Address"
     if not (address_col in df.columns):
         address_col = "Address" if "Address" in df.columns else None
-    if address_col:
+    if address_col and not args.lead_store:
         before = len(df)
         df = _filter_by_location(df, address_col, args.city or None, args.state or None, getattr(args, "zip_code", None) or None)
         if args.city or args.state or getattr(args, "zip_code", None):
             print(f"Location filter: {before} -> {len(df)} leads (city={args.city or 'any'}, state={args.state or 'any'}, zip={getattr(args, 'zip_code', '') or 'any'})")
 
-    # Normalize phone for dedupe and opt-out match
-    df["Phone_Number"] = df["Phone_Number"].astype(str).str.replace(r"\D", "", regex=True)
-    df = df[df["Phone_Number"].str.len() >= 10]
-    df["Phone_Number"] = df["Phone_Number"].str[-10:]  # last 10 digits
-
-    if require_phone_type and "Phone_Type" in df.columns:
-        df = df[df["Phone_Type"].astype(str).str.lower().str.contains("mobile|cell", na=False)]
-    elif require_phone_type:
+    if require_phone_type and "Phone_Type" not in df.columns:
         print("Warning: No Phone_Type column; keeping all rows. Add Phone_Type from CBC VIEW DETAILS for cell-only.")
 
-    # Exclude opt-outs
-    if opt_path.exists():
-        opt = pd.read_csv(opt_path)
-        if "Phone_Number" in opt.columns and not opt.empty:
-            opt_nums = set(opt["Phone_Number"].astype(str).str.replace(r"\D", "", regex=True).str[-10:])
-            df = df[~df["Phone_Number"].isin(opt_nums)]
-
-    # Dedupe by phone (keep first)
-    df = df.drop_duplicates(subset=["Phone_Number"], keep="first")
-
-    # Prefer Source_Address for context; fall back to Address if Source_Address is missing or looks like a count (e.g. CBC_Result_Count)
-    if "Source_Address" in df.columns and "Address" in df.columns:
-        df["Source_Address"] = df["Source_Address"].astype(str)
-        bad = df["Source_Address"].str.strip().str.match(r"^\d+$") | (df["Source_Address"].str.len() < 10)
-        df.loc[bad, "Source_Address"] = df.loc[bad, "Address"].astype(str).values
-
-    out_cols = [c for c in ["Full_Name", "Address", "Phone_Number", "Source_Address", "Lead_Type", "Resident_Type"] if c in df.columns]
+    df, _ = _select_rows(df, require_phone_type, suppressed_keys(opt_path, index_path=args.suppression_index))
+    out_cols = [c for c in OUT_COLUMNS if c in df.columns]
     df[out_cols].to_csv(out_path, index=False)
     print(f"Wrote {len(df)} rows to {out_path}")
 
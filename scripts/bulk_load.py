@@ -0,0 +1,329 @@
+#!/usr/bin/env python3
+"""
+Bulk loader for Supabase tables: Postgres COPY over a direct connection when there is one,
+otherwise parallel PostgREST batches that size themselves to the server.
+
+  loader = BulkLoader(supabase)                              # COPY if SUPABASE_DB_URL / DATABASE_URL + psycopg2
+  stats = loader.load("sms_sends", df, on_conflict="campaign_id,phone_number")
+  # {"method": "postgrest", "rows": 250000, "batches": 61, "retries": 0, "seconds": 7.9, "rows_per_sec": 31600, ...}
+
+Rows come from a DataFrame (sliced; each batch serialized by pandas, so values keep their JSON
+types and NaN becomes null) or from any iterator of dicts; only the batches in flight are held
+in memory. PostgREST batches start at INITIAL_BATCH rows, double while a batch comes back in
+under half of TARGET_BATCH_SEC and halve when one is slower or too large (413 / statement
+timeout, after which the batch is split and retried). Up to `concurrency` batches are in
+flight; transient errors (timeouts, connection resets, 429, 5xx) are retried with exponential
+backoff and jitter, anything else is raised. stats["batch_log"] has rows / seconds / attempts
+per batch. COPY streams the rows as CSV in one transaction (through a temp table and
+INSERT ... ON CONFLICT when upserting).
+
+Usage:
+  python scripts/bulk_load.py TABLE FILE.csv|FILE.parquet [--on-conflict COLS] [--concurrency 4] [--postgrest]
+"""
+import argparse
+import csv
+import io
+import itertools
+import json
+import random
+import sys
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from pathlib import Path
+
+import pandas as pd
+
+INITIAL_BATCH = 500
+MIN_BATCH = 50
+MAX_BATCH = 10_000
+TARGET_BATCH_SEC = 2.0
+DEFAULT_CONCURRENCY = 4
+MAX_RETRIES = 5
+BACKOFF_BASE_SEC = 0.5
+BACKOFF_MAX_SEC = 30.0
+COPY_CHUNK_ROWS = 50_000
+# Matched against "<exception class> <message>", lowercased: httpx / socket errors, gateway and
+# rate-limit responses, and Postgres errors that succeed on retry (serialization, deadlock,
+# too many connections, server restart)
+_TRANSIENT = ("timeout", "timed out", "connecterror", "connectionerror", "remoteprotocolerror",
+              "connection reset", "server disconnected", "bad gateway", "service unavailable",
+              "gateway time", "internal server error", "too many requests", "rate limit",
+              "'40001'", "'40p01'", "'53300'", "'57p01'")
+_TOO_LARGE = ("payload too large", "request entity too large", "'57014'", "statement timeout")
+
+
+def is_too_large(error: Exception) -> bool:
+    text = str(error).lower()
+    return any(s in text for s in _TOO_LARGE)
+
+
+def is_transient(error: Exception) -> bool:
+    text = f"{error.__class__.__name__} {error}".lower()
+    return any(s in text for s in _TRANSIENT)
+
+
+def backoff(attempt: int) -> float:
+    """Seconds before retry number attempt (0-based): exponential with full jitter."""
+    return random.uniform(0, min(BACKOFF_MAX_SEC, BACKOFF_BASE_SEC * 2 ** attempt))
+
+
+def call_with_retry(fn, retries: int = MAX_RETRIES, transient=is_transient):
+    """fn(), retried with backoff while it fails with a transient error."""
+    for attempt in itertools.count():
+        try:
+            return fn()
+        except Exception as e:
+            if attempt >= retries or not transient(e):
+                raise
+            time.sleep(backoff(attempt))
+
+
+class _BatchSize:
+    """Shared batch size: doubles on fast batches, halves on slow or too-large ones."""
+
+    def __init__(self, initial: int, low: int, high: int, target_sec: float):
+        self.value, self.low, self.high, self.target = initial, low, high, target_sec
+        self._lock = threading.Lock()
+
+    def observe(self, rows: int, seconds: float):
+        with self._lock:
+            if rows >= self.value and seconds < self.target / 2:
+                self.value = min(self.high, self.value * 2)
+            elif seconds > self.target:
+                self.value = max(self.low, self.value // 2)
+
+    def shrink(self, rows: int):
+        with self._lock:
+            self.value = max(self.low, min(self.value, rows // 2))
+
+
+def _batches(rows, size: _BatchSize):
+    """Yield lists of JSON-ready dicts, each as long as the current batch size."""
+    if isinstance(rows, pd.DataFrame):
+        i = 0
+        while i < len(rows):
+            n = size.value
+            yield json.loads(rows.iloc[i:i + n].to_json(orient="records", date_format="iso"))
+            i += n
+        return
+    it = iter(rows)
+    while True:
+        batch = list(itertools.islice(it, size.value))
+        if not batch:
+            return
+        yield batch
+
+
+def _csv_chunks(rows, columns: list):
+    """CSV text (no header) in COPY_CHUNK_ROWS pieces, for COPY ... FROM STDIN."""
+    if isinstance(rows, pd.DataFrame):
+        for i in range(0, len(rows), COPY_CHUNK_ROWS):
+            yield rows.iloc[i:i + COPY_CHUNK_ROWS][columns].to_csv(index=False, header=False)
+        return
+    it = iter(rows)
+    while True:
+        chunk = list(itertools.islice(it, COPY_CHUNK_ROWS))
+        if not chunk:
+            return
+        buf = io.StringIO()
+        writer = csv.writer(buf)
+        for r in chunk:
+            writer.writerow(["" if r.get(c) is None else r.get(c) for c in columns])
+        yield buf.getvalue()
+
+
+class _ChunkReader(io.RawIOBase):
+    """File-like over an iterator of str chunks (what copy_expert reads from)."""
+
+    def __init__(self, chunks):
+        self._chunks = chunks
+        self._buf = b""
+
+    def readable(self):
+        return True
+
+    def read(self, n=-1):
+        while n < 0 or len(self._buf) < n:
+            try:
+                self._buf += next(self._chunks).encode()
+            except StopIteration:
+                break
+        if n < 0:
+            out, self._buf = self._buf, b""
+        else:
+            out, self._buf = self._buf[:n], self._buf[n:]
+        return out
+
+
+def _ident(name: str) -> str:
+    return '"' + name.replace('"', '""') + '"'
+
+
+class BulkLoader:
+    """See module docstring. dsn="" disables COPY; supabase may be None when only COPY is used."""
+
+    def __init__(self, supabase=None, dsn: str | None = None, concurrency: int = DEFAULT_CONCURRENCY,
+                 initial_batch: int = INITIAL_BATCH, min_batch: int = MIN_BATCH, max_batch: int = MAX_BATCH,
+                 target_batch_sec: float = TARGET_BATCH_SEC, retries: int = MAX_RETRIES):
+        if dsn is None:
+            from job_wakeup import database_url
+            dsn = database_url()
+        self.supabase = supabase
+        self.dsn = dsn
+        self.concurrency = max(1, concurrency)
+        self.initial_batch, self.min_batch, self.max_batch = initial_batch, min_batch, max_batch
+        self.target_batch_sec = target_batch_sec
+        self.retries = retries
+
+    def _use_copy(self) -> bool:
+        if not self.dsn:
+            return False
+        try:
+            import psycopg2  # noqa: F401
+        except ImportError:
+            return False
+        return True
+
+    def load(self, table: str, rows, columns: list | None = None, on_conflict: str | None = None) -> dict:
+        """Insert (or with on_conflict, upsert) rows into table; returns stats."""
+        if isinstance(rows, pd.DataFrame) and columns:
+            rows = rows[columns]
+        if self._use_copy():
+            try:
+                return self._copy(table, rows, columns, on_conflict)
+            except Exception as e:
+                if self.supabase is None or not isinstance(rows, pd.DataFrame):
+                    raise  # an iterator is partly consumed; only a DataFrame can be sent again
+                print(f"COPY into {table} failed ({e.__class__.__name__}: {str(e).strip()}); using PostgREST.",
+                      file=sys.stderr)
+        if self.supabase is None:
+            raise RuntimeError("BulkLoader needs a Supabase client or a database URL")
+        return self._postgrest(table, rows, on_conflict)
+
+    def _copy(self, table: str, rows, columns: list | None, on_conflict: str | None) -> dict:
+        import psycopg2
+
+        t0 = time.monotonic()
+        if isinstance(rows, pd.DataFrame):
+            columns = columns or list(rows.columns)
+            n = len(rows)
+        else:
+            it = iter(rows)
+            first = next(it, None)
+            if first is None:
+                return self._stats("copy", 0, t0, [])
+            columns = columns or list(first)
+            n = None
+            rows = itertools.chain([first], it)
+        cols = ", ".join(_ident(c) for c in columns)
+        counted = [0]
+
+        def chunks():
+            for text in _csv_chunks(rows, columns):
+                counted[0] += text.count("\n")  # approximation for iterators (quoted newlines count double)
+                yield text
+
+        conn = psycopg2.connect(self.dsn)
+        try:
+            with conn, conn.cursor() as cur:
+                target = table
+                if on_conflict:
+                    target = "_bulk_load"
+                    cur.execute(f"create temp table {target} (like {_ident(table)} including defaults) on commit drop")
+                cur.copy_expert(f"copy {_ident(target)} ({cols}) from stdin with (format csv)", _ChunkReader(chunks()))
+                if on_conflict:
+                    keys = [k.strip() for k in on_conflict.split(",")]
+                    updates = ", ".join(f"{_ident(c)} = excluded.{_ident(c)}" for c in columns if c not in keys)
+                    action = f"do update set {updates}" if updates else "do nothing"
+                    cur.execute(f"insert into {_ident(table)} ({cols}) select {cols} from {target} "
+                                f"on conflict ({', '.join(_ident(k) for k in keys)}) {action}")
+        finally:
+            conn.close()
+        return self._stats("copy", n if n is not None else counted[0], t0, [])
+
+    def _postgrest(self, table: str, rows, on_conflict: str | None) -> dict:
+        t0 = time.monotonic()
+        size = _BatchSize(self.initial_batch, self.min_batch, self.max_batch, self.target_batch_sec)
+        log, lock = [], threading.Lock()
+
+        def send(batch: list):
+            attempts = 0
+            while True:
+                attempts += 1
+                started = time.monotonic()
+                try:
+                    q = self.supabase.table(table)
+                    q = q.upsert(batch, on_conflict=on_conflict) if on_conflict else q.insert(batch)
+                    q.execute()
+                except Exception as e:
+                    if is_too_large(e) and len(batch) > 1:
+                        size.shrink(len(batch))
+                        half = len(batch) // 2
+                        send(batch[:half])
+                        send(batch[half:])
+                        return
+                    if attempts > self.retries or not is_transient(e):
+                        raise
+                    time.sleep(backoff(attempts - 1))
+                    continue
+                seconds = time.monotonic() - started
+                size.observe(len(batch), seconds)
+                with lock:
+                    log.append({"rows": len(batch), "seconds": round(seconds, 3), "attempts": attempts})
+                return
+
+        with ThreadPoolExecutor(max_workers=self.concurrency) as ex:
+            pending = set()
+            for batch in _batches(rows, size):
+                if len(pending) >= self.concurrency * 2:  # bound what is queued, not just what runs
+                    done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    for f in done:
+                        f.result()
+                pending.add(ex.submit(send, batch))
+            for f in pending:
+                f.result()
+        return self._stats("postgrest", sum(b["rows"] for b in log), t0, log)
+
+    @staticmethod
+    def _stats(method: str, rows: int, t0: float, log: list) -> dict:
+        seconds = time.monotonic() - t0
+        return {
+            "method": method,
+            "rows": rows,
+            "batches": len(log) if log else (1 if rows else 0),
+            "retries": sum(b["attempts"] - 1 for b in log),
+            "seconds": round(seconds, 3),
+            "rows_per_sec": round(rows / seconds) if seconds > 0 else 0,
+            "batch_log": log,
+        }
+
+
+def format_stats(table: str, stats: dict) -> str:
+    line = (f"{table}: {stats['rows']} rows via {stats['method']} in {stats['seconds']}s "
+            f"({stats['rows_per_sec']:,} rows/s")
+    if stats["method"] == "postgrest":
+        sizes = [b["rows"] for b in stats["batch_log"]] or [0]
+        line += f", {stats['batches']} batches of {min(sizes)}-{max(sizes)}, {stats['retries']} retries"
+    return line + ")"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Bulk-load a CSV or Parquet file into a Supabase table")
+    parser.add_argument("table")
+    parser.add_argument("file", help="CSV or Parquet file; its columns must match the table's")
+    parser.add_argument("--on-conflict", default="", help="Upsert on these comma-separated columns (default: insert)")
+    parser.add_argument("--concurrency", type=int, default=DEFAULT_CONCURRENCY, help=f"PostgREST batches in flight (default {DEFAULT_CONCURRENCY})")
+    parser.add_argument("--postgrest", action="store_true", help="Don't use COPY even if SUPABASE_DB_URL / DATABASE_URL is set")
+    args = parser.parse_args()
+
+    from send_ledger import get_supabase
+    path = Path(args.file)
+    df = pd.read_parquet(path) if path.suffix == ".parquet" else pd.read_csv(path, dtype=str)
+    loader = BulkLoader(get_supabase(), dsn="" if args.postgrest else None, concurrency=args.concurrency)
+    stats = loader.load(args.table, df, on_conflict=args.on_conflict or None)
+    print(format_stats(args.table, stats))
+
+
+if __name__ == "__main__":
+    main()
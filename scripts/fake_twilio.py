@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+"""
+Local fake of the Twilio Messages API for offline sends and tests.
+
+POST /2010-04-01/Accounts/{sid}/Messages.json (form To, From, Body) answers like Twilio:
+201 with {"sid": "SM...", "status": "queued", ...}, 429 (code 20429) when the configured
+per-second rate is exceeded or on random throttling, 500 on random server errors, and
+400 (code 21211) for numbers that aren't valid E.164 US numbers. Accepted messages are kept
+in server.messages. When the request has a StatusCallback URL, "sent" and then "delivered"
+(or "undelivered" with ErrorCode 30003 for --undelivered-rate of them) are POSTed to it.
+
+Usage:
+  python scripts/fake_twilio.py --port 8089 [--latency-ms 80] [--rate-limit 10] [--error-rate 0.05]
+  TWILIO_API_BASE=http://127.0.0.1:8089 TWILIO_ACCOUNT_SID=AC1 TWILIO_AUTH_TOKEN=x TWILIO_FROM=+19015550000 \\
+    python scripts/send_campaign.py --send --rate 10
+"""
+import argparse
+import json
+import urllib.request
+import random
+import re
+import threading
+import time
+import uuid
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlencode
+
+MESSAGES_PATH_RE = re.compile(r"^/2010-04-01/Accounts/([^/]+)/Messages\.json$")
+E164_US_RE = re.compile(r"^\+1[2-9]\d{2}[2-9]\d{6}$")
+
+
+class FakeTwilioServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, addr, latency_ms: float = 0.0, rate_limit: float = 0.0, error_rate: float = 0.0,
+                 throttle_rate: float = 0.0, undelivered_rate: float = 0.0, seed: int | None = None):
+        super().__init__(addr, _Handler)
+        self.latency_ms = latency_ms
+        self.rate_limit = rate_limit
+        self.error_rate = error_rate
+        self.throttle_rate = throttle_rate
+        self.undelivered_rate = undelivered_rate
+        self.messages = []
+        self.requests = 0
+        self._recent = deque()
+        self._lock = threading.Lock()
+        self._rng = random.Random(seed)
+
+    @property
+    def url(self) -> str:
+        return f"http://{self.server_address[0]}:{self.server_address[1]}"
+
+    def _over_rate(self) -> bool:
+        """Sliding one-second window, like a sender's messages-per-second limit."""
+        if not self.rate_limit:
+            return False
+        now = time.monotonic()
+        while self._recent and now - self._recent[0] >= 1.0:
+            self._recent.popleft()
+        if len(self._recent) >= self.rate_limit:
+            return True
+        self._recent.append(now)
+        return False
+
+    def decide(self, form: dict) -> tuple[int, dict]:
+        to = form.get("To", "")
+        with self._lock:
+            self.requests += 1
+            roll = self._rng.random()
+            if self._over_rate() or roll < self.throttle_rate:
+                return 429, {"code": 20429, "message": "Too Many Requests", "status": 429}
+            if roll < self.throttle_rate + self.error_rate:
+                return 500, {"code": 20500, "message": "Internal Server Error", "status": 500}
+            if not E164_US_RE.match(to or ""):
+                return 400, {"code": 21211, "message": f"The 'To' number {to} is not a valid phone number.", "status": 400}
+            msg = {"sid": "SM" + uuid.uuid4().hex, "status": "queued", "to": to,
+                   "from": form.get("From", ""), "body": form.get("Body", "")}
+            self.messages.append(msg)
+            callback = form.get("StatusCallback")
+            if callback:
+                final = ("undelivered", "30003") if self._rng.random() < self.undelivered_rate else ("delivered", "")
+                threading.Thread(target=self._post_statuses, args=(callback, msg["sid"], to, final), daemon=True).start()
+            return 201, dict(msg)
+
+    def _post_statuses(self, url: str, sid: str, to: str, final: tuple[str, str]):
+        for status, code in (("sent", ""), final):
+            data = {"MessageSid": sid, "MessageStatus": status, "To": to}
+            if code:
+                data["ErrorCode"] = code
+            try:
+                urllib.request.urlopen(url, data=urlencode(data).encode(), timeout=10).close()
+            except Exception:
+                pass
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive, so connection pooling is exercised
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        form = {k: v[0] for k, v in parse_qs(self.rfile.read(length).decode()).items()}
+        if not MESSAGES_PATH_RE.match(self.path):
+            return self._reply(404, {"code": 20404, "message": "Not found", "status": 404})
+        if self.server.latency_ms:
+            time.sleep(self.server.latency_ms / 1000)
+        status, payload = self.server.decide(form)
+        self._reply(status, payload, retry_after="1" if status == 429 else None)
+
+    def _reply(self, status: int, payload: dict, retry_after: str | None = None):
+        data = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        if retry_after:
+            self.send_header("Retry-After", retry_after)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, *args):
+        pass
+
+
+def start_fake_twilio(port: int = 0, **kwargs) -> FakeTwilioServer:
+    """Start a FakeTwilioServer on 127.0.0.1 in a daemon thread; call .shutdown() when done."""
+    server = FakeTwilioServer(("127.0.0.1", port), **kwargs)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fake Twilio Messages API for offline testing")
+    parser.add_argument("--port", type=int, default=8089)
+    parser.add_argument("--latency-ms", type=float, default=80.0, help="Simulated API latency (default 80)")
+    parser.add_argument("--rate-limit", type=float, default=0.0, help="429 above this many msgs/sec (0 = off)")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Share of random 500s")
+    parser.add_argument("--throttle-rate", type=float, default=0.0, help="Share of random 429s")
+    parser.add_argument("--undelivered-rate", type=float, default=0.0, help="Share reported undelivered to StatusCallback")
+    args = parser.parse_args()
+    server = FakeTwilioServer(("127.0.0.1", args.port), latency_ms=args.latency_ms, rate_limit=args.rate_limit,
+                              error_rate=args.error_rate, throttle_rate=args.throttle_rate,
+                              undelivered_rate=args.undelivered_rate)
+    print(f"Fake Twilio on {server.url} (TWILIO_API_BASE={server.url})")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    print(f"{len(server.messages)} messages accepted, {server.requests} requests")
+
+
+if __name__ == "__main__":
+    main()
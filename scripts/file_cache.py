@@ -0,0 +1,57 @@
+"""
+Per-process cache of parsed files, invalidated by mtime and size. Pays off in long-lived
+processes (the worker's warm pool, scripts/warm_pool.py), where every dry run would otherwise
+re-parse the same SMS list, lead file and warm-lead export; a one-shot script reads once either way.
+
+  df = read_csv_cached(root / "sms_cell_list.csv")              # a copy, safe to modify
+  value = cached(path, lambda p: expensive_parse(p), "variant")  # any loader
+"""
+import os
+import threading
+from pathlib import Path
+
+import pandas as pd
+
+MAX_ENTRIES = 32
+
+_cache = {}  # (resolved path, key) -> ((mtime_ns, size), value)
+_lock = threading.Lock()
+
+
+def file_stamp(path) -> tuple | None:
+    """(mtime_ns, size) of path, or None if it doesn't exist."""
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return st.st_mtime_ns, st.st_size
+
+
+def cached(path, load, *key):
+    """load(path), reused until the file's mtime or size changes; key tells apart different loads of one file."""
+    path = Path(path).resolve()
+    stamp = file_stamp(path)
+    entry_key = (str(path), key)
+    with _lock:
+        hit = _cache.get(entry_key)
+    if stamp is not None and hit is not None and hit[0] == stamp:
+        return hit[1]
+    value = load(path)
+    if stamp is not None and file_stamp(path) == stamp:  # don't keep a read of a file that changed under us
+        with _lock:
+            _cache.pop(entry_key, None)
+            while len(_cache) >= MAX_ENTRIES:
+                _cache.pop(next(iter(_cache)))
+            _cache[entry_key] = (stamp, value)
+    return value
+
+
+def read_csv_cached(path, **kwargs) -> pd.DataFrame:
+    """pd.read_csv(path, **kwargs) through the cache; returns a copy, so callers can add columns and filter."""
+    df = cached(path, lambda p: pd.read_csv(p, **kwargs), "read_csv", repr(sorted(kwargs.items())))
+    return df.copy()
+
+
+def clear():
+    with _lock:
+        _cache.clear()
@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+"""
+Load generator for the inbound SMS webhook: replays Twilio-style form POSTs (From, To, Body,
+MessageSid) with N concurrent clients and reports throughput and latency percentiles.
+
+Either point it at a running server (--url) or let it start one in-process (--serve sync|batch)
+with its CSVs and index in a temporary INBOUND_DATA_DIR, so nothing in the repo is touched.
+
+Usage:
+  python scripts/inbound_load_test.py --serve batch --requests 5000 --concurrency 50
+  python scripts/inbound_load_test.py --serve sync --requests 5000 --concurrency 50
+  python scripts/inbound_load_test.py --url http://127.0.0.1:5000/inbound-sms --requests 2000
+"""
+import argparse
+import contextlib
+import io
+import logging
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import requests
+
+BODIES = {
+    "stop": ["STOP", "stop please", "Unsubscribe", "remove me"],
+    "yes": ["YES", "Yes please", "Interested, call me", "sure, how much for a quote?"],
+    "other": ["who is this?", "wrong number", "ok", "not now"],
+}
+
+
+def _payloads(n: int, phones: int, stop_ratio: float, yes_ratio: float, seed: int) -> list[dict]:
+    rng = random.Random(seed)
+    out = []
+    for i in range(n):
+        r = rng.random()
+        kind = "stop" if r < stop_ratio else "yes" if r < stop_ratio + yes_ratio else "other"
+        out.append({
+            "From": f"+1901555{rng.randrange(phones):04d}",
+            "To": "+19015550000",
+            "Body": rng.choice(BODIES[kind]),
+            "MessageSid": f"SM{i:032x}",
+            "AccountSid": "AC" + "0" * 32,
+        })
+    return out
+
+
+def _serve(mode: str):
+    """Start the webhook in a background thread; returns (url, server, app)."""
+    from werkzeug.serving import make_server
+
+    import inbound_sms_handler
+
+    logging.getLogger("werkzeug").setLevel(logging.ERROR)
+    app = inbound_sms_handler.create_app(batch_writes=(mode == "batch"))
+    server = make_server("127.0.0.1", 0, app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return f"http://127.0.0.1:{server.server_port}/inbound-sms", server, app
+
+
+def run_load(url: str, payloads: list[dict], concurrency: int) -> dict:
+    """POST every payload with `concurrency` keep-alive clients. Returns latency/throughput stats."""
+    local = threading.local()
+
+    def post(data):
+        if not hasattr(local, "session"):
+            local.session = requests.Session()
+        t0 = time.perf_counter()
+        try:
+            status = local.session.post(url, data=data, timeout=30).status_code
+        except requests.RequestException:
+            status = 0
+        return time.perf_counter() - t0, status
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as ex:
+        results = list(ex.map(post, payloads))
+    elapsed = time.perf_counter() - start
+    lat = np.array([r[0] for r in results]) * 1000
+    statuses = {}
+    for _, s in results:
+        statuses[s] = statuses.get(s, 0) + 1
+    return {
+        "requests": len(results),
+        "seconds": elapsed,
+        "rps": len(results) / elapsed if elapsed else 0.0,
+        "p50": float(np.percentile(lat, 50)),
+        "p90": float(np.percentile(lat, 90)),
+        "p99": float(np.percentile(lat, 99)),
+        "max": float(lat.max()),
+        "statuses": statuses,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay Twilio-style inbound SMS POSTs and report latency")
+    target = parser.add_mutually_exclusive_group(required=True)
+    target.add_argument("--url", help="Webhook URL of a running server")
+    target.add_argument("--serve", choices=["sync", "batch"], help="Start the webhook in-process (temp data dir)")
+    parser.add_argument("--requests", type=int, default=2000, help="Total POSTs (default 2000)")
+    parser.add_argument("--concurrency", type=int, default=50, help="Concurrent clients (default 50)")
+    parser.add_argument("--phones", type=int, default=500, help="Distinct sender numbers (default 500)")
+    parser.add_argument("--stop-ratio", type=float, default=0.2, help="Share of STOP replies (default 0.2)")
+    parser.add_argument("--yes-ratio", type=float, default=0.3, help="Share of interested replies (default 0.3)")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    payloads = _payloads(args.requests, args.phones, args.stop_ratio, args.yes_ratio, args.seed)
+    server = app = None
+    tmp = None
+    quiet = contextlib.nullcontext()
+    if args.serve:
+        tmp = tempfile.TemporaryDirectory(prefix="inbound_load_")
+        os.environ["INBOUND_DATA_DIR"] = tmp.name
+        url, server, app = _serve(args.serve)
+        quiet = contextlib.redirect_stdout(io.StringIO())  # per-request "Inbound: ..." lines
+    else:
+        url = args.url
+
+    with quiet:
+        stats = run_load(url, payloads, args.concurrency)
+        if server is not None:
+            server.shutdown()
+            for name in ("reply_writer", "status_writer"):
+                writer = app.extensions.get(name)
+                if writer is not None:
+                    writer.stop()
+
+    label = f"in-process {args.serve}" if args.serve else url
+    print(f"{stats['requests']} requests, concurrency {args.concurrency} ({label})")
+    print(f"  throughput: {stats['rps']:.0f} req/s over {stats['seconds']:.2f}s")
+    print(f"  latency ms: p50 {stats['p50']:.2f}  p90 {stats['p90']:.2f}  p99 {stats['p99']:.2f}  max {stats['max']:.2f}")
+    print(f"  statuses:   {stats['statuses']}")
+    if tmp is not None:
+        for name in ("opt_outs.csv", "warm_leads.csv"):
+            path = os.path.join(tmp.name, name)
+            rows = sum(1 for _ in open(path)) - 1 if os.path.exists(path) else 0
+            print(f"  {name}: {rows} rows")
+        tmp.cleanup()
+    if stats["statuses"].get(200, 0) != stats["requests"]:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
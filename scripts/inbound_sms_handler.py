@@ -1,19 +1,47 @@
 #!/usr/bin/env python3
 """
-Inbound SMS webhook: opt-out vs interest → update opt_outs.csv and warm_leads.csv.
+Inbound SMS webhook: opt-out vs interest → update the suppression index (opt_outs.csv) and warm_leads.csv.
 Designed for Twilio: POST with From, Body (and optionally To). Run as Flask app and
 point Twilio inbound webhook URL to http(s)://your-host/inbound-sms.
 
+With --batch (or create_app(batch_writes=True)) the request only classifies the reply and
+queues it; Twilio gets its TwiML immediately and a background ReplyWriter flushes the queue
+in batches (one index transaction and one CSV append per list, optionally mirrored to the
+Supabase opt_outs / warm_leads tables). A CSV row is appended inside its index transaction, so
+the two never disagree; a batch that fails is retried rather than dropped, and pending replies
+are flushed on shutdown.
+
+POST /sms-status takes Twilio message status callbacks (send_campaign --status-callback points
+Twilio at it, with ?campaign=<id>). Events are folded into the send ledger (send_ledger.sqlite3):
+latest status per message plus running per-campaign counters and error-code histograms, batched
+by a StatusWriter in --batch mode. GET /sms-status/<campaign id> returns the counters as JSON.
+
 Usage:
-  TWILIO_AUTH_TOKEN=... python scripts/inbound_sms_handler.py
+  TWILIO_AUTH_TOKEN=... python scripts/inbound_sms_handler.py [--batch] [--supabase] [--port 5000]
   Then set Twilio phone number webhook to: https://your-domain/inbound-sms
+  Production (threaded workers, batched writes):
+    gunicorn --chdir scripts -k gthread -w 1 --threads 32 -b 0.0.0.0:5000 \\
+      "inbound_sms_handler:create_app(batch_writes=True)"
+  INBOUND_DATA_DIR=/some/dir moves the CSVs and index out of the repo root (e.g. for load tests).
 """
+import argparse
+import atexit
 import csv
+import io
 import os
+import queue
 import re
+import sys
+import threading
+import time
+from abc import ABC, abstractmethod
 from datetime import datetime, timezone
 from pathlib import Path
 
+from phone_utils import phone_digits
+from send_ledger import DEFAULT_LEDGER, SendLedger, status_event
+from suppression import DEFAULT_INDEX, SuppressionIndex
+
 # Opt-out keywords (case-insensitive)
 OPT_OUT_KEYWORDS = re.compile(r"\b(stop|unsubscribe|cancel|opt\s*out|remove)\b", re.I)
 # Interest keywords → warm lead
@@ -22,59 +50,147 @@ INTEREST_KEYWORDS = re.compile(r"\b(yes|sure|interested|quote|help|call\s*me|ple
 OPT_OUTS_CSV = "opt_outs.csv"
 WARM_LEADS_CSV = "warm_leads.csv"
 SOURCE_CAMPAIGN_DEFAULT = "SMS-neighborhood"
+OPT_OUT_FIELDS = ["Phone_Number", "Date", "Source"]
+WARM_LEAD_FIELDS = ["Phone_Number", "Full_Name", "Address", "First_Reply_Text", "Reply_Time", "Source_Campaign"]
+
+TWIML_OPT_OUT = '<?xml version="1.0" encoding="UTF-8"?><Response><Message>You\'re unsubscribed. We won\'t text again.</Message></Response>'
+TWIML_WARM_LEAD = '<?xml version="1.0" encoding="UTF-8"?><Response><Message>Thanks! We\'ll call you shortly.</Message></Response>'
+
+# Background writer: flush when this many replies are queued or this long after the first one
+BATCH_SIZE = 200
+FLUSH_INTERVAL_SEC = 0.25
+# A batch that failed to write is retried this often (and up to STOP_RETRIES times on shutdown)
+RETRY_INTERVAL_SEC = 1.0
+STOP_RETRIES = 3
 
 
 def project_root():
     return Path(__file__).resolve().parent.parent
 
 
+def data_dir() -> Path:
+    """Where opt_outs.csv, warm_leads.csv and the index live (INBOUND_DATA_DIR or the repo root)."""
+    return Path(os.environ.get("INBOUND_DATA_DIR") or project_root())
+
+
 def normalize_phone(s: str) -> str:
-    digits = re.sub(r"\D", "", str(s))
-    return digits[-10:] if len(digits) >= 10 else ""
+    """10-digit US number, or '' if not a valid NANP phone (see phone_utils)."""
+    return phone_digits(s)
+
+
+def _utc_now() -> str:
+    return datetime.now(timezone.utc).strftime("%Y-%m-%d %H:%M:%S UTC")
+
 
+def _open_for_append(path: Path):
+    """Open a CSV for appending, first ending a last line left without a newline (else the row joins it)."""
+    if path.exists() and path.stat().st_size:
+        with open(path, "rb") as f:
+            f.seek(-1, os.SEEK_END)
+            needs_newline = f.read(1) not in (b"\n", b"\r")
+        if needs_newline:
+            with open(path, "a", newline="") as f:
+                f.write("\r\n")
+    return open(path, "a", newline="")
 
-def append_opt_out(phone: str, source: str = "SMS reply"):
-    path = project_root() / OPT_OUTS_CSV
-    row = {"Phone_Number": phone, "Date": datetime.now(timezone.utc).strftime("%Y-%m-%d %H:%M:%S UTC"), "Source": source}
-    file_exists = path.exists()
-    with open(path, "a", newline="") as f:
-        w = csv.DictWriter(f, fieldnames=["Phone_Number", "Date", "Source"])
-        if not file_exists:
+
+# Process-wide phone indexes (scripts/suppression.py), opened and synced with their CSV on first use
+_indexes: dict[str, SuppressionIndex] = {}
+_indexes_lock = threading.Lock()
+_csv_lock = threading.Lock()  # one appender at a time per process
+
+
+def _append_rows(path: Path, fieldnames: list[str], rows: list[dict]):
+    """Append rows with a single write (header first if the file is new)."""
+    if not rows:
+        return
+    with _csv_lock:
+        buf = io.StringIO()
+        w = csv.DictWriter(buf, fieldnames=fieldnames)
+        if not path.exists():
             w.writeheader()
-        w.writerow(row)
+        w.writerows(rows)
+        with _open_for_append(path) as f:
+            f.write(buf.getvalue())
+
+
+def phone_index(table: str) -> SuppressionIndex:
+    """Indexed store for "opt_outs" or "warm_leads": O(1) idempotent lookups and inserts."""
+    with _indexes_lock:
+        if table not in _indexes:
+            idx = SuppressionIndex(data_dir() / DEFAULT_INDEX, table=table)
+            idx.sync_csv(data_dir() / (OPT_OUTS_CSV if table == "opt_outs" else WARM_LEADS_CSV))
+            _indexes[table] = idx
+        return _indexes[table]
+
+
+def suppression_index() -> SuppressionIndex:
+    return phone_index("opt_outs")
+
+
+_ledger: SendLedger | None = None
+
 
+def delivery_ledger() -> SendLedger:
+    """Process-wide send ledger that status callbacks are applied to."""
+    global _ledger
+    with _indexes_lock:
+        if _ledger is None:
+            _ledger = SendLedger(data_dir() / DEFAULT_LEDGER)
+        return _ledger
 
-def append_warm_lead(phone: str, body: str, full_name: str = "", address: str = "", source_campaign: str = SOURCE_CAMPAIGN_DEFAULT):
-    path = project_root() / WARM_LEADS_CSV
-    row = {
+
+def _opt_out_row(phone: str, source: str, date: str) -> dict:
+    return {"Phone_Number": phone, "Date": date, "Source": source}
+
+
+def _warm_lead_row(phone: str, body: str, reply_time: str, full_name: str = "", address: str = "",
+                   source_campaign: str = SOURCE_CAMPAIGN_DEFAULT) -> dict:
+    return {
         "Phone_Number": phone,
         "Full_Name": full_name or "",
         "Address": address or "",
         "First_Reply_Text": body[:500],
-        "Reply_Time": datetime.now(timezone.utc).strftime("%Y-%m-%d %H:%M:%S UTC"),
+        "Reply_Time": reply_time,
         "Source_Campaign": source_campaign,
     }
-    file_exists = path.exists()
-    with open(path, "a", newline="") as f:
-        w = csv.DictWriter(
-            f, fieldnames=["Phone_Number", "Full_Name", "Address", "First_Reply_Text", "Reply_Time", "Source_Campaign"]
-        )
-        if not file_exists:
-            w.writeheader()
-        w.writerow(row)
+
+
+def append_opt_out(phone: str, source: str = "SMS reply") -> bool:
+    """Record an opt-out; opt_outs.csv gets a row only the first time. Returns True if new."""
+    date = _utc_now()
+    # The CSV row is appended inside the index transaction: if it fails, the opt-out isn't
+    # marked as known either, and the error reaches the caller
+    return suppression_index().add(phone, source=source, date=date, before_commit=lambda: _append_rows(
+        data_dir() / OPT_OUTS_CSV, OPT_OUT_FIELDS, [_opt_out_row(phone, source, date)]))
+
+
+def append_warm_lead(
+    phone: str, body: str, full_name: str = "", address: str = "", source_campaign: str = SOURCE_CAMPAIGN_DEFAULT
+) -> bool:
+    """Record a warm lead; warm_leads.csv gets a row only the first time. Returns True if new."""
+    reply_time = _utc_now()
+    # The index insert is the atomic check-and-set: concurrent replies from one phone append once
+    row = _warm_lead_row(phone, body, reply_time, full_name, address, source_campaign)
+    return phone_index("warm_leads").add(phone, source=source_campaign, date=reply_time, before_commit=lambda: (
+        _append_rows(data_dir() / WARM_LEADS_CSV, WARM_LEAD_FIELDS, [row])))
 
 
 def warm_lead_exists(phone: str) -> bool:
-    path = project_root() / WARM_LEADS_CSV
-    if not path.exists():
-        return False
-    p = normalize_phone(phone)
-    with open(path) as f:
-        r = csv.DictReader(f)
-        for row in r:
-            if normalize_phone(row.get("Phone_Number", "")) == p:
-                return True
-    return False
+    return phone_index("warm_leads").contains(phone)
+
+
+def classify_reply(from_number: str, body: str) -> tuple[str | None, str, str]:
+    """("opt_out" | "warm_lead" | None, 10-digit phone or '', stripped body)."""
+    phone = normalize_phone(from_number)
+    body_clean = (body or "").strip()
+    if not phone:
+        return None, "", body_clean
+    if OPT_OUT_KEYWORDS.search(body_clean):
+        return "opt_out", phone, body_clean
+    if INTEREST_KEYWORDS.search(body_clean):
+        return "warm_lead", phone, body_clean
+    return None, phone, body_clean
 
 
 def handle_inbound(from_number: str, body: str) -> tuple[str, str | None]:
@@ -82,41 +198,277 @@ def handle_inbound(from_number: str, body: str) -> tuple[str, str | None]:
     Returns (response_message, twiml_response).
     response_message is for logging; twiml_response is the TwiML to return (or None for 200 only).
     """
-    phone = normalize_phone(from_number)
+    kind, phone, body_clean = classify_reply(from_number, body)
     if not phone:
         return "Invalid phone", None
 
-    body_clean = (body or "").strip()
-
-    if OPT_OUT_KEYWORDS.search(body_clean):
+    if kind == "opt_out":
         append_opt_out(phone)
-        return "Opt-out recorded", '<?xml version="1.0" encoding="UTF-8"?><Response><Message>You\'re unsubscribed. We won\'t text again.</Message></Response>'
+        return "Opt-out recorded", TWIML_OPT_OUT
 
-    if INTEREST_KEYWORDS.search(body_clean):
-        if not warm_lead_exists(phone):
-            append_warm_lead(phone, body_clean, source_campaign=SOURCE_CAMPAIGN_DEFAULT)
-        return "Warm lead recorded", '<?xml version="1.0" encoding="UTF-8"?><Response><Message>Thanks! We\'ll call you shortly.</Message></Response>'
+    if kind == "warm_lead":
+        append_warm_lead(phone, body_clean, source_campaign=SOURCE_CAMPAIGN_DEFAULT)
+        return "Warm lead recorded", TWIML_WARM_LEAD
 
     return "Reply logged (no action)", None
 
 
+class _BatchWriter(ABC):
+    """
+    Queue drained by a daemon thread every flush_interval (or batch_size items) into _flush(batch).
+    A batch whose _flush raises is kept and retried with the next one (every retry_interval when
+    nothing new arrives), so nothing is dropped on a transient error. stop() (also registered with
+    atexit) flushes whatever is still queued or waiting for a retry.
+    """
+
+    _STOP = object()
+    thread_name = "batch-writer"
+
+    def __init__(self, batch_size: int = BATCH_SIZE, flush_interval: float = FLUSH_INTERVAL_SEC,
+                 retry_interval: float = RETRY_INTERVAL_SEC):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.retry_interval = retry_interval
+        self.queue = queue.Queue()
+        self.flushed = 0
+        self.failures = 0
+        self._failed = []  # items of batches that failed, retried first
+        self._thread = None
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name=self.thread_name, daemon=True)
+            self._thread.start()
+            atexit.register(self.stop)
+        return self
+
+    def _run(self):
+        stopping = False
+        while not stopping:
+            batch, self._failed = self._failed, []
+            try:
+                batch.append(self.queue.get(timeout=self.retry_interval if batch else None))
+            except queue.Empty:
+                pass
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.batch_size and not (batch and batch[-1] is self._STOP):
+                try:
+                    batch.append(self.queue.get(timeout=max(0.0, deadline - time.monotonic())))
+                except queue.Empty:
+                    break
+            if any(item is self._STOP for item in batch):
+                stopping = True
+                batch = [item for item in batch if item is not self._STOP]
+            self._try_flush(batch)
+
+    def _try_flush(self, batch: list) -> bool:
+        if not batch:
+            return True
+        try:
+            self._flush(batch)
+        except Exception as e:
+            self.failures += 1
+            self._failed = batch + self._failed
+            print(f"{self.thread_name}: failed to write {len(batch)} items, will retry: {e}", file=sys.stderr)
+            return False
+        self.flushed += len(batch)
+        return True
+
+    @abstractmethod
+    def _flush(self, batch: list):
+        """Write the batch; raise to have it retried."""
+
+    def stop(self, timeout: float = 10.0):
+        """Flush everything queued so far and stop the thread (idempotent)."""
+        if self._thread is not None and self._thread.is_alive():
+            self.queue.put(self._STOP)
+            self._thread.join(timeout)
+        # Items queued after the stop marker (requests still in flight), and any failed batch
+        rest, self._failed = self._failed, []
+        while True:
+            try:
+                item = self.queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is not self._STOP:
+                rest.append(item)
+        for attempt in range(STOP_RETRIES):
+            if attempt:
+                time.sleep(self.retry_interval)
+            rest, self._failed = self._failed or rest, []
+            if self._try_flush(rest):
+                return
+        print(f"{self.thread_name}: giving up on {len(self._failed)} items at shutdown: {self._failed!r}",
+              file=sys.stderr)
+
+
+class ReplyWriter(_BatchWriter):
+    """
+    Background writer for the batched webhook: submit() only queues; each batch inserts each
+    list's phones into the index in one transaction and appends only the new ones to the CSV in
+    one write, then mirrors them to Supabase when a client is given.
+    """
+
+    thread_name = "reply-writer"
+
+    def __init__(self, batch_size: int = BATCH_SIZE, flush_interval: float = FLUSH_INTERVAL_SEC, supabase=None,
+                 retry_interval: float = RETRY_INTERVAL_SEC):
+        super().__init__(batch_size, flush_interval, retry_interval)
+        self.supabase = supabase
+        self._unmirrored = {"opt_outs": [], "warm_leads": []}  # written locally, not yet in Supabase
+
+    def submit(self, kind: str, phone: str, body: str):
+        self.queue.put((kind, phone, body, _utc_now()))
+
+    def _flush(self, batch: list):
+        # Each list's CSV rows are appended inside its index transaction, so a failure leaves the
+        # phones unknown to the index and the retried batch writes them again. A list that did
+        # commit finds its phones known on the retry and isn't appended twice.
+        opt = [(phone, "SMS reply", t) for kind, phone, _, t in batch if kind == "opt_out"]
+        warm = [(phone, body, t) for kind, phone, body, t in batch if kind == "warm_lead"]
+        new_opt, new_warm = [], []
+
+        def write_opt(new: list):
+            new_opt[:] = [_opt_out_row(phone, source, t) for (phone, source, t), n in zip(opt, new) if n]
+            _append_rows(data_dir() / OPT_OUTS_CSV, OPT_OUT_FIELDS, new_opt)
+
+        def write_warm(new: list):
+            new_warm[:] = [_warm_lead_row(phone, body, t) for (phone, body, t), n in zip(warm, new) if n]
+            _append_rows(data_dir() / WARM_LEADS_CSV, WARM_LEAD_FIELDS, new_warm)
+
+        if opt:
+            suppression_index().add_rows(opt, before_commit=write_opt)
+            self._unmirrored["opt_outs"].extend(new_opt)
+        if warm:
+            phone_index("warm_leads").add_rows([(p, SOURCE_CAMPAIGN_DEFAULT, t) for p, _, t in warm],
+                                               before_commit=write_warm)
+            self._unmirrored["warm_leads"].extend(new_warm)
+        if self.supabase is not None:
+            self._mirror_to_supabase()
+
+    def _mirror_to_supabase(self):
+        """
+        Insert the rows not yet in Supabase. Rows that fail stay pending and the batch is failed,
+        so it is retried; locally its phones are known by then, so only the mirror is redone.
+        """
+        rows = {
+            "opt_outs": [{"phone_number": r["Phone_Number"], "date": r["Date"], "source": r["Source"]}
+                         for r in self._unmirrored["opt_outs"]],
+            "warm_leads": [{"phone_number": r["Phone_Number"], "first_reply_text": r["First_Reply_Text"],
+                            "reply_time": r["Reply_Time"], "source_campaign": r["Source_Campaign"]}
+                           for r in self._unmirrored["warm_leads"]],
+        }
+        errors = []
+        for table, data in rows.items():
+            if not data:
+                continue
+            try:
+                self.supabase.table(table).insert(data).execute()
+            except Exception as e:
+                errors.append(f"{table} ({len(data)} rows): {e}")
+                continue
+            del self._unmirrored[table][:len(data)]
+        if errors:
+            raise RuntimeError("Supabase insert failed: " + "; ".join(errors))
+
+
+class StatusWriter(_BatchWriter):
+    """
+    Batches status callback events into one SendLedger.apply_status_events() transaction; a
+    batch that fails is retried like any other (events are idempotent per SID and status).
+    """
+
+    thread_name = "status-writer"
+
+    def __init__(self, ledger: SendLedger | None = None, batch_size: int = BATCH_SIZE,
+                 flush_interval: float = FLUSH_INTERVAL_SEC, retry_interval: float = RETRY_INTERVAL_SEC):
+        super().__init__(batch_size, flush_interval, retry_interval)
+        self.ledger = ledger
+
+    def submit(self, event: dict):
+        self.queue.put(event)
+
+    def _flush(self, batch: list):
+        # A failed transaction is rolled back and the batch retried, so the counters never drift
+        (self.ledger or delivery_ledger()).apply_status_events(batch)
+
+
+def _supabase_client():
+    url = os.environ.get("SUPABASE_URL") or os.environ.get("NEXT_PUBLIC_SUPABASE_URL")
+    key = os.environ.get("SUPABASE_SERVICE_ROLE_KEY")
+    if not url or not key:
+        print("Set SUPABASE_URL and SUPABASE_SERVICE_ROLE_KEY to mirror replies to Supabase.", file=sys.stderr)
+        return None
+    try:
+        from supabase import create_client
+        return create_client(url, key)
+    except Exception as e:
+        print(f"Supabase client error: {e}", file=sys.stderr)
+        return None
+
+
 # Flask app for Twilio webhook
-def create_app():
-    from flask import Flask, request, Response
+def create_app(batch_writes: bool = False, supabase: bool = False, writer: ReplyWriter | None = None,
+               status_writer: StatusWriter | None = None):
+    """
+    batch_writes=True answers with TwiML right away and leaves the writes to a ReplyWriter and
+    status callbacks to a StatusWriter (pass writer= / status_writer= to share or inspect them);
+    supabase=True mirrors batched reply writes to Supabase.
+    """
+    from flask import Flask, Response, jsonify, request
 
     app = Flask(__name__)
+    if batch_writes and writer is None:
+        writer = ReplyWriter(supabase=_supabase_client() if supabase else None)
+    if batch_writes and status_writer is None:
+        status_writer = StatusWriter()
+    if writer is not None:
+        writer.start()
+        app.extensions["reply_writer"] = writer
+    if status_writer is not None:
+        status_writer.start()
+        app.extensions["status_writer"] = status_writer
 
     @app.route("/inbound-sms", methods=["POST", "GET"])
     def inbound_sms():
         # Twilio sends POST with From, To, Body
         from_num = request.values.get("From", "")
         body = request.values.get("Body", "")
-        msg, twiml = handle_inbound(from_num, body)
+        if writer is not None:
+            kind, phone, body_clean = classify_reply(from_num, body)
+            if kind:
+                writer.submit(kind, phone, body_clean)
+            twiml = TWIML_OPT_OUT if kind == "opt_out" else TWIML_WARM_LEAD if kind == "warm_lead" else None
+            msg = f"{kind} queued" if kind else ("Reply logged (no action)" if phone else "Invalid phone")
+        else:
+            msg, twiml = handle_inbound(from_num, body)
         print(f"Inbound: {from_num} -> {msg}")
         if twiml:
             return Response(twiml, mimetype="application/xml")
         return "", 200
 
+    @app.route("/sms-status", methods=["POST"])
+    def sms_status():
+        # Twilio status callback: MessageSid, MessageStatus, ErrorCode (+ ?campaign= from send_campaign)
+        event = status_event(request.values, request.args.get("campaign", ""))
+        if event is None:
+            return "", 400
+        if status_writer is not None:
+            status_writer.submit(event)
+        else:
+            delivery_ledger().apply_status_events([event])
+        return "", 204
+
+    @app.route("/sms-status/<path:campaign_id>", methods=["GET"])
+    def sms_status_counts(campaign_id):
+        ledger = status_writer.ledger if status_writer is not None and status_writer.ledger else delivery_ledger()
+        return jsonify({
+            "campaign_id": campaign_id,
+            "counts": ledger.delivery_counts(campaign_id),
+            "errors": {str(k): v for k, v in ledger.delivery_errors(campaign_id).items()},
+            "failure_rate": ledger.failure_rate(campaign_id),
+        })
+
     @app.route("/health")
     def health():
         return "ok", 200
@@ -126,5 +478,10 @@ def create_app():
 
 if __name__ == "__main__":
     # Optional: verify Twilio signature with TWILIO_AUTH_TOKEN
-    app = create_app()
-    app.run(host="0.0.0.0", port=int(os.environ.get("PORT", 5000)), debug=os.environ.get("FLASK_DEBUG", "0") == "1")
+    parser = argparse.ArgumentParser(description="Inbound SMS webhook (Twilio)")
+    parser.add_argument("--batch", action="store_true", help="Reply immediately and batch writes in the background")
+    parser.add_argument("--supabase", action="store_true", help="With --batch, also insert into Supabase opt_outs/warm_leads")
+    parser.add_argument("--port", type=int, default=int(os.environ.get("PORT", 5000)))
+    args = parser.parse_args()
+    app = create_app(batch_writes=args.batch, supabase=args.supabase)
+    app.run(host="0.0.0.0", port=args.port, debug=os.environ.get("FLASK_DEBUG", "0") == "1", threaded=True)
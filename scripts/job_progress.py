@@ -0,0 +1,161 @@
+"""
+Live job output for the worker: scripts report progress on stdout, the worker streams their
+output into jobs.log / jobs.progress while they run (app/app/actions/job-progress.tsx shows both).
+
+Scripts (a no-op unless run by the worker, which sets JOB_PROGRESS=1):
+  report_progress("addresses", 340, 1000)   # prints "##progress addresses 340/1000", at most once a second
+
+Worker:
+  output = JobOutput()
+  output.add(line, stderr=False)            # from the stdout / stderr reader threads
+  log, progress = output.snapshot()         # bounded log text, latest progress dict
+
+The log keeps the first LOG_HEAD_CHARS and the last LOG_MAX_CHARS - LOG_HEAD_CHARS characters,
+with a marker for what was dropped in between, so worker memory and the row stay bounded
+however much a job prints. stderr lines go into the log as they come and into a separate
+ERROR_MAX_CHARS tail, used as jobs.error when the job fails.
+"""
+import os
+import re
+import threading
+import time
+from collections import deque
+from datetime import datetime, timezone
+
+PROGRESS_ENV = "JOB_PROGRESS"
+PROGRESS_PREFIX = "##progress "
+PROGRESS_MIN_INTERVAL_SEC = 1.0
+LOG_MAX_CHARS = 64_000
+LOG_HEAD_CHARS = 8_000
+ERROR_MAX_CHARS = 8_000
+LOG_FLUSH_LINES = 50  # flush to the job row after this many new lines...
+LOG_FLUSH_SEC = 3.0  # ...or this long after the last flush, whichever comes first
+
+_PROGRESS_RE = re.compile(r"##progress (\S+) (\d+)(?:/(\d+))?(?: (.*))?")
+_last_report = {}
+
+
+def report_progress(stage: str, done: int, total: int | None = None, message: str = "", force: bool = False):
+    """
+    Tell the worker how far a stage is (e.g. "addresses", 340, 1000). Throttled per stage to
+    PROGRESS_MIN_INTERVAL_SEC, except the first and last report; silent outside the worker.
+    """
+    if os.environ.get(PROGRESS_ENV) != "1":
+        return
+    now = time.monotonic()
+    last = _last_report.get(stage)
+    if not force and last is not None and now - last < PROGRESS_MIN_INTERVAL_SEC and done != total:
+        return
+    _last_report[stage] = now
+    line = f"{PROGRESS_PREFIX}{stage} {int(done)}" + (f"/{int(total)}" if total is not None else "")
+    if message:
+        line += " " + " ".join(message.split())
+    print(line, flush=True)
+
+
+def parse_progress(line: str) -> dict | None:
+    """The progress dict stored in jobs.progress for a "##progress ..." line, or None for any other line."""
+    m = _PROGRESS_RE.fullmatch(line.strip())
+    if not m:
+        return None
+    stage, done, total, message = m.groups()
+    return {
+        "stage": stage,
+        "done": int(done),
+        "total": int(total) if total is not None else None,
+        "message": message or "",
+        "updated_at": datetime.now(timezone.utc).isoformat().replace("+00:00", "Z"),
+    }
+
+
+class LogBuffer:
+    """Bounded text: first head_chars kept, then a rolling tail; lines dropped in between are counted."""
+
+    def __init__(self, max_chars: int = LOG_MAX_CHARS, head_chars: int = LOG_HEAD_CHARS):
+        self.head_chars = min(head_chars, max_chars)
+        self.tail_chars = max_chars - self.head_chars
+        self.head = []
+        self.tail = deque()
+        self._head_size = 0
+        self._tail_size = 0
+        self.dropped = 0
+
+    def add(self, line: str):
+        line = line.rstrip("\r\n")
+        if not self.tail and self._head_size + len(line) + 1 <= self.head_chars:
+            self.head.append(line)
+            self._head_size += len(line) + 1
+            return
+        line = line[-self.tail_chars:] if self.tail_chars else ""
+        self.tail.append(line)
+        self._tail_size += len(line) + 1
+        while self._tail_size > self.tail_chars and self.tail:
+            self._tail_size -= len(self.tail.popleft()) + 1
+            self.dropped += 1
+
+    def text(self) -> str:
+        parts = self.head
+        if self.dropped:
+            parts = parts + [f"... [{self.dropped} lines omitted] ..."]
+        return "\n".join(parts + list(self.tail)).strip()
+
+
+class JobOutput:
+    """
+    A running job's output, fed line by line from its stdout and stderr reader threads. ready is
+    set once LOG_FLUSH_LINES lines or a progress update arrived since the last snapshot(), and
+    when both streams are closed (eof), so a waiting worker notices the end right away.
+    """
+
+    def __init__(self, max_chars: int = LOG_MAX_CHARS, head_chars: int = LOG_HEAD_CHARS,
+                 error_chars: int = ERROR_MAX_CHARS):
+        self.log = LogBuffer(max_chars, head_chars)
+        self.errors = LogBuffer(error_chars, 0)
+        self.progress = None
+        self.ready = threading.Event()
+        self.eof = threading.Event()
+        self._open = 2
+        self._pending = 0
+        self._new_progress = False
+        self._lock = threading.Lock()
+
+    def add(self, line: str, stderr: bool = False):
+        progress = None if stderr else parse_progress(line)
+        with self._lock:
+            if progress is not None:
+                self.progress = progress
+                self._new_progress = True
+                self.ready.set()
+                return
+            self.log.add(line)
+            if stderr:
+                self.errors.add(line)
+            self._pending += 1
+            if self._pending >= LOG_FLUSH_LINES:
+                self.ready.set()
+
+    def close(self):
+        """One of the two streams reached EOF."""
+        with self._lock:
+            self._open -= 1
+            if self._open <= 0:
+                self.eof.set()
+                self.ready.set()
+
+    @property
+    def dirty(self) -> bool:
+        """Anything new since the last snapshot()."""
+        return self._pending > 0 or self._new_progress
+
+    def snapshot(self) -> tuple[str, dict | None]:
+        """(log text, latest progress) and reset the flush trigger."""
+        with self._lock:
+            self._pending = 0
+            self._new_progress = False
+            if not self.eof.is_set():
+                self.ready.clear()
+            return self.log.text(), self.progress
+
+    def error_text(self) -> str:
+        with self._lock:
+            return self.errors.text()
@@ -0,0 +1,147 @@
+"""
+Job wakeup for the worker: LISTEN on the jobs_pending channel (trigger in app/supabase/schema.sql
+fires on every new or requeued job, and when a running job ends and frees a lane) so the worker
+claims within milliseconds instead of on its next poll.
+
+  listener = start_listener(database_url(), pool.wake)   # None without a DB URL or psycopg2
+  poll = AdaptivePoll()
+  wait = LISTEN_POLL_SEC if listener and listener.connected.is_set() else poll.next(found)
+
+While the channel is up, polling is only a rare safety net. When it drops, the listener
+reconnects with exponential backoff and the worker polls adaptively: POLL_MIN_SEC right after a
+job was found, doubling on each empty poll up to POLL_MAX_SEC.
+
+Needs a direct Postgres connection string (SUPABASE_DB_URL or DATABASE_URL; with Supabase use
+the session pooler or the direct connection, as the transaction pooler doesn't keep LISTEN) and
+psycopg2 (pip install psycopg2-binary).
+"""
+import os
+import select
+import sys
+import threading
+import time
+
+CHANNEL = "jobs_pending"
+POLL_MIN_SEC = 1.0
+POLL_MAX_SEC = 60.0
+LISTEN_POLL_SEC = 300.0  # channel up: safety-net poll only
+RECONNECT_MIN_SEC = 1.0
+RECONNECT_MAX_SEC = 60.0
+KEEPALIVE_SEC = 30.0  # a quiet connection is checked with SELECT 1, so a dead one is noticed
+
+
+def database_url() -> str:
+    return os.environ.get("SUPABASE_DB_URL") or os.environ.get("DATABASE_URL") or ""
+
+
+class AdaptivePoll:
+    """Wait before the next poll: min_sec after a poll that found work, doubling while idle up to max_sec."""
+
+    def __init__(self, min_sec: float = POLL_MIN_SEC, max_sec: float = POLL_MAX_SEC):
+        self.min_sec = min_sec
+        self.max_sec = max_sec
+        self._current = min_sec
+
+    def next(self, found: bool) -> float:
+        if found:
+            self._current = self.min_sec
+            return self._current
+        wait = self._current
+        self._current = min(self._current * 2, self.max_sec)
+        return wait
+
+
+def _pg_connect(dsn: str):
+    import psycopg2
+
+    conn = psycopg2.connect(dsn)
+    conn.autocommit = True
+    return conn
+
+
+class JobListener:
+    """
+    Background LISTEN on CHANNEL: sets wake on every notification (and once per connect, to catch
+    up on anything missed). connected is set while the channel is up; on errors the thread
+    reconnects after RECONNECT_MIN_SEC, doubling up to RECONNECT_MAX_SEC.
+    """
+
+    def __init__(self, dsn: str, wake: threading.Event, channel: str = CHANNEL, connect=_pg_connect):
+        self.dsn = dsn
+        self.wake = wake
+        self.channel = channel
+        self.connect = connect
+        self.connected = threading.Event()
+        self.notifications = 0
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="job-listener", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(5)
+
+    def _run(self):
+        delay = RECONNECT_MIN_SEC
+        while not self._stop.is_set():
+            conn = None
+            try:
+                conn = self.connect(self.dsn)
+                with conn.cursor() as cur:
+                    cur.execute(f"LISTEN {self.channel}")
+                self.connected.set()
+                delay = RECONNECT_MIN_SEC
+                self.wake.set()
+                self._listen(conn)
+            except Exception as e:
+                print(f"Job listener: {e.__class__.__name__}: {str(e).strip()} "
+                      f"(polling; reconnect in {delay:.0f}s)", file=sys.stderr)
+            finally:
+                was_connected = self.connected.is_set()
+                self.connected.clear()
+                if conn is not None:
+                    try:
+                        conn.close()
+                    except Exception:
+                        pass
+            if was_connected:
+                self.wake.set()  # let the worker switch to polling right away
+            if self._stop.wait(delay):
+                break
+            delay = min(delay * 2, RECONNECT_MAX_SEC)
+
+    def _listen(self, conn):
+        quiet_since = time.monotonic()
+        while not self._stop.is_set():
+            ready, _, _ = select.select([conn], [], [], 1.0)
+            if not ready:
+                if time.monotonic() - quiet_since >= KEEPALIVE_SEC:
+                    with conn.cursor() as cur:
+                        cur.execute("SELECT 1")
+                    quiet_since = time.monotonic()
+                continue
+            quiet_since = time.monotonic()
+            conn.poll()
+            if conn.notifies:
+                self.notifications += len(conn.notifies)
+                conn.notifies.clear()
+                self.wake.set()
+
+
+def start_listener(dsn: str, wake: threading.Event) -> JobListener | None:
+    """Start a JobListener, or None (with a note) when there is no DB URL or psycopg2 isn't installed."""
+    if not dsn:
+        return None
+    try:
+        import psycopg2  # noqa: F401
+    except ImportError:
+        print("SUPABASE_DB_URL / DATABASE_URL set but psycopg2 isn't installed (pip install psycopg2-binary); "
+              "polling instead.", file=sys.stderr)
+        return None
+    return JobListener(dsn, wake).start()
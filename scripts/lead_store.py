@@ -0,0 +1,241 @@
+#!/usr/bin/env python3
+"""
+Optional columnar lead store: Parquet dataset partitioned by State/Zip (hive layout,
+lead_store/State=TN/Zip=38138/part-0.parquet) with typed columns, as an alternative to
+re-reading the whole tree_service_leads.csv for every stage.
+
+read_leads() pushes city/state/zip and phone-type filters down to the dataset, so a
+location-targeted build only opens the matching partitions. export_csv() writes the
+familiar CSV for anything that still expects it. Requires pyarrow (pip install pyarrow).
+
+Usage:
+  python scripts/lead_store.py import tree_service_leads.csv [--store lead_store] [--append]
+  python scripts/lead_store.py export --output tree_service_leads.csv [--state TN] [--zip 38138] [--city ...]
+  python scripts/lead_store.py stats
+"""
+import argparse
+import re
+import shutil
+import sys
+from pathlib import Path
+
+import pandas as pd
+
+from address_utils import ADDRESS_COLUMNS, add_address_columns
+from phone_utils import INVALID_KEY, phone_keys
+
+ROOT = Path(__file__).resolve().parent.parent
+DEFAULT_STORE = "lead_store"
+PARTITION_COLUMNS = ["State", "Zip"]
+# Known columns and their stored types; anything else is stored as string
+INT_COLUMNS = ["Phone_Key", "CBC_Result_Count"]
+CATEGORY_COLUMNS = ["Phone_Type", "Resident_Type", "Lead_Type", "Property_Type"]
+# A lead is one (Address, phone); rows whose phone has no valid key are told apart by the raw number
+DEDUPE_KEY = ["Address", "Phone_Key"]
+
+
+def _pyarrow():
+    try:
+        import pyarrow as pa
+        import pyarrow.compute as pc
+        import pyarrow.dataset as ds
+    except ImportError:
+        raise SystemExit("Install pyarrow for the lead store: pip install pyarrow")
+    return pa, pc, ds
+
+
+def store_path(store=DEFAULT_STORE) -> Path:
+    p = Path(store)
+    return p if p.is_absolute() else ROOT / p
+
+
+def _partitioning():
+    pa, _, ds = _pyarrow()
+    return ds.partitioning(pa.schema([(c, pa.string()) for c in PARTITION_COLUMNS]), flavor="hive")
+
+
+def _typed(df: pd.DataFrame) -> pd.DataFrame:
+    """Add Phone_Key / City / State / Zip and cast columns to their stored types."""
+    df = df.copy()
+    if "Address" in df.columns:
+        add_address_columns(df, "Address")
+    if "Phone_Number" in df.columns:
+        df["Phone_Key"] = phone_keys(df["Phone_Number"])
+    for c in df.columns:
+        if c in INT_COLUMNS:
+            df[c] = pd.to_numeric(df[c], errors="coerce").astype("Int64")
+        else:
+            df[c] = df[c].astype("string").str.strip()
+    for c in PARTITION_COLUMNS:
+        if c in df.columns:
+            df[c] = df[c].where(df[c] != "", None)  # blank -> null partition
+    return df
+
+
+def _dedupe(df: pd.DataFrame) -> pd.DataFrame:
+    """Drop repeated DEDUPE_KEY rows (first wins); an invalid Phone_Key (0) falls back to Phone_Number."""
+    subset = [c for c in DEDUPE_KEY if c in df.columns]
+    if not subset:
+        return df
+    keys = df[subset].astype("string")
+    if "Phone_Key" in subset and "Phone_Number" in df.columns:
+        invalid = df["Phone_Key"].fillna(INVALID_KEY) == INVALID_KEY
+        keys["Phone_Key"] = keys["Phone_Key"].mask(invalid, "raw:" + df["Phone_Number"].astype("string").fillna(""))
+    return df[~keys.duplicated(keep="first")]
+
+
+def _to_table(df: pd.DataFrame):
+    pa, _, _ = _pyarrow()
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    for name in CATEGORY_COLUMNS:
+        if name in table.column_names:
+            i = table.column_names.index(name)
+            table = table.set_column(i, name, table.column(name).dictionary_encode())
+    return table
+
+
+def _write(df: pd.DataFrame, path: Path):
+    """Write df's partitions, replacing any existing files in exactly those partitions."""
+    _, _, ds = _pyarrow()
+    ds.write_dataset(
+        _to_table(df),
+        str(path),
+        format="parquet",
+        partitioning=_partitioning(),
+        existing_data_behavior="delete_matching",
+        basename_template="part-{i}.parquet",
+    )
+
+
+def save_leads(df: pd.DataFrame, store=DEFAULT_STORE) -> int:
+    """Replace the whole store with df. Returns rows written."""
+    path = store_path(store)
+    if path.exists():
+        shutil.rmtree(path)
+    df = _typed(df)
+    if "Phone_Key" in df.columns:
+        df = _dedupe(df)
+    _write(df, path)
+    return len(df)
+
+
+def append_leads(df: pd.DataFrame, store=DEFAULT_STORE) -> int:
+    """
+    Merge df into the store: only partitions df touches are read and rewritten; existing rows
+    win on (Address, Phone_Key), or (Address, Phone_Number) for an invalid phone. Returns number
+    of new rows added.
+    """
+    _, _, ds = _pyarrow()
+    path = store_path(store)
+    new = _typed(df)
+    if not path.exists():
+        return save_leads(df, store)
+    expr = None
+    for c in PARTITION_COLUMNS:
+        vals = [v for v in new[c].dropna().unique().tolist()]
+        e = ds.field(c).isin(vals)
+        if new[c].isna().any():
+            e = e | ds.field(c).is_null()
+        expr = e if expr is None else expr & e
+    existing = ds.dataset(str(path), format="parquet", partitioning=_partitioning()).to_table(filter=expr).to_pandas()
+    existing = existing.astype({c: "string" for c in CATEGORY_COLUMNS if c in existing.columns})
+    merged = pd.concat([existing, new], ignore_index=True)
+    merged = _dedupe(merged)
+    _write(merged, path)
+    return len(merged) - len(existing)
+
+
+def read_leads(
+    store=DEFAULT_STORE,
+    city: str | None = None,
+    state: str | None = None,
+    zip_code: str | None = None,
+    phone_types: str | None = None,
+    columns: list[str] | None = None,
+) -> pd.DataFrame:
+    """
+    Read leads with filters pushed down: state/zip prune partitions, city is a case-insensitive
+    substring match, phone_types a case-insensitive regex on Phone_Type (e.g. "mobile|cell").
+    """
+    _, pc, ds = _pyarrow()
+    path = store_path(store)
+    if not path.exists():
+        return pd.DataFrame(columns=columns or [])
+    dataset = ds.dataset(str(path), format="parquet", partitioning=_partitioning())
+    expr = None
+
+    def _and(e):
+        nonlocal expr
+        expr = e if expr is None else expr & e
+
+    if state:
+        _and(ds.field("State") == state.strip().upper()[:2])
+    if zip_code:
+        _and(ds.field("Zip") == re.sub(r"\D", "", zip_code)[:5])
+    if city:
+        _and(pc.match_substring(ds.field("City"), city.strip(), ignore_case=True))
+    if phone_types and "Phone_Type" in dataset.schema.names:
+        _and(pc.match_substring_regex(ds.field("Phone_Type").cast("string"), phone_types, ignore_case=True))
+    cols = [c for c in columns if c in dataset.schema.names] if columns else None
+    df = dataset.to_table(columns=cols, filter=expr).to_pandas()
+    return df.astype({c: "string" for c in CATEGORY_COLUMNS if c in df.columns})
+
+
+def export_csv(output, store=DEFAULT_STORE, **filters) -> int:
+    """Write (optionally filtered) leads to CSV in the tree_service_leads.csv layout. Returns rows."""
+    df = read_leads(store, **filters)
+    df = df.drop(columns=["Phone_Key"], errors="ignore")
+    front = [c for c in ["Full_Name", "Address", "Phone_Number", "Phone_Type"] if c in df.columns]
+    tail = [c for c in ADDRESS_COLUMNS if c in df.columns]
+    df = df[front + [c for c in df.columns if c not in front + tail] + tail]
+    df.to_csv(output, index=False)
+    return len(df)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Parquet lead store (partitioned by State/Zip)")
+    parser.add_argument("--store", default=DEFAULT_STORE, help="Store directory (default lead_store)")
+    sub = parser.add_subparsers(dest="command", required=True)
+    p_imp = sub.add_parser("import", help="Load a leads CSV into the store")
+    p_imp.add_argument("csv", help="Leads CSV (e.g. tree_service_leads.csv)")
+    p_imp.add_argument("--append", action="store_true", help="Merge into existing store instead of replacing it")
+    p_exp = sub.add_parser("export", help="Write leads from the store to CSV")
+    p_exp.add_argument("--output", required=True, help="Output CSV")
+    p_exp.add_argument("--city", default="")
+    p_exp.add_argument("--state", default="")
+    p_exp.add_argument("--zip", default="", dest="zip_code")
+    p_exp.add_argument("--phone-types", default="", help="Regex on Phone_Type, e.g. 'mobile|cell'")
+    sub.add_parser("stats", help="Rows per State/Zip partition")
+    args = parser.parse_args()
+
+    if args.command == "import":
+        src = Path(args.csv)
+        if not src.exists():
+            print(f"File not found: {src}")
+            return
+        df = pd.read_csv(src, dtype=str, keep_default_na=False)
+        if args.append:
+            added = append_leads(df, args.store)
+            print(f"Added {added} new rows to {store_path(args.store)}")
+        else:
+            n = save_leads(df, args.store)
+            print(f"Wrote {n} rows to {store_path(args.store)}")
+    elif args.command == "export":
+        n = export_csv(
+            args.output, args.store,
+            city=args.city or None, state=args.state or None,
+            zip_code=args.zip_code or None, phone_types=args.phone_types or None,
+        )
+        print(f"Wrote {n} rows to {args.output}")
+    elif args.command == "stats":
+        df = read_leads(args.store, columns=PARTITION_COLUMNS)
+        if df.empty:
+            print("Store is empty.")
+            return
+        counts = df.fillna("(none)").groupby(PARTITION_COLUMNS).size()
+        print(counts.to_string())
+        print(f"Total: {int(counts.sum())} rows in {len(counts)} partitions", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,202 @@
+#!/usr/bin/env python3
+"""
+Incremental sync of sms_cell_list.csv into Supabase sms_cell_list_rows (the dashboard's SMS list).
+
+Each row gets a content hash (row_hash). The new build is diffed against the previous sync, and
+only new or changed rows (upsert) and phones that left the list (delete) are sent. They are
+bulk-loaded (scripts/bulk_load.py: COPY or parallel batches) into sms_cell_list_stage, which
+readers never look at. One apply_sms_cell_list_sync() call then applies them, list_metadata and
+list_preview in a single transaction, so the dashboard sees either the old list or the new
+one, never a half-written one.
+
+The previous sync is remembered in STATE_FILE ({phone: row_hash} plus the content hash the server
+returned). It is trusted only while list_metadata.content_hash still matches. Otherwise (first
+run, another machine synced, rows edited by hand) the remote hashes are read back once, page by
+page. Until app/supabase/schema.sql is applied, the list is replaced the old way: delete all,
+then insert.
+
+  stats = sync_sms_cell_list(supabase, REPO_ROOT / "sms_cell_list.csv", job_id)
+  # {"rows": 50000, "upserted": 120, "deleted": 35, "unchanged": 49880, "mode": "diff", ...}
+
+Usage:
+  python scripts/list_sync.py [--csv sms_cell_list.csv] [--full]   # --full: ignore the local state
+"""
+import argparse
+import hashlib
+import json
+import os
+import sys
+import time
+import uuid
+from pathlib import Path
+
+import pandas as pd
+
+from bulk_load import BulkLoader
+
+ROOT = Path(__file__).resolve().parent.parent
+TABLE = "sms_cell_list_rows"
+STAGE_TABLE = "sms_cell_list_stage"
+LIST_ID = "sms_cell_list"
+# Function / table not in PostgREST's schema cache; undefined table / column (Postgres SQLSTATE)
+SCHEMA_MISSING_CODES = ("PGRST202", "PGRST205", "42P01", "42703")
+STATE_FILE = "_worker_sms_list_sync.json"
+COLUMNS = ["phone_number", "full_name", "address", "source_address", "lead_type", "resident_type"]
+RENAME = {"Phone_Number": "phone_number", "Full_Name": "full_name", "Address": "address",
+          "Source_Address": "source_address", "Lead_Type": "lead_type", "Resident_Type": "resident_type"}
+FETCH_PAGE = 1000  # PostgREST's default max rows per select
+PREVIEW_ROWS = 200
+
+
+def list_rows(df: pd.DataFrame) -> pd.DataFrame:
+    """Table rows for a build: COLUMNS as strings (None for blanks), one per phone (first wins), plus row_hash."""
+    out = df.rename(columns={k: v for k, v in RENAME.items() if k in df.columns})
+    out = out.reindex(columns=COLUMNS).astype(object)
+    out = out.where(out.notna(), None)
+    for col in COLUMNS:
+        out[col] = out[col].map(lambda v: None if v is None or (isinstance(v, str) and not v.strip()) else str(v).strip())
+    out = out[out["phone_number"].notna()].drop_duplicates(subset=["phone_number"], keep="first")
+    out["row_hash"] = [
+        hashlib.blake2b("\x1f".join("" if v is None else v for v in values).encode(), digest_size=8).hexdigest()
+        for values in out[COLUMNS[1:]].itertuples(index=False, name=None)
+    ]
+    return out.reset_index(drop=True)
+
+
+def diff(new: dict, old: dict) -> tuple[list, list]:
+    """(phones to upsert: new or changed hash, phones to delete: gone from the list)."""
+    upserts = [p for p, h in new.items() if old.get(p) != h]
+    deletes = [p for p in old if p not in new]
+    return upserts, deletes
+
+
+def _load_state(path: Path) -> dict:
+    try:
+        return json.loads(path.read_text())
+    except (OSError, ValueError):
+        return {}
+
+
+def _save_state(path: Path, state: dict):
+    tmp = path.with_suffix(path.suffix + ".tmp")
+    tmp.write_text(json.dumps(state))
+    os.replace(tmp, path)
+
+
+def _remote_content_hash(supabase) -> str | None:
+    r = supabase.table("list_metadata").select("content_hash").eq("id", LIST_ID).limit(1).execute()
+    return (r.data or [{}])[0].get("content_hash")
+
+
+def _remote_hashes(supabase) -> dict:
+    """{phone: row_hash} of the rows in the table now (paged by phone_number)."""
+    hashes, last = {}, None
+    while True:
+        q = supabase.table(TABLE).select("phone_number,row_hash").order("phone_number").limit(FETCH_PAGE)
+        if last is not None:
+            q = q.gt("phone_number", last)
+        page = q.execute().data or []
+        for r in page:
+            hashes[r["phone_number"]] = r.get("row_hash") or ""
+        if len(page) < FETCH_PAGE:
+            return hashes
+        last = page[-1]["phone_number"]
+
+
+def _preview(df: pd.DataFrame) -> list:
+    return json.loads(df.head(PREVIEW_ROWS).to_json(orient="records", date_format="iso"))
+
+
+def _error_code(error: Exception) -> str | None:
+    """SQLSTATE / PostgREST code of a postgrest APIError or psycopg2 error (None for anything else)."""
+    code = getattr(error, "code", None) or getattr(error, "pgcode", None)
+    if code is None and error.args and isinstance(error.args[0], dict):
+        code = error.args[0].get("code")
+    return str(code) if code else None
+
+
+def _missing_schema(error: Exception) -> bool:
+    """
+    Table, column or function of this sync not in the schema yet. Only the error code is checked:
+    the fallback deletes the live list, so an unrelated error that happens to mention row_hash or
+    the stage table must be raised, not treated as an old schema.
+    """
+    return _error_code(error) in SCHEMA_MISSING_CODES
+
+
+def _replace_all(supabase, loader: BulkLoader, rows: pd.DataFrame, df: pd.DataFrame, job_id: str | None):
+    """Pre-diff behaviour for an old schema: delete everything, insert the list, update metadata."""
+    now = time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime())
+    supabase.table(TABLE).delete().neq("id", "00000000-0000-0000-0000-000000000000").execute()
+    loader.load(TABLE, rows[COLUMNS])
+    supabase.table("list_metadata").upsert({
+        "id": LIST_ID, "name": "SMS campaign list", "list_type": "sms_cell", "source": "table",
+        "source_identifier": TABLE, "row_count": len(rows), "last_updated_at": now, "updated_by_job_id": job_id,
+    }, on_conflict="id").execute()
+    supabase.table("list_preview").upsert({"list_id": LIST_ID, "rows": _preview(df), "updated_at": now},
+                                          on_conflict="list_id").execute()
+
+
+def sync_sms_cell_list(supabase, csv_path, job_id: str | None = None, state_path=None, full: bool = False,
+                       loader: BulkLoader | None = None) -> dict:
+    """Push the changes between the last synced list and csv_path; see module docstring. Returns stats."""
+    t0 = time.monotonic()
+    loader = loader or BulkLoader(supabase)
+    state_path = Path(state_path) if state_path else ROOT / STATE_FILE
+    df = pd.read_csv(csv_path, dtype=str)  # phones stay as written (no 9015550001.0 from a blank row)
+    rows = list_rows(df)
+    new = dict(zip(rows["phone_number"], rows["row_hash"]))
+    stats = {"rows": len(rows), "upserted": 0, "deleted": 0, "unchanged": 0, "mode": "diff"}
+
+    try:
+        state = {} if full else _load_state(state_path)
+        remote_hash = _remote_content_hash(supabase)
+        if state.get("content_hash") and state["content_hash"] == remote_hash:
+            old = state.get("rows", {})
+        else:
+            old = _remote_hashes(supabase)
+            stats["mode"] = "diff (remote hashes read)"
+        upserts, deletes = diff(new, old)
+        sync_id = str(uuid.uuid4())
+        changed = rows[rows["phone_number"].isin(set(upserts))].assign(op="upsert")
+        gone = pd.DataFrame({"phone_number": deletes}, dtype=object).reindex(columns=COLUMNS + ["row_hash"]).assign(op="delete")
+        stage = pd.concat([changed, gone], ignore_index=True).astype(object).assign(sync_id=sync_id)
+        if len(stage):
+            stats["load"] = loader.load(STAGE_TABLE, stage.where(stage.notna(), None))
+        r = supabase.rpc("apply_sms_cell_list_sync", {
+            "p_sync_id": sync_id, "p_job_id": job_id, "p_row_count": len(rows), "p_preview": _preview(df),
+        }).execute()
+    except Exception as e:
+        if not _missing_schema(e):
+            raise
+        print("sms_cell_list_stage / apply_sms_cell_list_sync not found (apply app/supabase/schema.sql); "
+              "replacing the whole list.", file=sys.stderr)
+        _replace_all(supabase, loader, rows, df, job_id)
+        stats.update(upserted=len(rows), mode="full replace")
+        stats["seconds"] = round(time.monotonic() - t0, 2)
+        return stats
+
+    content_hash = r.data if isinstance(r.data, str) else (r.data or [None])[0]
+    _save_state(state_path, {"content_hash": content_hash, "rows": new})
+    stats.update(upserted=len(upserts), deleted=len(deletes), unchanged=len(rows) - len(upserts))
+    stats["seconds"] = round(time.monotonic() - t0, 2)
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Sync sms_cell_list.csv into Supabase sms_cell_list_rows (changes only)")
+    parser.add_argument("--csv", default="sms_cell_list.csv", help="SMS list CSV (default sms_cell_list.csv)")
+    parser.add_argument("--full", action="store_true", help="Ignore the local sync state and diff against the table")
+    args = parser.parse_args()
+    from send_ledger import get_supabase
+    supabase = get_supabase()
+    if not supabase:
+        print("Set SUPABASE_URL (or NEXT_PUBLIC_SUPABASE_URL) and SUPABASE_SERVICE_ROLE_KEY.")
+        return
+    stats = sync_sms_cell_list(supabase, ROOT / args.csv, full=args.full)
+    print(f"{stats['rows']} rows: {stats['upserted']} upserted, {stats['deleted']} deleted, "
+          f"{stats['unchanged']} unchanged ({stats['mode']}, {stats['seconds']}s)")
+
+
+if __name__ == "__main__":
+    main()
@@ -10,12 +10,17 @@ Usage:
 
 Reads existing tree_service_leads.csv (if present), appends rows from new_leads.csv,
 dedupes by (Address, Phone_Number), writes back. Keeps all columns from existing;
-new rows get empty for missing columns.
+new rows get empty for missing columns. City/State/Zip are filled from Address where blank.
 """
 import argparse
 import csv
 from pathlib import Path
 
+import pandas as pd
+
+from address_utils import ADDRESS_COLUMNS, add_address_columns
+from phone_utils import phone_key
+
 ROOT = Path(__file__).resolve().parent.parent
 DEFAULT_LEADS = ROOT / "tree_service_leads.csv"
 
@@ -24,6 +29,7 @@ def main():
     parser = argparse.ArgumentParser(description="Merge CBC results into tree_service_leads.csv")
     parser.add_argument("new_csv", help="CSV with new leads (Full_Name, Address, Phone_Number, Phone_Type)")
     parser.add_argument("--output", default=str(DEFAULT_LEADS), help="Output path (default tree_service_leads.csv)")
+    parser.add_argument("--lead-store", default="", metavar="DIR", help="Also merge the new rows into the Parquet lead store (scripts/lead_store.py)")
     args = parser.parse_args()
 
     out_path = Path(args.output)
@@ -50,8 +56,8 @@ def main():
 
     def key(r):
         addr = (r.get("Address") or "").strip()
-        phone = (r.get("Phone_Number") or "").replace(" ", "").replace("-", "").replace("(", "").replace(")", "")
-        return (addr, phone[-10:] if len(phone) >= 10 else phone)
+        phone = (r.get("Phone_Number") or "").strip()
+        return (addr, phone_key(phone) or phone)
 
     seen = set(key(r) for r in existing_rows)
     added = 0
@@ -64,6 +70,14 @@ def main():
         existing_rows.append(row)
         added += 1
 
+    # City/State/Zip parsed once (vectorized) for rows that don't have them yet
+    if "Address" in fieldnames:
+        for c in ADDRESS_COLUMNS:
+            if c not in fieldnames:
+                fieldnames.append(c)
+        frame = add_address_columns(pd.DataFrame(existing_rows, columns=fieldnames, dtype=object), "Address")
+        existing_rows = frame.to_dict(orient="records")
+
     with open(out_path, "w", newline="", encoding="utf-8") as f:
         w = csv.DictWriter(f, fieldnames=fieldnames, extrasaction="ignore")
         w.writeheader()
@@ -71,6 +85,11 @@ def main():
 
     print(f"Merged {added} new rows into {out_path} (total {len(existing_rows)} rows).")
 
+    if args.lead_store:
+        from lead_store import append_leads, store_path
+        n = append_leads(pd.DataFrame(new_rows, dtype=object), args.lead_store)
+        print(f"Lead store {store_path(args.lead_store)}: {n} new rows.")
+
 
 if __name__ == "__main__":
     main()
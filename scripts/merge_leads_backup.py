@@ -4,6 +4,9 @@ Keeps full schema from backup; adds any new rows from current; dedupes by (Addre
 import pandas as pd
 from pathlib import Path
 
+from address_utils import add_address_columns
+from phone_utils import INVALID_KEY, phone_keys
+
 ROOT = Path(__file__).resolve().parent.parent
 BACKUP = ROOT / "tree_service_leads.backup.csv"
 CURRENT = ROOT / "tree_service_leads.csv"
@@ -25,15 +28,16 @@ def main():
         if c not in current.columns:
             current[c] = ""
     current = current[[c for c in backup.columns if c in current.columns]]
-    # Dedupe key
-    def key(r):
-        a = str(r.get("Address", "")).strip()
-        p = str(r.get("Phone_Number", "")).replace(" ", "").replace("-", "").replace("(", "").replace(")", "")
-        return (a, p[-10:] if len(p) >= 10 else p)
-    backup_keys = set(key(r) for _, r in backup.iterrows())
-    new_rows = current[~current.apply(lambda r: key(r) in backup_keys, axis=1)]
+    # Dedupe key: (Address, int64 phone key); rows with no valid phone are never treated as known
+    def keys(df):
+        return pd.MultiIndex.from_arrays([df["Address"].astype(str).str.strip(), phone_keys(df["Phone_Number"])])
+    backup_keys = keys(backup)
+    current_keys = keys(current)
+    known = current_keys.isin(backup_keys) & (current_keys.get_level_values(1) != INVALID_KEY)
+    new_rows = current[~known]
     merged = pd.concat([backup, new_rows], ignore_index=True)
     merged = merged.drop_duplicates(subset=["Address", "Phone_Number"], keep="first")
+    add_address_columns(merged, "Address")
     merged.to_csv(OUT, index=False)
     print(f"Merged: {len(backup)} backup + {len(new_rows)} new = {len(merged)} rows -> {OUT}")
 
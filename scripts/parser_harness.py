@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+"""
+Offline parser harness: run page_parsers over the pages in tests/fixtures and report
+rows extracted and pages/sec per fixture. Exits 1 when a fixture extracts fewer rows than
+tests/fixtures/manifest.json expects (selector breakage). No browser or network needed.
+
+The current fixtures are synthetic (manifest "source": "synthetic"): hand-written pages that
+follow the sites' result markup. Add captured ones by running the automation with
+--record-pages DIR, copying pages into tests/fixtures/cbc or tests/fixtures/propwire, and adding
+their expected counts to manifest.json with "source": "recorded".
+
+Usage:
+  python scripts/parser_harness.py [--fixtures tests/fixtures] [--iterations 50]
+"""
+import argparse
+import json
+import sys
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from page_parsers import parse_cbc_results, parse_propwire_results  # noqa: E402
+
+DEFAULT_FIXTURES = ROOT / "tests" / "fixtures"
+
+
+def load_fixtures(fixtures_dir=DEFAULT_FIXTURES) -> list[dict]:
+    """Manifest entries with 'name' and 'html' added, in manifest order."""
+    fixtures_dir = Path(fixtures_dir)
+    manifest = json.loads((fixtures_dir / "manifest.json").read_text(encoding="utf-8"))
+    out = []
+    for name, spec in manifest.items():
+        fx = dict(spec, name=name)
+        fx["html"] = (fixtures_dir / name).read_text(encoding="utf-8")
+        out.append(fx)
+    return out
+
+
+def parse_fixture(fx: dict) -> list[dict]:
+    """Run the parser the fixture is for and return its rows."""
+    if fx["parser"] == "cbc":
+        return parse_cbc_results(fx["html"], fx.get("address", ""))
+    if fx["parser"] == "propwire":
+        return parse_propwire_results(fx["html"])
+    raise ValueError(f"Unknown parser for {fx['name']}: {fx['parser']}")
+
+
+def extraction_counts(fx: dict, rows: list[dict]) -> dict:
+    """Counts compared against the manifest: rows, plus mobile (CBC) or with_lead_type (Propwire)."""
+    counts = {"rows": len(rows)}
+    if fx["parser"] == "cbc":
+        counts["mobile"] = sum(1 for r in rows if r.get("Phone_Type") == "Mobile")
+    else:
+        counts["with_lead_type"] = sum(1 for r in rows if r.get("Lead_Type"))
+    return counts
+
+
+def count_regressions(fx: dict, counts: dict) -> list[str]:
+    """Human-readable list of counts that dropped below the manifest's expectation."""
+    return [
+        f"{fx['name']}: {key} {counts[key]} < expected {fx[key]}"
+        for key in counts
+        if key in fx and counts[key] < fx[key]
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark and check scraping parsers against saved pages")
+    parser.add_argument("--fixtures", default=str(DEFAULT_FIXTURES), help="Fixtures dir with manifest.json")
+    parser.add_argument("--iterations", type=int, default=50, help="Parses per fixture for timing (default 50)")
+    args = parser.parse_args()
+
+    failures = []
+    for fx in load_fixtures(args.fixtures):
+        start = time.perf_counter()
+        for _ in range(max(1, args.iterations)):
+            rows = parse_fixture(fx)
+        elapsed = time.perf_counter() - start
+        counts = extraction_counts(fx, rows)
+        failures.extend(count_regressions(fx, counts))
+        pages_per_sec = max(1, args.iterations) / elapsed if elapsed else float("inf")
+        detail = ", ".join(f"{k}={v}" for k, v in counts.items())
+        print(f"{fx['name']:<40} {detail:<28} {pages_per_sec:10.1f} pages/sec")
+
+    if failures:
+        print("Extraction regressions:")
+        for f in failures:
+            print(f"  {f}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+"""
+Shared US phone normalization for every script (build list, send, inbound, merges).
+
+One rule everywhere: strip non-digits, take the last 10, require a valid NANP number
+(area code and exchange both [2-9]XX and not an N11 service code).
+
+Scalar API:    phone_key("(901) 752-4443") -> 9017524443, phone_digits(...) -> "9017524443",
+               to_e164(...) -> "+19017524443"; invalid input gives 0 / "" / "".
+Vectorized:    phone_keys(series) -> int64 Series (0 = invalid), digits10(series), e164(series).
+Joins and dedupes use the int64 keys rather than Python strings.
+"""
+import re
+
+import numpy as np
+import pandas as pd
+
+INVALID_KEY = 0  # never a valid NANP number (area code can't start with 0)
+
+_NON_DIGITS = re.compile(r"\D")
+_NANP_RE = re.compile(r"^[2-9]\d{2}[2-9]\d{6}$")
+
+
+def _valid_nanp(digits: str) -> bool:
+    """10 digits, NXX-NXX-XXXX, area code and exchange not N11 (211, 411, 911...)."""
+    return bool(_NANP_RE.match(digits)) and digits[1:3] != "11" and digits[4:6] != "11"
+
+
+def phone_key(value) -> int:
+    """int64 key (10-digit number as int) for one phone, or INVALID_KEY."""
+    if value is None:
+        return INVALID_KEY
+    if isinstance(value, (int, np.integer)) and not isinstance(value, bool):
+        digits = str(int(value))
+    elif isinstance(value, (float, np.floating)):
+        # CSV columns read as float when they have blanks: 9017524443.0
+        if value != value:  # NaN
+            return INVALID_KEY
+        digits = str(int(value))
+    else:
+        digits = _NON_DIGITS.sub("", str(value))
+    digits = digits[-10:]
+    return int(digits) if len(digits) == 10 and _valid_nanp(digits) else INVALID_KEY
+
+
+def phone_digits(value) -> str:
+    """10-digit string ('9017524443') or '' when invalid."""
+    key = phone_key(value)
+    return str(key) if key != INVALID_KEY else ""
+
+
+def to_e164(value) -> str:
+    """E.164 ('+19017524443') or '' when invalid."""
+    key = phone_key(value)
+    return f"+1{key}" if key != INVALID_KEY else ""
+
+
+def phone_keys(values) -> pd.Series:
+    """Vectorized phone_key: int64 Series aligned with values (INVALID_KEY where invalid)."""
+    s = values if isinstance(values, pd.Series) else pd.Series(values)
+    if pd.api.types.is_numeric_dtype(s) and not pd.api.types.is_bool_dtype(s):
+        nums = pd.to_numeric(s, errors="coerce").fillna(0).to_numpy(dtype="float64")
+        keys = np.mod(nums.astype(np.int64), 10**10)
+        digits = pd.Series(keys, index=s.index).astype(str).str.zfill(10)
+    else:
+        digits = s.astype(str).str.replace(r"\D", "", regex=True).str[-10:]
+        keys = None
+    valid = (
+        digits.str.len().eq(10)
+        & digits.str.match(r"^[2-9]\d{2}[2-9]\d{6}$")
+        & digits.str[1:3].ne("11")
+        & digits.str[4:6].ne("11")
+    )
+    if keys is None:
+        keys = pd.to_numeric(digits.where(valid, "0"), errors="coerce").fillna(0).to_numpy(dtype=np.int64)
+    out = np.where(valid.to_numpy(), keys, INVALID_KEY).astype(np.int64)
+    return pd.Series(out, index=s.index, dtype="int64")
+
+
+def digits10(values) -> pd.Series:
+    """Vectorized phone_digits: 10-digit strings ('' where invalid)."""
+    keys = phone_keys(values)
+    return keys.astype(str).where(keys != INVALID_KEY, "")
+
+
+def e164(values) -> pd.Series:
+    """Vectorized to_e164: '+1XXXXXXXXXX' strings ('' where invalid)."""
+    keys = phone_keys(values)
+    return ("+1" + keys.astype(str)).where(keys != INVALID_KEY, "")
+
+
+def key_set(values) -> np.ndarray:
+    """Sorted unique valid keys, for isin() anti-joins (e.g. opt-outs, warm leads)."""
+    keys = phone_keys(values).to_numpy()
+    return np.unique(keys[keys != INVALID_KEY])
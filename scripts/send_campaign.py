@@ -2,21 +2,46 @@
 """
 Send one SMS per row from sms_cell_list.csv via Twilio.
 Excludes opt_outs.csv, rate-limits (e.g. 1/sec), identity + opt-out in message.
+Sends concurrently at the number's permitted --rate through scripts/sms_dispatch.py.
 Dry-run by default; set TWILIO_* env and pass --send to actually send.
+Every send is recorded in the send ledger (scripts/send_ledger.py) under --campaign, so a re-run
+skips numbers already texted for that campaign, and --daily-cap is a rolling 24h cap per number.
+The message is compiled per row by scripts/sms_message.py ({company} and list columns such as
+{Full_Name}); look-alike characters that would force UCS-2 are replaced with GSM-7 ones unless
+--keep-unicode, and the dry run prints encoding, total segments and estimated cost.
+With --from-db the audience comes from the database instead of the CSVs (scripts/audience.py:
+campaign_audience() excludes opt-outs, warm leads and the campaign's sms_sends, and applies the
+daily cap server-side); the local suppression index and ledger are still checked on top.
 
 Usage:
-  python scripts/send_campaign.py [--dry-run] [--send] [--list sms_cell_list.csv] [--delay 1]
+  python scripts/send_campaign.py [--dry-run] [--send] [--list sms_cell_list.csv] [--delay 1 | --rate 1] [--concurrency 8]
   TWILIO_ACCOUNT_SID=... TWILIO_AUTH_TOKEN=... TWILIO_FROM=+1... python scripts/send_campaign.py --send
+      [--campaign spring-germantown] [--daily-cap 450] [--sync-ledger] [--from-db]
+      [--status-callback https://your-host/sms-status --max-failure-rate 0.2]
 """
 import argparse
+import hashlib
 import os
 import time
 from pathlib import Path
+from urllib.parse import quote
+
+from audience import audience_missing, fetch_audience
+from file_cache import read_csv_cached
+from job_progress import report_progress
+from phone_utils import INVALID_KEY, key_set, phone_keys
+from send_ledger import DEFAULT_LEDGER, SendLedger, get_supabase
+from sms_dispatch import DEFAULT_CONCURRENCY, TwilioSender, dispatch, format_summary, outcome_unknown, rate_from_args
+from sms_message import DEFAULT_PRICE_PER_SEGMENT, format_cost_summary, gsm_safe_series, render, summarize
+from suppression import DEFAULT_INDEX, suppressed_keys
 
 DEFAULT_LIST = "sms_cell_list.csv"
 DEFAULT_OPT_OUTS = "opt_outs.csv"
 DEFAULT_DELAY_SEC = 1.0
 DEFAULT_DAILY_BATCH_LIMIT = 450
+# --max-failure-rate: judge only after this many delivered/failed callbacks, re-check this often
+MIN_FINAL_FOR_FAILURE_RATE = 20
+FAILURE_CHECK_INTERVAL_SEC = 5.0
 
 # Example script (identity + opt-out). Replace COMPANY with your name.
 DEFAULT_MESSAGE = (
@@ -25,99 +50,211 @@ DEFAULT_MESSAGE = (
 )
 
 
-def main():
+def main(argv=None):
     parser = argparse.ArgumentParser(description="Send campaign SMS from sms_cell_list (Twilio)")
     parser.add_argument("--list", default=DEFAULT_LIST, help="SMS list CSV (Phone_Number column)")
-    parser.add_argument("--opt-outs", default=DEFAULT_OPT_OUTS, help="Opt-outs CSV")
+    parser.add_argument("--opt-outs", default=DEFAULT_OPT_OUTS, help="Opt-outs CSV (merged into the suppression index)")
+    parser.add_argument("--suppression-index", default=DEFAULT_INDEX,
+                        help="Persistent opt-out index (scripts/suppression.py, default suppression.sqlite3)")
     parser.add_argument("--warm-leads", default="", help="Warm leads CSV to exclude (phone_number or Phone_Number column)")
+    parser.add_argument("--from-db", action="store_true",
+                        help="Select the audience in Supabase with campaign_audience() (schema.sql) instead of reading "
+                             "--list and --warm-leads; implies --sync-ledger")
     parser.add_argument("--limit", type=int, default=0, help="Max messages to send this run (0 = no limit)")
+    parser.add_argument("--daily-cap", type=int, default=DEFAULT_DAILY_BATCH_LIMIT,
+                        help=f"Max sends per sending number in any rolling 24h, across runs (default {DEFAULT_DAILY_BATCH_LIMIT}, 0 = off)")
+    parser.add_argument("--campaign", default="",
+                        help="Campaign id for the send ledger (default: list name + message hash, so re-runs resume)")
+    parser.add_argument("--ledger", default=DEFAULT_LEDGER, help="Send ledger file (default send_ledger.sqlite3)")
+    parser.add_argument("--sync-ledger", action="store_true", help="Upsert this run's ledger rows into Supabase sms_sends")
+    parser.add_argument("--status-callback", default=os.environ.get("TWILIO_STATUS_CALLBACK", ""),
+                        help="Status callback URL, i.e. inbound_sms_handler's /sms-status (default $TWILIO_STATUS_CALLBACK)")
+    parser.add_argument("--max-failure-rate", type=float, default=0,
+                        help="Stop the run when this share of delivered/failed callbacks failed (0 = off; "
+                             f"needs --status-callback and the same ledger file, judged after {MIN_FINAL_FOR_FAILURE_RATE})")
     parser.add_argument("--send", action="store_true", help="Actually send (default: dry-run)")
     parser.add_argument("--dry-run", action="store_true", help="Explicitly dry-run (default when --send not passed)")
-    parser.add_argument("--delay", type=float, default=DEFAULT_DELAY_SEC, help="Seconds between sends (default 1)")
-    parser.add_argument("--message", default="", help="Override message; use {company} and keep under 160 chars")
+    parser.add_argument("--delay", type=float, default=DEFAULT_DELAY_SEC, help="Seconds between sends (default 1); ignored with --rate")
+    parser.add_argument("--rate", type=float, default=0, help="Messages/sec the sending number is allowed (default 1/--delay)")
+    parser.add_argument("--concurrency", type=int, default=DEFAULT_CONCURRENCY, help=f"Requests in flight (default {DEFAULT_CONCURRENCY})")
+    parser.add_argument("--message", default="",
+                        help="Override message; {company} and list columns like {Full_Name}; aim for 1 GSM-7 segment (160 chars)")
     parser.add_argument("--company", default="Tree Service", help="Company name for identity in message")
-    args = parser.parse_args()
+    parser.add_argument("--keep-unicode", action="store_true",
+                        help="Don't replace curly quotes, dashes etc. with GSM-7 characters (UCS-2 is 70 chars/segment)")
+    parser.add_argument("--price-per-segment", type=float, default=DEFAULT_PRICE_PER_SEGMENT,
+                        help=f"USD per segment for the cost estimate (default {DEFAULT_PRICE_PER_SEGMENT})")
+    args = parser.parse_args(argv)
     dry_run = not args.send
 
     root = Path(__file__).resolve().parent.parent
     list_path = root / args.list
     opt_path = root / args.opt_outs
 
-    if not list_path.exists():
+    template = (args.message or DEFAULT_MESSAGE).strip()
+    # Same id with or without --from-db, so the ledger and sms_sends carry over between modes
+    campaign_key = template.replace("{company}", args.company)
+    campaign_id = args.campaign or f"{list_path.stem}:{hashlib.sha1(campaign_key.encode()).hexdigest()[:10]}"
+    from_num = os.environ.get("TWILIO_FROM")
+
+    if args.from_db:
+        try:
+            df = fetch_audience(campaign_id, from_num, args.daily_cap, args.limit or None, supabase=get_supabase())
+        except RuntimeError as e:  # no client and no database URL
+            print(f"--from-db: {e} (set SUPABASE_URL and SUPABASE_SERVICE_ROLE_KEY, or SUPABASE_DB_URL).")
+            return
+        except Exception as e:
+            if not audience_missing(e):
+                raise
+            print("--from-db: campaign_audience() not found; apply app/supabase/schema.sql or drop --from-db.")
+            return
+        print(f"Audience from campaign_audience(): {len(df)} numbers (opt-outs, warm leads, sent and daily cap applied).")
+    elif not list_path.exists():
         print(f"SMS list not found: {list_path}")
         return
+    else:
+        df = read_csv_cached(list_path)
+        if df.empty or "Phone_Number" not in df.columns:
+            print("SMS list missing or no Phone_Number column.")
+            return
+        # Normalize phone to an int64 key (valid NANP only); E.164 "To" is derived after filtering
+        df["_key"] = phone_keys(df["Phone_Number"])
+        df = df[df["_key"] != INVALID_KEY]
 
-    import pandas as pd
-    df = pd.read_csv(list_path)
-    if df.empty or "Phone_Number" not in df.columns:
-        print("SMS list missing or no Phone_Number column.")
-        return
-
-    # Normalize phone to E.164-ish (US: +1 + 10 digits)
-    df["Phone_Number"] = df["Phone_Number"].astype(str).str.replace(r"\D", "", regex=True)
-    df = df[df["Phone_Number"].str.len() >= 10]
-    df["Phone_Number"] = df["Phone_Number"].str[-10:]
-    df["To"] = "+1" + df["Phone_Number"]
-
-    # Exclude opt-outs
-    if opt_path.exists():
-        opt = pd.read_csv(opt_path)
-        if "Phone_Number" in opt.columns and not opt.empty:
-            opt_nums = set(opt["Phone_Number"].astype(str).str.replace(r"\D", "", regex=True).str[-10:])
-            df = df[~df["Phone_Number"].isin(opt_nums)]
+    # Exclude opt-outs (persistent index: union of opt_outs.csv, the Supabase export and webhook STOPs;
+    # with --from-db this catches STOPs the webhook hasn't mirrored to Supabase)
+    df = df[~df["_key"].isin(suppressed_keys(opt_path, index_path=args.suppression_index,
+                                             create=not dry_run))]
 
     # Exclude warm leads (already opted in)
-    warm_path = root / args.warm_leads if args.warm_leads else None
+    warm_path = root / args.warm_leads if args.warm_leads and not args.from_db else None
     if warm_path and warm_path.exists():
-        warm = pd.read_csv(warm_path)
+        warm = read_csv_cached(warm_path)
         col = "phone_number" if "phone_number" in warm.columns else "Phone_Number"
         if col in warm.columns and not warm.empty:
-            warm_nums = set(warm[col].astype(str).str.replace(r"\D", "", regex=True).str[-10:])
-            df = df[~df["Phone_Number"].isin(warm_nums)]
+            df = df[~df["_key"].isin(key_set(warm[col]))]
+
+    df = df.drop_duplicates(subset=["_key"], keep="first")
+    df["Phone_Number"] = df["_key"].astype(str)
+    df["To"] = "+1" + df["Phone_Number"]
+
+    try:
+        render(template, df.head(0), company=args.company)
+    except (KeyError, ValueError) as e:
+        print(f"Message template: {e}")
+        return
+
+    # Skip numbers the ledger already has for this campaign (resume after a crash or timeout);
+    # a dry run reads an existing ledger and index but never creates them
+    ledger = SendLedger(args.ledger, create=not dry_run)
+    before = len(df)
+    df = df[~df["_key"].isin(ledger.sent_keys(campaign_id))]
+    if before > len(df):
+        print(f"Campaign {campaign_id}: skipping {before - len(df)} numbers already sent.")
 
-    df = df.drop_duplicates(subset=["Phone_Number"], keep="first")
+    # Apply per-run limit and the rolling daily cap (counts sends from earlier runs too)
+    remaining = ledger.remaining_today(args.daily_cap, from_num or None)
+    cap = min(args.limit, remaining) if args.limit and args.limit > 0 else remaining
+    if len(df) > cap:
+        print(f"Daily cap: {remaining} sends left in the last 24h; sending {cap} of {len(df)} this run.")
+        df = df.head(cap)
 
-    # Apply daily batch limit
-    if args.limit and args.limit > 0:
-        df = df.head(args.limit)
-    message = (args.message or DEFAULT_MESSAGE).strip().format(company=args.company)
-    if len(message) > 160:
-        print(f"Warning: message length {len(message)} > 160 chars (extra segment cost).")
+    # Render every row's body at once and price it (segments, not characters, are billed)
+    bodies = render(template, df, company=args.company)
+    if not args.keep_unicode:
+        safe = gsm_safe_series(bodies)
+        changed = int((safe != bodies).sum())
+        if changed:
+            print(f"Replaced non-GSM-7 look-alikes in {changed} messages (--keep-unicode to send as written).")
+        bodies = safe
+    cost = summarize(bodies, args.price_per_segment)
+    print(format_cost_summary(cost, args.price_per_segment))
+    if cost["max_segments"] > 1:
+        print(f"Warning: some messages are {cost['max_segments']} segments; shorten to fit one.")
 
     if dry_run:
-        print(f"DRY RUN: would send to {len(df)} numbers (opt-outs excluded).")
-        for _, row in df.head(5).iterrows():
-            print(f"  -> {row['To']} ({getattr(row, 'Full_Name', '')})")
+        ledger.close()
+        print(f"DRY RUN: would send to {len(df)} numbers (opt-outs excluded, campaign {campaign_id}).")
+        for (_, row), body in zip(df.head(5).iterrows(), bodies.head(5)):
+            print(f"  -> {row['To']} ({getattr(row, 'Full_Name', '')}): {body}")
         if len(df) > 5:
             print(f"  ... and {len(df) - 5} more.")
         print("Pass --send and set TWILIO_ACCOUNT_SID, TWILIO_AUTH_TOKEN, TWILIO_FROM to send.")
         return
 
+    if df.empty:
+        ledger.close()
+        print("Nothing to send (all numbers excluded, already sent, or daily cap reached).")
+        return
+
     sid = os.environ.get("TWILIO_ACCOUNT_SID")
     token = os.environ.get("TWILIO_AUTH_TOKEN")
-    from_num = os.environ.get("TWILIO_FROM")
     if not all([sid, token, from_num]):
+        ledger.close()
         print("Set TWILIO_ACCOUNT_SID, TWILIO_AUTH_TOKEN, TWILIO_FROM to send. Exiting.")
         return
 
-    try:
-        from twilio.rest import Client
-    except ImportError:
-        print("Install twilio: pip install twilio")
-        return
+    callback = args.status_callback
+    if callback:
+        callback += ("&" if "?" in callback else "?") + "campaign=" + quote(campaign_id, safe="")
+    sender = TwilioSender(sid, token, from_num, pool_size=args.concurrency, status_callback=callback or None)
+    rate = rate_from_args(args.rate, args.delay)
+    print(f"Sending {len(df)} messages at {rate:g} msg/s, {args.concurrency} in flight...")
 
-    client = Client(sid, token)
-    sent = 0
-    for _, row in df.iterrows():
-        try:
-            client.messages.create(to=row["To"], from_=from_num, body=message)
-            sent += 1
-            print(f"Sent to {row['To']}")
-        except Exception as e:
-            print(f"Failed {row['To']}: {e}")
-        time.sleep(args.delay)
+    done = {"n": 0, "failed": 0}
+
+    def report(r):
+        if r.get("cancelled"):  # never attempted, so never marked queued
+            return
+        unknown = outcome_unknown(r)
+        ledger.record(campaign_id, r["key"], r["ok"], r["sid"], r["error_code"], r["error"], r["attempts"],
+                      unknown=unknown)
+        done["n"] += 1
+        done["failed"] += 0 if r["ok"] else 1
+        report_progress("messages", done["n"], len(df), f"{done['failed']} failed" if done["failed"] else "")
+        if r["ok"]:
+            print(f"Sent to {r['to']} ({r['latency_ms']:.0f} ms)")
+        elif unknown:
+            print(f"No answer for {r['to']} ({r['error']}); may have been sent, won't be resent.")
+        else:
+            print(f"Failed {r['to']}: {r['error']}" + (f" (code {r['error_code']})" if r["error_code"] else ""))
+
+    # Halt on a carrier failure spike (counters kept by the /sms-status endpoint in the ledger)
+    halted = {"rate": None, "checked": 0.0}
+
+    def should_stop() -> bool:
+        if not args.max_failure_rate or halted["rate"] is not None:
+            return halted["rate"] is not None
+        now = time.monotonic()
+        if now - halted["checked"] >= FAILURE_CHECK_INTERVAL_SEC:
+            halted["checked"] = now
+            rate_now = ledger.failure_rate(campaign_id, min_final=MIN_FINAL_FOR_FAILURE_RATE)
+            if rate_now > args.max_failure_rate:
+                halted["rate"] = rate_now
+                print(f"Failure rate {rate_now:.0%} > {args.max_failure_rate:.0%}: stopping campaign {campaign_id}.")
+        return halted["rate"] is not None
+
+    run_started = time.time()
+    messages = [{"to": to, "body": body, "key": key} for to, body, key in zip(df["To"], bodies, df["_key"])]
+    # Each number is marked queued just before its first request, so a run that dies leaves only
+    # the numbers it actually tried (at most --concurrency in flight) skipped and counted
+    summary = dispatch(messages, sender, rate=rate, concurrency=args.concurrency, on_result=report, stop=should_stop,
+                       on_attempt=lambda m: ledger.mark_queued(campaign_id, [m["key"]], from_num))
+    sender.close()
+    print(f"Sent {summary['sent']} messages.")
+    print(format_summary(summary))
 
-    print(f"Sent {sent} messages.")
+    if args.sync_ledger or args.from_db:  # --from-db: the next audience must see these sends
+        supabase = get_supabase()
+        if supabase is None:
+            print("--sync-ledger: set SUPABASE_URL and SUPABASE_SERVICE_ROLE_KEY; ledger kept locally only.")
+        else:
+            try:
+                n = ledger.sync_to_supabase(supabase, campaign_id, since=run_started)
+                print(f"Synced {n} ledger rows to sms_sends.")
+            except Exception as e:
+                print(f"Ledger sync failed (kept locally, re-run send_ledger.py sync): {e}")
+    ledger.close()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,379 @@
+#!/usr/bin/env python3
+"""
+Persistent send ledger: one row per (campaign id, phone) with status queued / sent / failed
+(delivered / undelivered once status callbacks arrive), provider message SID and error.
+
+send_campaign marks each number "queued" right before its first API call and records the result
+as it comes back, so a run that dies mid-way can be re-run: numbers it never tried have no row
+and are sent, rows already queued or sent for the campaign are skipped (one primary-key lookup per row via sent_keys()), and failed rows are
+tried again. count_since() gives the rolling 24h count per sending number for the daily cap.
+
+Twilio status callbacks (POST /sms-status on inbound_sms_handler) are folded in with
+apply_status_events(): each message's latest status is kept by SID (late or duplicate events
+that would move it backwards are ignored), and per-campaign counters and error-code histograms
+are adjusted by the difference, so delivery_counts() / failure_rate() read a handful of rows
+instead of scanning events.
+
+Local SQLite (send_ledger.sqlite3 in the repo root, WAL) so lookups stay local and fast; with
+--sync-ledger the rows touched by a run are upserted into the Supabase sms_sends table
+(app/supabase/schema.sql) for the dashboard.
+
+Usage:
+  python scripts/send_ledger.py stats [--campaign ID]     # with --campaign: delivery counters and error codes
+  python scripts/send_ledger.py sync [--campaign ID]     # push to Supabase sms_sends
+"""
+import argparse
+import os
+import sqlite3
+import sys
+import threading
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+
+import numpy as np
+
+from bulk_load import BulkLoader
+
+ROOT = Path(__file__).resolve().parent.parent
+DEFAULT_LEDGER = "send_ledger.sqlite3"
+DAY_SEC = 24 * 3600
+# Statuses that mean "don't text this phone again for this campaign". A number is only queued
+# right before its request goes out, so a stale "queued" row (run died mid-request, or the
+# request timed out with no answer) may have reached the provider and is not resent either
+DONE_STATUSES = ("queued", "sent", "delivered", "undelivered")
+# Statuses that count against the rolling daily cap (both lists match sms_send_counts() in
+# app/supabase/schema.sql, which campaign_audience() and the dashboard use)
+COUNTED_STATUSES = ("queued", "sent", "delivered", "undelivered")
+SYNC_BATCH = 500
+# Twilio message status lifecycle; an event only moves a message forward
+STATUS_RANK = {
+    "accepted": 0, "scheduled": 0, "queued": 1, "sending": 2, "sent": 3,
+    "delivered": 4, "undelivered": 4, "failed": 4, "canceled": 4, "read": 5,
+}
+FAILED_STATUSES = ("undelivered", "failed")
+# Callback statuses that are written back to the sends row (sms_sends.status check)
+LEDGER_FINAL = {"delivered": "delivered", "read": "delivered", "undelivered": "undelivered",
+                "failed": "failed", "canceled": "failed"}
+
+
+def _iso(ts: float) -> str:
+    return datetime.fromtimestamp(ts, timezone.utc).isoformat()
+
+
+class SendLedger:
+    """(campaign_id, phone_key) -> status / sid / error; see module docstring."""
+
+    def __init__(self, path=None, create: bool = True):
+        """create=False (dry runs) opens an empty in-memory ledger when the file doesn't exist yet."""
+        path = Path(path) if path else ROOT / DEFAULT_LEDGER
+        self.path = path if path.is_absolute() else ROOT / path
+        db = str(self.path) if create or self.path.exists() else ":memory:"
+        self.conn = sqlite3.connect(db, timeout=30, check_same_thread=False)
+        self._lock = threading.Lock()  # results are recorded from dispatch worker threads
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS sends ("
+            " campaign_id TEXT NOT NULL,"
+            " phone_key INTEGER NOT NULL,"
+            " from_number TEXT NOT NULL DEFAULT '',"
+            " status TEXT NOT NULL,"
+            " sid TEXT,"
+            " error_code INTEGER,"
+            " error TEXT,"
+            " attempts INTEGER NOT NULL DEFAULT 0,"
+            " queued_at REAL NOT NULL,"
+            " updated_at REAL NOT NULL,"
+            " PRIMARY KEY (campaign_id, phone_key)"
+            ") WITHOUT ROWID"
+        )
+        self.conn.execute("CREATE INDEX IF NOT EXISTS sends_from_queued ON sends (from_number, queued_at)")
+        self.conn.execute("CREATE INDEX IF NOT EXISTS sends_sid ON sends (sid)")
+        # Delivery status: latest status per message, and running per-campaign aggregates
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS message_status ("
+            " sid TEXT PRIMARY KEY, campaign_id TEXT NOT NULL, status TEXT NOT NULL,"
+            " error_code INTEGER, updated_at REAL NOT NULL"
+            ") WITHOUT ROWID"
+        )
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS delivery_counts ("
+            " campaign_id TEXT NOT NULL, status TEXT NOT NULL, n INTEGER NOT NULL,"
+            " PRIMARY KEY (campaign_id, status)) WITHOUT ROWID"
+        )
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS delivery_errors ("
+            " campaign_id TEXT NOT NULL, error_code INTEGER NOT NULL, n INTEGER NOT NULL,"
+            " PRIMARY KEY (campaign_id, error_code)) WITHOUT ROWID"
+        )
+        self.conn.commit()
+
+    def sent_keys(self, campaign_id: str) -> np.ndarray:
+        """Sorted int64 phone keys already queued/sent for the campaign (skip these)."""
+        marks = ",".join("?" * len(DONE_STATUSES))
+        with self._lock:
+            rows = self.conn.execute(
+                f"SELECT phone_key FROM sends WHERE campaign_id = ? AND status IN ({marks}) ORDER BY phone_key",
+                (campaign_id, *DONE_STATUSES),
+            ).fetchall()
+        return np.fromiter((r[0] for r in rows), dtype=np.int64, count=len(rows))
+
+    def count_since(self, since: float, from_number: str | None = None) -> int:
+        """Messages queued/sent at or after `since` (epoch seconds), optionally for one sending number."""
+        marks = ",".join("?" * len(COUNTED_STATUSES))
+        sql = f"SELECT COUNT(*) FROM sends WHERE queued_at >= ? AND status IN ({marks})"
+        params = [since, *COUNTED_STATUSES]
+        if from_number:
+            sql += " AND from_number = ?"
+            params.append(from_number)
+        with self._lock:
+            return self.conn.execute(sql, params).fetchone()[0]
+
+    def remaining_today(self, daily_cap: int, from_number: str | None = None) -> int:
+        """How many more sends the rolling 24h cap allows (daily_cap <= 0 means no cap)."""
+        if daily_cap <= 0:
+            return sys.maxsize
+        return max(0, daily_cap - self.count_since(time.time() - DAY_SEC, from_number))
+
+    def mark_queued(self, campaign_id: str, phone_keys, from_number: str = "") -> None:
+        """
+        Record phones as queued in one transaction, right before their request goes out (failed
+        rows from earlier runs are re-queued).
+        """
+        now = time.time()
+        rows = [(campaign_id, int(k), from_number, now, now) for k in phone_keys]
+        with self._lock:
+            self.conn.executemany(
+                "INSERT INTO sends (campaign_id, phone_key, from_number, status, queued_at, updated_at)"
+                " VALUES (?, ?, ?, 'queued', ?, ?)"
+                " ON CONFLICT (campaign_id, phone_key) DO UPDATE SET"
+                " status = 'queued', from_number = excluded.from_number, sid = NULL, error_code = NULL,"
+                " error = NULL, queued_at = excluded.queued_at, updated_at = excluded.updated_at"
+                " WHERE sends.status = 'failed'",
+                rows,
+            )
+            self.conn.commit()
+
+    def record(self, campaign_id: str, phone_key: int, ok: bool, sid: str = "", error_code=None,
+               error: str = "", attempts: int = 1, unknown: bool = False) -> None:
+        """
+        Store one send result (committed immediately, so a crash loses at most the in-flight sends).
+        unknown=True (sms_dispatch.outcome_unknown, e.g. a read timeout) keeps the row queued: the
+        message may have gone out, so it is neither resent nor left out of the daily cap. "failed"
+        is only for definite rejections and requests that never reached the provider.
+        """
+        status = "sent" if ok else "queued" if unknown else "failed"
+        with self._lock:
+            if ok and sid:
+                # The status callback can beat the API response back
+                known = self.conn.execute("SELECT status FROM message_status WHERE sid = ?", (sid,)).fetchone()
+                if known and known[0] in LEDGER_FINAL:
+                    status = LEDGER_FINAL[known[0]]
+            self.conn.execute(
+                "UPDATE sends SET status = ?, sid = ?, error_code = ?, error = ?, attempts = attempts + ?,"
+                " updated_at = ? WHERE campaign_id = ? AND phone_key = ?",
+                (status, sid or None, error_code, error or None, attempts, time.time(), campaign_id, int(phone_key)),
+            )
+            self.conn.commit()
+
+    def apply_status_events(self, events: list[dict]) -> int:
+        """
+        Fold status callback events (see status_event()) into the per-SID state and the campaign
+        counters in one transaction (rolled back if it fails, so the batch can be retried).
+        Events that don't move a message forward are dropped. Returns how many were applied.
+        """
+        if not events:
+            return 0
+        now = time.time()
+        applied = 0
+        with self._lock:
+            sids = list({e["sid"] for e in events})
+            state = {}
+            for i in range(0, len(sids), SYNC_BATCH):
+                chunk = sids[i:i + SYNC_BATCH]
+                marks = ",".join("?" * len(chunk))
+                for sid, campaign, status in self.conn.execute(
+                    f"SELECT sid, campaign_id, status FROM message_status WHERE sid IN ({marks})", chunk
+                ):
+                    state[sid] = (campaign, status)
+                # First event for a message: campaign from the send ledger when the callback URL had none
+                missing = [sid for sid in chunk if sid not in state]
+                if missing:
+                    marks = ",".join("?" * len(missing))
+                    for sid, campaign in self.conn.execute(
+                        f"SELECT sid, campaign_id FROM sends WHERE sid IN ({marks})", missing
+                    ):
+                        state[sid] = (campaign, None)
+            counts: dict[tuple[str, str], int] = {}
+            errors: dict[tuple[str, int], int] = {}
+            updates = {}
+            for e in events:
+                campaign, prev = state.get(e["sid"], ("", None))
+                if prev is None:  # counters already carry a campaign once a status was counted
+                    campaign = campaign or e.get("campaign_id") or ""
+                status = e["status"]
+                if prev is not None and STATUS_RANK.get(status, -1) <= STATUS_RANK.get(prev, -1):
+                    continue
+                if prev is not None:
+                    counts[(campaign, prev)] = counts.get((campaign, prev), 0) - 1
+                counts[(campaign, status)] = counts.get((campaign, status), 0) + 1
+                if status in FAILED_STATUSES and e.get("error_code"):
+                    key = (campaign, int(e["error_code"]))
+                    errors[key] = errors.get(key, 0) + 1
+                state[e["sid"]] = (campaign, status)
+                updates[e["sid"]] = (e["sid"], campaign, status, e.get("error_code"), now)
+                applied += 1
+            try:
+                self.conn.executemany(
+                    "INSERT INTO message_status (sid, campaign_id, status, error_code, updated_at) VALUES (?, ?, ?, ?, ?)"
+                    " ON CONFLICT (sid) DO UPDATE SET campaign_id = excluded.campaign_id, status = excluded.status,"
+                    " error_code = COALESCE(excluded.error_code, message_status.error_code), updated_at = excluded.updated_at",
+                    list(updates.values()),
+                )
+                self.conn.executemany(
+                    "INSERT INTO delivery_counts (campaign_id, status, n) VALUES (?, ?, ?)"
+                    " ON CONFLICT (campaign_id, status) DO UPDATE SET n = n + excluded.n",
+                    [(c, st, n) for (c, st), n in counts.items() if n],
+                )
+                self.conn.executemany(
+                    "INSERT INTO delivery_errors (campaign_id, error_code, n) VALUES (?, ?, ?)"
+                    " ON CONFLICT (campaign_id, error_code) DO UPDATE SET n = n + excluded.n",
+                    [(c, code, n) for (c, code), n in errors.items()],
+                )
+                self.conn.executemany(
+                    "UPDATE sends SET status = ?, error_code = COALESCE(?, error_code), updated_at = ? WHERE sid = ?",
+                    [(LEDGER_FINAL[st], code, now, sid) for sid, _, st, code, _ in updates.values() if st in LEDGER_FINAL],
+                )
+            except BaseException:
+                self.conn.rollback()  # a retried batch must not count twice
+                raise
+            self.conn.commit()
+        return applied
+
+    def delivery_counts(self, campaign_id: str) -> dict:
+        """Messages per latest status for the campaign, plus "total" (reads the running counters)."""
+        with self._lock:
+            counts = dict(self.conn.execute(
+                "SELECT status, n FROM delivery_counts WHERE campaign_id = ? AND n != 0", (campaign_id,)
+            ).fetchall())
+        counts["total"] = sum(counts.values())
+        return counts
+
+    def delivery_errors(self, campaign_id: str) -> dict:
+        """Error code -> messages that failed or went undelivered with it."""
+        with self._lock:
+            return dict(self.conn.execute(
+                "SELECT error_code, n FROM delivery_errors WHERE campaign_id = ? ORDER BY n DESC", (campaign_id,)
+            ).fetchall())
+
+    def failure_rate(self, campaign_id: str, min_final: int = 1) -> float:
+        """Share of finished messages that failed or went undelivered (0.0 until min_final have finished)."""
+        counts = self.delivery_counts(campaign_id)
+        bad = sum(counts.get(st, 0) for st in FAILED_STATUSES)
+        final = bad + counts.get("delivered", 0) + counts.get("read", 0)
+        return bad / final if final >= max(1, min_final) else 0.0
+
+    def rows(self, campaign_id: str | None = None, since: float | None = None) -> list[dict]:
+        sql = "SELECT * FROM sends WHERE 1 = 1"
+        params = []
+        if campaign_id:
+            sql += " AND campaign_id = ?"
+            params.append(campaign_id)
+        if since is not None:
+            sql += " AND updated_at >= ?"
+            params.append(since)
+        with self._lock:
+            cur = self.conn.execute(sql, params)
+            cols = [d[0] for d in cur.description]
+            return [dict(zip(cols, r)) for r in cur.fetchall()]
+
+    def status_counts(self, campaign_id: str | None = None) -> dict:
+        sql = "SELECT status, COUNT(*) FROM sends"
+        params = []
+        if campaign_id:
+            sql += " WHERE campaign_id = ?"
+            params.append(campaign_id)
+        with self._lock:
+            return dict(self.conn.execute(sql + " GROUP BY status", params).fetchall())
+
+    def sync_to_supabase(self, supabase, campaign_id: str | None = None, since: float | None = None) -> int:
+        """Upsert ledger rows into Supabase sms_sends (on campaign_id, phone_number). Returns rows pushed."""
+        rows = (
+            {
+                "campaign_id": r["campaign_id"],
+                "phone_number": str(r["phone_key"]),
+                "from_number": r["from_number"],
+                "status": r["status"],
+                "sid": r["sid"],
+                "error_code": r["error_code"],
+                "error": r["error"],
+                "attempts": r["attempts"],
+                "queued_at": _iso(r["queued_at"]),
+                "updated_at": _iso(r["updated_at"]),
+            }
+            for r in self.rows(campaign_id, since)
+        )
+        return BulkLoader(supabase).load("sms_sends", rows, on_conflict="campaign_id,phone_number")["rows"]
+
+    def close(self):
+        self.conn.close()
+
+
+def status_event(values, campaign_id: str = "") -> dict | None:
+    """Event dict from a Twilio status callback form (MessageSid, MessageStatus, ErrorCode), or None."""
+    sid = values.get("MessageSid") or values.get("SmsSid") or ""
+    status = (values.get("MessageStatus") or values.get("SmsStatus") or "").strip().lower()
+    if not sid or status not in STATUS_RANK:
+        return None
+    code = values.get("ErrorCode") or ""
+    return {"sid": sid, "status": status, "error_code": int(code) if code.isdigit() else None,
+            "campaign_id": campaign_id}
+
+
+def get_supabase():
+    url = os.environ.get("SUPABASE_URL") or os.environ.get("NEXT_PUBLIC_SUPABASE_URL")
+    key = os.environ.get("SUPABASE_SERVICE_ROLE_KEY")
+    if not url or not key:
+        return None
+    try:
+        from supabase import create_client
+        return create_client(url, key)
+    except Exception as e:
+        print(f"Supabase client error: {e}", file=sys.stderr)
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="SMS send ledger")
+    parser.add_argument("--ledger", default=DEFAULT_LEDGER, help="Ledger file (default send_ledger.sqlite3)")
+    sub = parser.add_subparsers(dest="command", required=True)
+    p_stats = sub.add_parser("stats", help="Status counts and rolling 24h sends")
+    p_stats.add_argument("--campaign", default="")
+    p_sync = sub.add_parser("sync", help="Upsert ledger rows into Supabase sms_sends")
+    p_sync.add_argument("--campaign", default="")
+    args = parser.parse_args()
+
+    ledger = SendLedger(args.ledger)
+    try:
+        if args.command == "stats":
+            print(f"Status counts{' for ' + args.campaign if args.campaign else ''}: {ledger.status_counts(args.campaign or None)}")
+            print(f"Sent in the last 24h: {ledger.count_since(time.time() - DAY_SEC)}")
+            if args.campaign:
+                print(f"Delivery (status callbacks): {ledger.delivery_counts(args.campaign)}, "
+                      f"failure rate {ledger.failure_rate(args.campaign):.1%}")
+                errors = ledger.delivery_errors(args.campaign)
+                if errors:
+                    print(f"Error codes: {errors}")
+        elif args.command == "sync":
+            supabase = get_supabase()
+            if not supabase:
+                print("Set SUPABASE_URL (or NEXT_PUBLIC_SUPABASE_URL) and SUPABASE_SERVICE_ROLE_KEY.")
+                return
+            print(f"Pushed {ledger.sync_to_supabase(supabase, args.campaign or None)} rows to sms_sends")
+    finally:
+        ledger.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -8,9 +8,10 @@ Usage:
 """
 import argparse
 import os
-import re
 from pathlib import Path
 
+from phone_utils import to_e164
+
 
 def main():
     parser = argparse.ArgumentParser(description="Send one SMS via Twilio")
@@ -18,11 +19,10 @@ def main():
     parser.add_argument("--message", required=True, help="Message body")
     args = parser.parse_args()
 
-    digits = re.sub(r"\D", "", args.phone)
-    if len(digits) < 10:
-        print("Invalid phone: need at least 10 digits.")
+    to_num = to_e164(args.phone)
+    if not to_num:
+        print("Invalid phone: need a valid 10-digit US number.")
         return
-    to_num = "+1" + digits[-10:]
 
     sid = os.environ.get("TWILIO_ACCOUNT_SID")
     token = os.environ.get("TWILIO_AUTH_TOKEN")
@@ -1,7 +1,8 @@
 #!/usr/bin/env python3
 """
 Send one SMS to each warm lead from a CSV (e.g. exported from Supabase).
-Used for follow-up messages to opted-in contacts.
+Used for follow-up messages to opted-in contacts. The message may use list columns
+({full_name}) and is made GSM-7-safe unless --keep-unicode (see scripts/sms_message.py).
 
 Usage:
   python scripts/send_warm_lead_message.py --list warm_leads.csv --message "We'll call you shortly."
@@ -9,19 +10,27 @@ Usage:
 """
 import argparse
 import os
-import time
 from pathlib import Path
 
+from phone_utils import e164
+from sms_dispatch import DEFAULT_CONCURRENCY, TwilioSender, dispatch, format_summary, rate_from_args
+from sms_message import DEFAULT_PRICE_PER_SEGMENT, format_cost_summary, gsm_safe_series, render, summarize
+
 DEFAULT_DELAY_SEC = 1.0
 
 
 def main():
     parser = argparse.ArgumentParser(description="Send SMS to all warm leads (Twilio)")
     parser.add_argument("--list", required=True, help="Warm leads CSV (phone_number or Phone_Number column)")
-    parser.add_argument("--message", required=True, help="Message body (under 160 chars)")
+    parser.add_argument("--message", required=True, help="Message body (1 GSM-7 segment is 160 chars); list columns like {full_name}")
+    parser.add_argument("--keep-unicode", action="store_true", help="Don't replace curly quotes, dashes etc. with GSM-7 characters")
+    parser.add_argument("--price-per-segment", type=float, default=DEFAULT_PRICE_PER_SEGMENT,
+                        help=f"USD per segment for the cost estimate (default {DEFAULT_PRICE_PER_SEGMENT})")
     parser.add_argument("--send", action="store_true", help="Actually send (default: dry-run)")
     parser.add_argument("--dry-run", action="store_true", help="Explicitly dry-run")
-    parser.add_argument("--delay", type=float, default=DEFAULT_DELAY_SEC, help="Seconds between sends")
+    parser.add_argument("--delay", type=float, default=DEFAULT_DELAY_SEC, help="Seconds between sends; ignored with --rate")
+    parser.add_argument("--rate", type=float, default=0, help="Messages/sec the sending number is allowed (default 1/--delay)")
+    parser.add_argument("--concurrency", type=int, default=DEFAULT_CONCURRENCY, help=f"Requests in flight (default {DEFAULT_CONCURRENCY})")
     args = parser.parse_args()
     dry_run = not args.send
 
@@ -38,22 +47,30 @@ def main():
         print(f"CSV must have '{col}' column and at least one row.")
         return
 
-    df[col] = df[col].astype(str).str.replace(r"\D", "", regex=True)
-    df = df[df[col].str.len() >= 10]
-    df["To"] = "+1" + df[col].str[-10:]
+    df["To"] = e164(df[col])
+    df = df[df["To"] != ""]
     df = df.drop_duplicates(subset=["To"], keep="first")
 
     message = (args.message or "").strip()
     if not message:
         print("--message is required.")
         return
-    if len(message) > 160:
-        print(f"Warning: message length {len(message)} > 160 chars.")
+    try:
+        bodies = render(message, df)
+    except (KeyError, ValueError) as e:
+        print(f"Message template: {e}")
+        return
+    if not args.keep_unicode:
+        bodies = gsm_safe_series(bodies)
+    cost = summarize(bodies, args.price_per_segment)
+    print(format_cost_summary(cost, args.price_per_segment))
+    if cost["max_segments"] > 1:
+        print(f"Warning: some messages are {cost['max_segments']} segments.")
 
     if dry_run:
         print(f"DRY RUN: would send to {len(df)} warm leads.")
-        for _, row in df.head(5).iterrows():
-            print(f"  -> {row['To']}")
+        for to, body in zip(df["To"].head(5), bodies.head(5)):
+            print(f"  -> {to}: {body}")
         if len(df) > 5:
             print(f"  ... and {len(df) - 5} more.")
         print("Pass --send and set TWILIO_ACCOUNT_SID, TWILIO_AUTH_TOKEN, TWILIO_FROM to send.")
@@ -66,24 +83,21 @@ def main():
         print("Set TWILIO_ACCOUNT_SID, TWILIO_AUTH_TOKEN, TWILIO_FROM to send. Exiting.")
         return
 
-    try:
-        from twilio.rest import Client
-    except ImportError:
-        print("Install twilio: pip install twilio")
-        return
+    sender = TwilioSender(sid, token, from_num, pool_size=args.concurrency)
+    rate = rate_from_args(args.rate, args.delay)
+    print(f"Sending {len(df)} messages at {rate:g} msg/s, {args.concurrency} in flight...")
+
+    def report(r):
+        if r["ok"]:
+            print(f"Sent to {r['to']} ({r['latency_ms']:.0f} ms)")
+        else:
+            print(f"Failed {r['to']}: {r['error']}" + (f" (code {r['error_code']})" if r["error_code"] else ""))
 
-    client = Client(sid, token)
-    sent = 0
-    for _, row in df.iterrows():
-        try:
-            client.messages.create(to=row["To"], from_=from_num, body=message)
-            sent += 1
-            print(f"Sent to {row['To']}")
-        except Exception as e:
-            print(f"Failed {row['To']}: {e}")
-        time.sleep(args.delay)
-
-    print(f"Sent {sent} messages to warm leads.")
+    messages = [{"to": to, "body": body} for to, body in zip(df["To"], bodies)]
+    summary = dispatch(messages, sender, rate=rate, concurrency=args.concurrency, on_result=report)
+    sender.close()
+    print(f"Sent {summary['sent']} messages to warm leads.")
+    print(format_summary(summary))
 
 
 if __name__ == "__main__":
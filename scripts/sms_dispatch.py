@@ -0,0 +1,216 @@
+"""
+Shared SMS dispatch for send_campaign / send_warm_lead_message: concurrent sends through a
+thread pool, paced by a token bucket at the number's permitted messages/sec, over one pooled
+HTTPS session to the Twilio Messages API.
+
+  sender = TwilioSender(sid, token, from_number)           # base_url= / TWILIO_API_BASE for fake_twilio.py
+  summary = dispatch([{"to": "+19017524443", "body": "..."}], sender, rate=1.0, concurrency=8,
+                     on_result=print)
+
+Errors are classified per attempt: HTTP 429, 5xx and connection failures (nothing reached Twilio)
+are retried with exponential backoff (Retry-After honoured, every retry takes a new token);
+other 4xx (invalid number, unsubscribed recipient, auth) and read timeouts (Twilio may already
+have accepted the message, so a retry could double-text) are final. Each result dict carries
+the attempt count, the final API round trip (latency_ms) and the time from first attempt to
+result (elapsed_ms); outcome_unknown(result) tells a read timeout apart from a definite failure,
+so the caller doesn't count it as unsent. A stop() callable lets the caller halt a run (e.g. on a delivery failure
+spike): messages not yet attempted come back as failed with "cancelled" set.
+"""
+import os
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import requests
+from requests.adapters import HTTPAdapter
+
+TWILIO_API = "https://api.twilio.com"
+DEFAULT_RATE = 1.0  # msgs/sec for a US long code; toll-free and short codes allow more
+DEFAULT_CONCURRENCY = 8
+MAX_RETRIES = 3
+BACKOFF_BASE_SEC = 1.0
+BACKOFF_MAX_SEC = 30.0
+REQUEST_TIMEOUT_SEC = (5, 30)  # connect, read
+RETRYABLE_HTTP = {429, 500, 502, 503, 504}
+# Result of a message that stop() cancelled before its next attempt
+CANCELLED = {"ok": False, "sid": "", "status": "", "http_status": 0, "error_code": None, "error": "cancelled",
+             "retryable": False, "retry_after": None, "latency_ms": 0.0, "cancelled": True}
+
+
+class TokenBucket:
+    """Thread-safe token bucket: acquire() blocks until a send is allowed at `rate` per second."""
+
+    def __init__(self, rate: float, burst: int = 1):
+        if rate <= 0:
+            raise ValueError("rate must be > 0")
+        self.rate = float(rate)
+        self.burst = max(1, int(burst))
+        self._tokens = float(self.burst)
+        self._last = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._last) * self.rate)
+            self._last = now
+            # Reserve a token even if it isn't there yet; waiters queue up behind each other
+            self._tokens -= 1
+            wait = -self._tokens / self.rate if self._tokens < 0 else 0.0
+        if wait > 0:
+            time.sleep(wait)
+
+
+class TwilioSender:
+    """One Messages API call per send() over a pooled session (safe to share across threads)."""
+
+    def __init__(self, account_sid: str, auth_token: str, from_number: str, base_url: str | None = None,
+                 pool_size: int = DEFAULT_CONCURRENCY, status_callback: str | None = None):
+        self.from_number = from_number
+        self.status_callback = status_callback
+        base = (base_url or os.environ.get("TWILIO_API_BASE") or TWILIO_API).rstrip("/")
+        self.url = f"{base}/2010-04-01/Accounts/{account_sid}/Messages.json"
+        self.session = requests.Session()
+        self.session.auth = (account_sid, auth_token)
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max(1, pool_size))
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+    def send(self, to: str, body: str) -> dict:
+        """One attempt. Returns ok, sid, status, http_status, error_code, error, retryable, retry_after, latency_ms."""
+        data = {"To": to, "From": self.from_number, "Body": body}
+        if self.status_callback:
+            data["StatusCallback"] = self.status_callback
+        out = {"ok": False, "sid": "", "status": "", "http_status": 0, "error_code": None, "error": "",
+               "retryable": False, "retry_after": None}
+        t0 = time.perf_counter()
+        try:
+            resp = self.session.post(self.url, data=data, timeout=REQUEST_TIMEOUT_SEC)
+        except requests.ConnectionError as e:  # includes ConnectTimeout
+            out.update(error=f"connection error: {e}", retryable=True)
+            out["latency_ms"] = (time.perf_counter() - t0) * 1000
+            return out
+        except requests.RequestException as e:  # ReadTimeout etc.: outcome unknown, don't resend
+            out.update(error=f"request error: {e}")
+            out["latency_ms"] = (time.perf_counter() - t0) * 1000
+            return out
+        out["latency_ms"] = (time.perf_counter() - t0) * 1000
+        out["http_status"] = resp.status_code
+        try:
+            payload = resp.json()
+        except ValueError:
+            payload = {}
+        if resp.status_code in (200, 201):
+            out.update(ok=True, sid=payload.get("sid", ""), status=payload.get("status", "queued"))
+            return out
+        out["error_code"] = payload.get("code")
+        out["error"] = payload.get("message") or f"HTTP {resp.status_code}"
+        out["retryable"] = resp.status_code in RETRYABLE_HTTP
+        retry_after = resp.headers.get("Retry-After")
+        if retry_after:
+            try:
+                out["retry_after"] = float(retry_after)
+            except ValueError:
+                pass
+        return out
+
+    def close(self):
+        self.session.close()
+
+
+def outcome_unknown(result: dict) -> bool:
+    """
+    No HTTP response and not retryable (a read timeout or other RequestException that isn't a
+    ConnectionError): Twilio may have accepted the message, so it must not be sent again.
+    """
+    return not result["ok"] and not result["http_status"] and not result["retryable"] and not result.get("cancelled")
+
+
+def _backoff(attempt: int, retry_after: float | None) -> float:
+    if retry_after is not None:
+        return min(retry_after, BACKOFF_MAX_SEC)
+    delay = min(BACKOFF_BASE_SEC * (2 ** attempt), BACKOFF_MAX_SEC)
+    return delay * (0.5 + random.random() / 2)  # jitter so retries don't arrive together
+
+
+def dispatch(messages, sender, rate: float = DEFAULT_RATE, concurrency: int = DEFAULT_CONCURRENCY,
+             max_retries: int = MAX_RETRIES, on_result=None, stop=None, on_attempt=None) -> dict:
+    """
+    Send every message (dicts with "to" and "body"; other keys are passed through to the result)
+    at most `rate` per second with up to `concurrency` requests in flight. on_result(result) is
+    called once per message, serialized, as results arrive. stop() is checked before each attempt
+    and again once its rate token arrives; once it returns True the remaining messages are not
+    sent. on_attempt(msg) is called, serialized, right before a message's first request (a message
+    cancelled before that never sees it). Returns a summary dict with counts, wall time and
+    latency percentiles; summary["results"] holds every result.
+    """
+    bucket = TokenBucket(rate)
+    report_lock = threading.Lock()
+
+    def send_one(msg: dict) -> dict:
+        start = time.perf_counter()
+        attempt = 0
+        while True:
+            if stop is not None and stop():
+                res = dict(CANCELLED)
+                break
+            bucket.acquire()
+            # The wait for a token can be long (concurrency / rate seconds): a stop that fired
+            # meanwhile cancels this message too
+            if stop is not None and stop():
+                res = dict(CANCELLED)
+                break
+            if attempt == 0 and on_attempt is not None:
+                with report_lock:
+                    on_attempt(msg)
+            res = sender.send(msg["to"], msg["body"])
+            attempt += 1
+            if res["ok"] or not res["retryable"] or attempt > max_retries:
+                break
+            time.sleep(_backoff(attempt - 1, res.get("retry_after")))
+        result = {**msg, **res, "attempts": attempt, "elapsed_ms": (time.perf_counter() - start) * 1000}
+        if on_result is not None:
+            with report_lock:
+                on_result(result)
+        return result
+
+    messages = list(messages)
+    t0 = time.perf_counter()
+    if not messages:
+        results = []
+    else:
+        with ThreadPoolExecutor(max_workers=max(1, concurrency)) as ex:
+            results = list(ex.map(send_one, messages))
+    wall = time.perf_counter() - t0
+    results_sent = [r for r in results if not r.get("cancelled")]
+    lat = np.array([r["latency_ms"] for r in results_sent]) if results_sent else np.zeros(1)
+    return {
+        "sent": sum(1 for r in results if r["ok"]),
+        "failed": sum(1 for r in results if not r["ok"]),
+        "retried": sum(1 for r in results if r["attempts"] > 1),
+        "cancelled": sum(1 for r in results if r.get("cancelled")),
+        "seconds": wall,
+        "rate": len(results_sent) / wall if wall else 0.0,
+        "latency_p50_ms": float(np.percentile(lat, 50)),
+        "latency_p95_ms": float(np.percentile(lat, 95)),
+        "latency_max_ms": float(lat.max()),
+        "results": results,
+    }
+
+
+def format_summary(summary: dict) -> str:
+    cancelled = f", {summary['cancelled']} cancelled" if summary.get("cancelled") else ""
+    return (
+        f"{summary['sent']} sent, {summary['failed']} failed ({summary['retried']} retried{cancelled}) in "
+        f"{summary['seconds']:.1f}s ({summary['rate']:.2f} msg/s); API latency ms p50 "
+        f"{summary['latency_p50_ms']:.0f} p95 {summary['latency_p95_ms']:.0f} max {summary['latency_max_ms']:.0f}"
+    )
+
+
+def rate_from_args(rate: float, delay: float) -> float:
+    """--rate wins; otherwise the old --delay (seconds between sends) becomes 1/delay msgs/sec."""
+    if rate and rate > 0:
+        return rate
+    return 1.0 / delay if delay and delay > 0 else DEFAULT_RATE
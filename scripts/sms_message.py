@@ -0,0 +1,194 @@
+#!/usr/bin/env python3
+"""
+SMS message compiler: encoding, exact segment counts, GSM-7-safe substitutions and
+vectorized per-row rendering, so the dry run shows what a campaign will actually be billed.
+
+One non-GSM character (en dash, curly quote, emoji, most accented letters) switches the whole
+message to UCS-2: 70 characters in a single segment, 67 per part once it is split, instead of
+GSM-7's 160 / 153. Extension characters (^ { } [ ] ~ | \\ €) cost two GSM-7 septets, and a part
+never splits an escape pair or a UTF-16 surrogate pair.
+
+Scalar API:    encoding(text) -> "GSM-7" | "UCS-2", segments(text), gsm_safe(text),
+               non_gsm_chars(text)
+Vectorized:    render(template, df, company=...) -> Series of bodies ({company} or any column,
+               e.g. {Full_Name}), gsm_safe_series(bodies), segment_counts(bodies),
+               summarize(bodies, price_per_segment)
+
+Usage:
+  python scripts/sms_message.py "Hi, Tree Service here – need help?"
+"""
+import argparse
+import re
+import string
+import unicodedata
+
+import numpy as np
+import pandas as pd
+
+GSM_BASIC = (
+    "@£$¥èéùìòÇ\nØø\rÅåΔ_ΦΓΛΩΠΨΣΘΞÆæßÉ !\"#¤%&'()*+,-./0123456789:;<=>?"
+    "¡ABCDEFGHIJKLMNOPQRSTUVWXYZÄÖÑÜ§¿abcdefghijklmnopqrstuvwxyzäöñüà"
+)
+GSM_EXTENSION = "\f^{}\\[~]|€"  # sent as ESC + char: two septets each
+GSM_SINGLE, GSM_PART = 160, 153
+UCS2_SINGLE, UCS2_PART = 70, 67
+DEFAULT_PRICE_PER_SEGMENT = 0.0083  # USD, Twilio US long code outbound (carrier fees not included)
+
+# Common look-alikes that silently force UCS-2 (smart punctuation from phones and word processors)
+GSM_SUBSTITUTIONS = {
+    "\u2018": "'", "\u2019": "'", "\u201a": "'", "\u201b": "'", "\u2032": "'", "\u00b4": "'", "`": "'",
+    "\u201c": '"', "\u201d": '"', "\u201e": '"', "\u201f": '"', "\u2033": '"', "\u00ab": '"', "\u00bb": '"',
+    "\u2010": "-", "\u2011": "-", "\u2012": "-", "\u2013": "-", "\u2014": "-", "\u2015": "-", "\u2212": "-",
+    "\u2026": "...", "\u2022": "-", "\u00b7": "-",
+    "\u00a0": " ", "\u2002": " ", "\u2003": " ", "\u2009": " ", "\u200a": " ", "\u202f": " ",
+    "\u200b": "", "\u200d": "", "\ufeff": "",
+    "\u00e7": "\u00c7",  # c cedilla: GSM-7 only has the capital
+}
+_TRANSLATE = str.maketrans(GSM_SUBSTITUTIONS)
+_GSM_CHARS = set(GSM_BASIC) | set(GSM_EXTENSION)
+_GSM_RE = re.compile(f"[{re.escape(GSM_BASIC + GSM_EXTENSION)}]*")
+_EXT_RE = re.compile(f"[{re.escape(GSM_EXTENSION)}]")
+_ASTRAL_RE = re.compile("[\U00010000-\U0010ffff]")  # two UTF-16 code units (emoji)
+
+
+def is_gsm(text: str) -> bool:
+    return bool(_GSM_RE.fullmatch(text))
+
+
+def encoding(text: str) -> str:
+    return "GSM-7" if is_gsm(text) else "UCS-2"
+
+
+def non_gsm_chars(text: str) -> list[str]:
+    """Distinct characters that force UCS-2, in order of appearance."""
+    return list(dict.fromkeys(c for c in text if c not in _GSM_CHARS))
+
+
+def _units(text: str) -> tuple[list[int], int, int]:
+    """Per-character cost (septets or UTF-16 units), single-message limit, per-part limit."""
+    if is_gsm(text):
+        return [2 if c in GSM_EXTENSION else 1 for c in text], GSM_SINGLE, GSM_PART
+    return [2 if ord(c) > 0xFFFF else 1 for c in text], UCS2_SINGLE, UCS2_PART
+
+
+def segments(text: str) -> int:
+    """Billed segments for one message (parts never split an escape or surrogate pair)."""
+    units, single, part = _units(text)
+    if sum(units) <= single:
+        return 1
+    n, used = 1, 0
+    for u in units:
+        if used + u > part:
+            n, used = n + 1, 0
+        used += u
+    return n
+
+
+def gsm_safe(text: str) -> str:
+    """Apply GSM_SUBSTITUTIONS, then drop accents from what is left (á -> a) where that makes it GSM-7."""
+    text = text.translate(_TRANSLATE)
+    if is_gsm(text):
+        return text
+    out = []
+    for c in text:
+        if c in _GSM_CHARS:
+            out.append(c)
+            continue
+        base = "".join(b for b in unicodedata.normalize("NFKD", c) if not unicodedata.combining(b))
+        out.append(base if base and all(b in _GSM_CHARS for b in base) else c)
+    return "".join(out)
+
+
+def render(template: str, df: pd.DataFrame, **values) -> pd.Series:
+    """
+    One body per row: {name} is filled from values (e.g. company=) or else the df column of
+    that name (blank for NaN). Built column-wise, not with a per-row str.format.
+    """
+    out = pd.Series("", index=df.index, dtype=object)
+    for literal, field, spec, conversion in string.Formatter().parse(template):
+        if literal:
+            out = out + literal
+        if field is None:
+            continue
+        if spec or conversion:
+            raise ValueError(f"Format specs aren't supported in message fields: {{{field}}}")
+        if field in values:
+            out = out + str(values[field])
+        elif field in df.columns:
+            col = df[field]
+            out = out + col.astype(object).where(col.notna(), "").astype(str).str.strip().astype(object)
+        else:
+            raise KeyError(f"Unknown message field {{{field}}} (use {{company}} or a list column)")
+    return out
+
+
+def gsm_safe_series(bodies: pd.Series) -> pd.Series:
+    """Vectorized gsm_safe: table substitutions for every row, the accent fallback only where still needed."""
+    out = bodies.str.translate(_TRANSLATE)
+    still = ~out.str.fullmatch(_GSM_RE)
+    if still.any():
+        out[still] = out[still].map(gsm_safe)
+    return out
+
+
+def segment_counts(bodies: pd.Series) -> pd.Series:
+    """Vectorized segments(): int Series aligned with bodies."""
+    gsm = bodies.str.fullmatch(_GSM_RE).to_numpy(dtype=bool)
+    extra = np.where(gsm, bodies.str.count(_EXT_RE), bodies.str.count(_ASTRAL_RE))
+    units = bodies.str.len().to_numpy() + extra
+    single = np.where(gsm, GSM_SINGLE, UCS2_SINGLE)
+    part = np.where(gsm, GSM_PART, UCS2_PART)
+    counts = pd.Series(np.where(units <= single, 1, np.ceil(units / part)).astype(int), index=bodies.index)
+    # Pairs that can't be split may push a part over: exact count for the few rows that can hit it
+    exact = (units > single) & (extra > 0)
+    if exact.any():
+        counts[exact] = bodies[exact].map(segments)
+    return counts
+
+
+def summarize(bodies: pd.Series, price_per_segment: float = DEFAULT_PRICE_PER_SEGMENT) -> dict:
+    """Messages, UCS-2 count, total / min / max segments and estimated cost for a rendered list."""
+    if bodies.empty:
+        return {"messages": 0, "ucs2": 0, "segments": 0, "min_segments": 0, "max_segments": 0, "cost": 0.0,
+                "non_gsm": []}
+    counts = segment_counts(bodies)
+    ucs2 = ~bodies.str.fullmatch(_GSM_RE)
+    non_gsm = non_gsm_chars("".join(bodies[ucs2].head(1000))) if ucs2.any() else []
+    total = int(counts.sum())
+    return {
+        "messages": len(bodies),
+        "ucs2": int(ucs2.sum()),
+        "segments": total,
+        "min_segments": int(counts.min()),
+        "max_segments": int(counts.max()),
+        "cost": total * price_per_segment,
+        "non_gsm": non_gsm,
+    }
+
+
+def format_cost_summary(summary: dict, price_per_segment: float = DEFAULT_PRICE_PER_SEGMENT) -> str:
+    per = (f"{summary['min_segments']}" if summary["min_segments"] == summary["max_segments"]
+           else f"{summary['min_segments']}-{summary['max_segments']}")
+    enc = "GSM-7" if not summary["ucs2"] else f"UCS-2 for {summary['ucs2']} of {summary['messages']}"
+    line = (f"{summary['messages']} messages ({enc}), {per} segment(s) each, {summary['segments']} segments total, "
+            f"est. ${summary['cost']:,.2f} at ${price_per_segment:g}/segment")
+    if summary["non_gsm"]:
+        line += f"\n  UCS-2 caused by: {' '.join(repr(c) for c in summary['non_gsm'][:20])}"
+    return line
+
+
+def main():
+    parser = argparse.ArgumentParser(description="SMS encoding, segment count and GSM-7-safe version of a message")
+    parser.add_argument("message")
+    args = parser.parse_args()
+    text = args.message
+    print(f"{encoding(text)}, {len(text)} chars, {segments(text)} segment(s)")
+    bad = non_gsm_chars(text)
+    if bad:
+        print(f"Non-GSM characters: {' '.join(repr(c) for c in bad)}")
+        safe = gsm_safe(text)
+        print(f"GSM-7-safe ({encoding(safe)}, {segments(safe)} segment(s)): {safe}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,290 @@
+#!/usr/bin/env python3
+"""
+Persistent phone indexes shared by build_sms_list, send_campaign and the inbound webhook:
+opt-outs (suppression) and warm leads.
+
+SQLite file (suppression.sqlite3 in the repo root) with one table per list and one row per
+phone, keyed by its int64 phone key (INTEGER PRIMARY KEY, so inserts are idempotent and
+lookups are a single index probe; WAL + mmap for cheap concurrent reads, so several webhook
+processes can share it). The CSV copies (opt_outs.csv / warm_leads.csv from the webhook,
+_worker_*.csv exported from Supabase) are merged in with sync_csv(), which skips a file that
+hasn't changed and reads only the appended tail of one that has grown, so each table is the
+union of every copy and callers no longer re-read and re-normalize the CSVs.
+
+  idx = SuppressionIndex()                       # opt-outs
+  idx.sync_csv(ROOT / "opt_outs.csv")
+  keys = idx.keys()                              # sorted int64 array for anti-joins
+  idx.contains("(901) 752-4443")                 # O(1) point check
+  idx.add("9017524443", source="SMS reply")      # True only the first time
+  warm = SuppressionIndex(table="warm_leads")
+
+Usage:
+  python scripts/suppression.py [--table warm_leads] sync [CSV ...]   # merge CSVs (default: KNOWN_CSVS)
+  python scripts/suppression.py [--table warm_leads] check "(901) 752-4443"
+  python scripts/suppression.py stats
+"""
+import argparse
+import io
+import sqlite3
+import threading
+import zlib
+from datetime import datetime, timezone
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from file_cache import file_stamp
+from phone_utils import INVALID_KEY, phone_key, phone_keys
+
+ROOT = Path(__file__).resolve().parent.parent
+DEFAULT_INDEX = "suppression.sqlite3"
+# Every CSV copy of each list: local webhook CSV and the worker's Supabase export
+KNOWN_CSVS = {
+    "opt_outs": ("opt_outs.csv", "_worker_opt_outs.csv"),
+    "warm_leads": ("warm_leads.csv", "_worker_warm_leads.csv"),
+}
+# Column names tried in order when syncing a CSV (webhook CSVs, then Supabase exports)
+PHONE_COLUMNS = ("Phone_Number", "phone_number")
+DATE_COLUMNS = ("Date", "date", "Reply_Time", "reply_time")
+SOURCE_COLUMNS = ("Source", "source", "Source_Campaign", "source_campaign")
+MMAP_SIZE = 256 * 1024 * 1024
+
+_keys_cache = {}  # suppressed_keys(): (index, table, CSVs) -> (file stamps, keys)
+
+
+def _now() -> str:
+    return datetime.now(timezone.utc).strftime("%Y-%m-%d %H:%M:%S UTC")
+
+
+def _first_column(df: pd.DataFrame, names) -> str | None:
+    return next((c for c in names if c in df.columns), None)
+
+
+def _crc_prefix(path: Path, length: int) -> int:
+    crc = 0
+    with open(path, "rb") as f:
+        remaining = length
+        while remaining > 0:
+            block = f.read(min(remaining, 1 << 20))
+            if not block:
+                break
+            crc = zlib.crc32(block, crc)
+            remaining -= len(block)
+    return crc
+
+
+class SuppressionIndex:
+    """Phones in one list (opt_outs or warm_leads) keyed by int64 phone key; see module docstring."""
+
+    def __init__(self, path=None, table: str = "opt_outs", create: bool = True):
+        """create=False (dry runs) works on an in-memory index when the file doesn't exist yet."""
+        if table not in KNOWN_CSVS:
+            raise ValueError(f"Unknown table {table!r}; expected one of {', '.join(KNOWN_CSVS)}")
+        path = Path(path) if path else ROOT / DEFAULT_INDEX
+        self.path = path if path.is_absolute() else ROOT / path
+        self.table = table
+        db = str(self.path) if create or self.path.exists() else ":memory:"
+        self.conn = sqlite3.connect(db, timeout=30, check_same_thread=False)
+        self._lock = threading.Lock()  # shared by the webhook's request threads
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute(f"PRAGMA mmap_size={MMAP_SIZE}")
+        for name in KNOWN_CSVS:
+            self.conn.execute(
+                f"CREATE TABLE IF NOT EXISTS {name} ("
+                " phone_key INTEGER PRIMARY KEY,"
+                " date TEXT,"
+                " source TEXT)"
+            )
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS csv_sources ("
+            " path TEXT PRIMARY KEY,"
+            " size INTEGER NOT NULL,"
+            " mtime REAL NOT NULL,"
+            " offset INTEGER NOT NULL,"
+            " crc INTEGER NOT NULL)"
+        )
+        self.conn.commit()
+        self._insert = f"INSERT OR IGNORE INTO {table} (phone_key, date, source) VALUES (?, ?, ?)"
+
+    def add(self, phone, source: str = "SMS reply", date: str | None = None, before_commit=None) -> bool:
+        """
+        Add one phone. Returns True if it was new, False if already present or invalid.
+        before_commit() runs only for a new phone, inside the transaction (see add_rows).
+        """
+        hook = (lambda new: new[0] and before_commit()) if before_commit is not None else None
+        return self.add_rows([(phone, source, date)], before_commit=hook)[0]
+
+    def add_rows(self, rows, before_commit=None) -> list[bool]:
+        """
+        Add (phone, source, date) tuples in one transaction. Returns, per row, whether it was new.
+        before_commit(new) runs after the inserts, before the commit. The caller appends the CSV
+        copy there. If it raises, nothing is added and the error propagates, so a retry sees
+        the same rows as new again.
+        """
+        new = []
+        with self._lock:
+            try:
+                for phone, source, date in rows:
+                    key = phone_key(phone)
+                    if key == INVALID_KEY:
+                        new.append(False)
+                        continue
+                    cur = self.conn.execute(self._insert, (key, date or _now(), source))
+                    new.append(cur.rowcount == 1)
+                if before_commit is not None:
+                    before_commit(new)
+            except BaseException:
+                self.conn.rollback()
+                raise
+            self.conn.commit()
+        return new
+
+    def add_many(self, phones, dates=None, sources=None, default_source: str = "SMS reply") -> int:
+        """Bulk add (vectorized normalization, one transaction). Returns number of new phones."""
+        keys = phone_keys(pd.Series(phones) if not isinstance(phones, pd.Series) else phones).to_numpy()
+        n = len(keys)
+        dates = list(dates) if dates is not None else [None] * n
+        sources = list(sources) if sources is not None else [None] * n
+        now = _now()
+        rows = [
+            (int(k), (d if isinstance(d, str) and d else now), (s if isinstance(s, str) and s else default_source))
+            for k, d, s in zip(keys, dates, sources)
+            if k != INVALID_KEY
+        ]
+        with self._lock:
+            before = self.conn.total_changes
+            self.conn.executemany(self._insert, rows)
+            self.conn.commit()
+            return self.conn.total_changes - before
+
+    def contains(self, phone) -> bool:
+        key = phone_key(phone)
+        if key == INVALID_KEY:
+            return False
+        with self._lock:
+            return self.conn.execute(f"SELECT 1 FROM {self.table} WHERE phone_key = ?", (key,)).fetchone() is not None
+
+    def keys(self) -> np.ndarray:
+        """All phone keys in the list, sorted (primary-key order), as int64."""
+        with self._lock:
+            rows = self.conn.execute(f"SELECT phone_key FROM {self.table} ORDER BY phone_key").fetchall()
+        return np.fromiter((r[0] for r in rows), dtype=np.int64, count=len(rows))
+
+    def __len__(self):
+        with self._lock:
+            return self.conn.execute(f"SELECT COUNT(*) FROM {self.table}").fetchone()[0]
+
+    def sync_csv(self, csv_path) -> int:
+        """
+        Merge a CSV copy of this list into the index. Unchanged files are skipped; a file that only
+        grew (append-only, prefix checksum matches) is read from where the last sync stopped;
+        anything else is re-read in full. Returns number of new phones.
+        """
+        csv_path = Path(csv_path)
+        if not csv_path.exists():
+            return 0
+        st = csv_path.stat()
+        src = str(csv_path.resolve())
+        with self._lock:
+            row = self.conn.execute("SELECT size, mtime, offset, crc FROM csv_sources WHERE path = ?", (src,)).fetchone()
+        if row and row[0] == st.st_size and row[1] == st.st_mtime:
+            return 0
+        start = 0
+        if row and st.st_size >= row[2] and _crc_prefix(csv_path, row[2]) == row[3]:
+            start = row[2]
+        with open(csv_path, "rb") as f:
+            header = f.readline()
+            f.seek(max(start, len(header)))
+            body = f.read()
+        # Stop at the last complete line; a half-written row is picked up next sync
+        end = body.rfind(b"\n") + 1
+        body = body[:end]
+        offset = max(start, len(header)) + end
+        added = 0
+        if body.strip():
+            df = pd.read_csv(io.BytesIO(header + body), dtype=str, keep_default_na=False)
+            col = _first_column(df, PHONE_COLUMNS)
+            if col:
+                date_col = _first_column(df, DATE_COLUMNS)
+                src_col = _first_column(df, SOURCE_COLUMNS)
+                added = self.add_many(
+                    df[col],
+                    dates=df[date_col] if date_col else None,
+                    sources=df[src_col] if src_col else None,
+                )
+        crc = _crc_prefix(csv_path, offset)
+        with self._lock:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO csv_sources (path, size, mtime, offset, crc) VALUES (?, ?, ?, ?, ?)",
+                (src, st.st_size, st.st_mtime, offset, crc),
+            )
+            self.conn.commit()
+        return added
+
+    def close(self):
+        self.conn.close()
+
+
+def suppressed_keys(*csv_paths, index_path=None, table: str = "opt_outs", create: bool = True) -> np.ndarray:
+    """
+    Sync the given CSVs (plus the table's KNOWN_CSVS in the repo root) into the index and return
+    all keys in the list, sorted int64 (read-only), for isin() anti-joins. A long-lived process
+    gets the same array back without touching the index while none of the CSVs nor the index
+    file (or its WAL, where webhook STOPs land) changed. create=False reads the CSVs into an
+    in-memory index instead of creating the index file.
+    """
+    paths = {Path(p).resolve() for p in csv_paths if p}
+    paths.update((ROOT / name).resolve() for name in KNOWN_CSVS[table])
+    paths = sorted(paths)
+    path = Path(index_path) if index_path else ROOT / DEFAULT_INDEX
+    path = path if path.is_absolute() else ROOT / path
+    watched = paths + [path, path.with_name(path.name + "-wal")]
+    cache_key = (str(path), table, tuple(map(str, paths)))
+    hit = _keys_cache.get(cache_key)
+    if hit is not None and hit[0] == [file_stamp(p) for p in watched]:
+        return hit[1]
+    idx = SuppressionIndex(path, table=table, create=create)
+    try:
+        for p in paths:
+            idx.sync_csv(p)
+        keys = idx.keys()
+    finally:
+        idx.close()
+    keys.flags.writeable = False
+    _keys_cache[cache_key] = ([file_stamp(p) for p in watched], keys)
+    return keys
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Opt-out / warm-lead phone index")
+    parser.add_argument("--index", default=DEFAULT_INDEX, help="Index file (default suppression.sqlite3)")
+    parser.add_argument("--table", default="opt_outs", choices=list(KNOWN_CSVS), help="List to use (default opt_outs)")
+    sub = parser.add_subparsers(dest="command", required=True)
+    p_sync = sub.add_parser("sync", help="Merge CSVs into the index")
+    p_sync.add_argument("csv", nargs="*", help="CSVs (default: the table's webhook CSV and _worker_ export)")
+    p_check = sub.add_parser("check", help="Is a phone in the list?")
+    p_check.add_argument("phone")
+    sub.add_parser("stats", help="Phone counts and synced CSVs")
+    args = parser.parse_args()
+
+    idx = SuppressionIndex(args.index, table=args.table)
+    try:
+        if args.command == "sync":
+            for p in args.csv or [ROOT / name for name in KNOWN_CSVS[args.table]]:
+                print(f"{p}: {idx.sync_csv(p)} new")
+            print(f"{len(idx)} phones in {args.table}")
+        elif args.command == "check":
+            print(f"in {args.table}" if idx.contains(args.phone) else f"not in {args.table}")
+        elif args.command == "stats":
+            for name in KNOWN_CSVS:
+                count = idx.conn.execute(f"SELECT COUNT(*) FROM {name}").fetchone()[0]
+                print(f"{name}: {count} phones")
+            for path, size, offset in idx.conn.execute("SELECT path, size, offset FROM csv_sources ORDER BY path"):
+                print(f"  {path}: synced {offset}/{size} bytes")
+    finally:
+        idx.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,213 @@
+#!/usr/bin/env python3
+"""
+Incremental, paginated export of Supabase opt_outs and warm_leads to the worker's CSVs
+(_worker_opt_outs.csv, _worker_warm_leads.csv), which build_sms_list and send_campaign merge
+into the suppression index.
+
+Tables are read in FETCH_PAGE pages by keyset (never one unbounded select, which PostgREST
+silently cuts at its max-rows). The CSVs are kept as a local cache, and STATE_FILE keeps a
+watermark per table: the newest (timestamp, id) exported, plus the ids exported in the last
+LOOKBACK. Each export fetches only rows at or after watermark - LOOKBACK, so a row inserted
+with a slightly older timestamp (the webhook batches replies) is still picked up. New rows
+are appended, so the suppression index reads just the new tail. A count query then checks
+that the cache has exactly as many rows as the table. If not (rows deleted, a backdated or
+null timestamp, a missing or edited CSV), the table is exported again in full.
+
+  stats = export_table(supabase, OPT_OUTS, REPO_ROOT / "_worker_opt_outs.csv", state)
+  # {"table": "opt_outs", "mode": "incremental", "new": 3, "rows": 1204, "pages": 1}
+
+Usage:
+  python scripts/table_export.py [--full]   # export both tables into the repo root
+"""
+import argparse
+import csv
+import json
+import os
+import shutil
+import sys
+from datetime import datetime, timedelta
+from pathlib import Path
+
+from bulk_load import call_with_retry
+
+ROOT = Path(__file__).resolve().parent.parent
+STATE_FILE = "_worker_export_state.json"
+FETCH_PAGE = 1000  # PostgREST's default max rows per select
+LOOKBACK = timedelta(minutes=15)
+# table, watermark column, CSV file, and (Supabase column, CSV header, default) per CSV column
+OPT_OUTS = {"table": "opt_outs", "ts_column": "date", "csv": "_worker_opt_outs.csv",
+            "columns": (("phone_number", "Phone_Number", ""), ("date", "Date", ""), ("source", "Source", "SMS reply"))}
+WARM_LEADS = {"table": "warm_leads", "ts_column": "reply_time", "csv": "_worker_warm_leads.csv",
+              "columns": (("phone_number", "phone_number", ""),)}
+EXPORTS = (OPT_OUTS, WARM_LEADS)
+
+
+def _parse_ts(value) -> datetime | None:
+    if not value:
+        return None
+    try:
+        return datetime.fromisoformat(str(value).replace("Z", "+00:00"))
+    except ValueError:
+        return None
+
+
+def load_state(path: Path) -> dict:
+    try:
+        return json.loads(Path(path).read_text())
+    except (OSError, ValueError):
+        return {}
+
+
+def save_state(path: Path, state: dict):
+    path = Path(path)
+    tmp = path.with_suffix(path.suffix + ".tmp")
+    tmp.write_text(json.dumps(state))
+    os.replace(tmp, path)
+
+
+def _select(spec: dict) -> str:
+    cols = {"id", spec["ts_column"], *(c for c, _, _ in spec["columns"])}
+    return ",".join(sorted(cols))
+
+
+def _fetch_all(supabase, spec: dict):
+    """Every row, paged by id (covers rows with a null timestamp)."""
+    last = None
+    while True:
+        q = supabase.table(spec["table"]).select(_select(spec)).order("id").limit(FETCH_PAGE)
+        if last is not None:
+            q = q.gt("id", last)
+        page = call_with_retry(q.execute).data or []
+        yield page
+        if len(page) < FETCH_PAGE:
+            return
+        last = page[-1]["id"]
+
+
+def _fetch_since(supabase, spec: dict, start: str):
+    """Rows with ts_column >= start, paged by (ts_column, id)."""
+    ts, cursor = spec["ts_column"], None
+    while True:
+        q = supabase.table(spec["table"]).select(_select(spec)).order(ts).order("id").limit(FETCH_PAGE)
+        if cursor is None:
+            q = q.gte(ts, start)
+        else:
+            q = q.or_(f'{ts}.gt."{cursor[0]}",and({ts}.eq."{cursor[0]}",id.gt.{cursor[1]})')
+        page = call_with_retry(q.execute).data or []
+        yield page
+        if len(page) < FETCH_PAGE:
+            return
+        cursor = (page[-1][ts], page[-1]["id"])
+
+
+def _remote_count(supabase, spec: dict) -> int | None:
+    r = call_with_retry(supabase.table(spec["table"]).select("id", count="exact").limit(1).execute)
+    return getattr(r, "count", None)
+
+
+def _write_rows(f, spec: dict, rows: list):
+    w = csv.writer(f)
+    for row in rows:
+        w.writerow([default if row.get(col) is None else row.get(col) for col, _, default in spec["columns"]])
+
+
+def _watermark(rows: list, spec: dict, watermark: str | None, recent: dict) -> tuple[str | None, dict]:
+    """New (watermark, recent ids) after exporting rows on top of (watermark, recent)."""
+    latest = _parse_ts(watermark)
+    stamped = dict(recent)
+    for row in rows:
+        t = _parse_ts(row.get(spec["ts_column"]))
+        if t is None:
+            continue
+        stamped[row["id"]] = row[spec["ts_column"]]
+        if latest is None or t > latest:
+            latest, watermark = t, row[spec["ts_column"]]
+    if latest is None:
+        return None, {}
+    floor = latest - LOOKBACK
+    return watermark, {i: ts for i, ts in stamped.items() if (_parse_ts(ts) or floor) >= floor}
+
+
+def _export_full(supabase, spec: dict, csv_path: Path) -> dict:
+    tmp = csv_path.with_suffix(".tmp")
+    rows, pages, watermark, recent = 0, 0, None, {}
+    with open(tmp, "w", newline="") as f:
+        csv.writer(f).writerow([header for _, header, _ in spec["columns"]])
+        for page in _fetch_all(supabase, spec):
+            pages += 1
+            rows += len(page)
+            _write_rows(f, spec, page)
+            watermark, recent = _watermark(page, spec, watermark, recent)
+    os.replace(tmp, csv_path)  # a job reading the CSV never sees half of it
+    return {"watermark": watermark, "recent": recent, "rows": rows, "size": csv_path.stat().st_size,
+            "pages": pages}
+
+
+def export_table(supabase, spec: dict, csv_path, state: dict, full: bool = False) -> dict:
+    """Bring csv_path up to date with the spec's table; updates its entry in state. Returns stats."""
+    csv_path = Path(csv_path)
+    prev = state.get(spec["table"]) or {}
+    cached = (not full and prev.get("watermark") and csv_path.exists()
+              and csv_path.stat().st_size == prev.get("size"))
+    if cached:
+        start = (_parse_ts(prev["watermark"]) - LOOKBACK).isoformat()
+        recent = prev.get("recent") or {}
+        new, pages = [], 0
+        for page in _fetch_since(supabase, spec, start):
+            pages += 1
+            new.extend(r for r in page if r["id"] not in recent)
+        remote = _remote_count(supabase, spec)
+        if remote is None or remote == prev["rows"] + len(new):
+            if new:
+                # Copy + append + rename: atomic for readers, and the prefix is unchanged so the
+                # suppression index only reads the appended rows
+                tmp = csv_path.with_suffix(".tmp")
+                shutil.copyfile(csv_path, tmp)
+                with open(tmp, "a", newline="") as f:
+                    _write_rows(f, spec, new)
+                os.replace(tmp, csv_path)
+            watermark, recent = _watermark(new, spec, prev["watermark"], recent)
+            state[spec["table"]] = {"watermark": watermark, "recent": recent, "rows": prev["rows"] + len(new),
+                                    "size": csv_path.stat().st_size}
+            return {"table": spec["table"], "mode": "incremental", "new": len(new),
+                    "rows": prev["rows"] + len(new), "pages": pages}
+    entry = _export_full(supabase, spec, csv_path)
+    pages = entry.pop("pages")
+    state[spec["table"]] = entry
+    return {"table": spec["table"], "mode": "full", "new": entry["rows"] - prev.get("rows", 0),
+            "rows": entry["rows"], "pages": pages}
+
+
+def export_all(supabase, dest_dir, state_path=None, full: bool = False) -> list:
+    """Export EXPORTS into dest_dir. A table that fails keeps its cached CSV and state (the CSV is replaced last)."""
+    dest_dir = Path(dest_dir)
+    state_path = Path(state_path) if state_path else dest_dir / STATE_FILE
+    state = load_state(state_path)
+    results = []
+    for spec in EXPORTS:
+        csv_path = dest_dir / spec["csv"]
+        try:
+            results.append(export_table(supabase, spec, csv_path, state, full=full))
+        except Exception as e:
+            print(f"Export {spec['table']}: {e}", file=sys.stderr)
+            if not csv_path.exists():
+                csv_path.write_text(",".join(h for _, h, _ in spec["columns"]) + "\n")
+    save_state(state_path, state)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export opt_outs and warm_leads from Supabase (new rows only)")
+    parser.add_argument("--full", action="store_true", help="Ignore the cached CSVs and export both tables in full")
+    args = parser.parse_args()
+    from send_ledger import get_supabase
+    supabase = get_supabase()
+    if not supabase:
+        print("Set SUPABASE_URL (or NEXT_PUBLIC_SUPABASE_URL) and SUPABASE_SERVICE_ROLE_KEY.")
+        return
+    for s in export_all(supabase, ROOT, full=args.full):
+        print(f"{s['table']}: {s['new']} new, {s['rows']} rows ({s['mode']}, {s['pages']} pages)")
+
+
+if __name__ == "__main__":
+    main()
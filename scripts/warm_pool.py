@@ -0,0 +1,285 @@
+"""
+Pre-warmed process pool for the worker's Python jobs. A cold `python scripts/send_campaign.py`
+spends most of a dry run importing pandas and re-reading the same CSVs. A warm process imports
+the job modules once, then runs one job at a time by calling the script's main(argv) in-process.
+It keeps file_cache and the suppression key cache between jobs, invalidated by file mtime.
+
+  pool = WarmPool(size=2).start()                    # spawns and pre-imports in the background
+  entry = entry_point(build_cmd(action, payload))    # ("send_campaign", [...argv]) or None
+  task = pool.submit(*entry, env={"TWILIO_FROM": ...}, on_line=output.add, on_close=output.close)
+  task.poll() / task.wait(timeout) / task.kill()     # like a Popen
+
+Each job still runs in its own process, apart from the worker. A killed job takes its process
+with it, and the pool starts a fresh one. A process is also replaced after MAX_TASKS_PER_PROCESS
+jobs, so nothing builds up. Ctrl+C on the worker's terminal doesn't reach the pool processes.
+run_cbc (bash + Chrome) and any other command not in ENTRY_POINTS still get a subprocess, as
+does everything with worker.py --subprocess.
+"""
+import importlib
+import multiprocessing
+import os
+import signal
+import subprocess
+import sys
+import threading
+import traceback
+from pathlib import Path
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+# Script (relative to the repo root) -> module with main(argv)
+ENTRY_POINTS = {
+    "scripts/send_campaign.py": "send_campaign",
+    "scripts/build_sms_list.py": "build_sms_list",
+    "parse_quality_leads.py": "parse_quality_leads",
+}
+PRELOAD = ("pandas", "numpy", "send_campaign", "build_sms_list", "parse_quality_leads")
+DEFAULT_SIZE = 2
+MAX_TASKS_PER_PROCESS = 50
+START_TIMEOUT_SEC = 120
+
+
+def entry_point(cmd) -> tuple[str, list] | None:
+    """(module, argv) when cmd is `python <script> ...` for a script in ENTRY_POINTS, else None."""
+    if not cmd or len(cmd) < 2 or cmd[0] != sys.executable:
+        return None
+    try:
+        rel = Path(cmd[1]).resolve().relative_to(REPO_ROOT).as_posix()
+    except ValueError:
+        return None
+    module = ENTRY_POINTS.get(rel)
+    return (module, [str(a) for a in cmd[2:]]) if module else None
+
+
+class _LineWriter:
+    """sys.stdout / sys.stderr stand-in in a pool process: sends each complete line to the worker."""
+
+    def __init__(self, conn, kind: str, lock: threading.Lock):
+        self.conn, self.kind, self.lock = conn, kind, lock
+        self._partial = ""
+
+    def write(self, text: str) -> int:
+        with self.lock:
+            lines = (self._partial + text).split("\n")
+            self._partial = lines.pop()
+            for line in lines:
+                self.conn.send((self.kind, line))
+        return len(text)
+
+    def flush(self):
+        pass
+
+    def close_line(self):
+        with self.lock:
+            if self._partial:
+                self.conn.send((self.kind, self._partial))
+                self._partial = ""
+
+    def isatty(self) -> bool:
+        return False
+
+
+def _serve(conn, root: str, preload):
+    """Pool process: import preload, then run (module, argv, env) tasks until told to stop."""
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    os.chdir(root)
+    for p in (root, os.path.join(root, "scripts")):
+        if p not in sys.path:
+            sys.path.insert(0, p)
+    for name in preload:
+        try:
+            importlib.import_module(name)
+        except Exception:
+            pass  # surfaces when a job needs it
+    conn.send(("ready",))
+    lock = threading.Lock()
+    while True:
+        try:
+            task = conn.recv()
+        except EOFError:
+            return
+        if task is None:
+            return
+        module, argv, env = task
+        saved_env = dict(os.environ)
+        os.environ.update(env)
+        progress = sys.modules.get("job_progress")
+        if progress is not None:
+            progress._last_report.clear()  # throttle per job, not per process
+        out, err = _LineWriter(conn, "out", lock), _LineWriter(conn, "err", lock)
+        real_out, real_err = sys.stdout, sys.stderr
+        sys.stdout, sys.stderr = out, err
+        code = 0
+        try:
+            importlib.import_module(module).main(argv)
+        except SystemExit as e:
+            if isinstance(e.code, int):
+                code = e.code
+            elif e.code is not None:
+                print(e.code, file=sys.stderr)
+                code = 1
+        except BaseException:
+            traceback.print_exc()
+            code = 1
+        finally:
+            out.close_line()
+            err.close_line()
+            sys.stdout, sys.stderr = real_out, real_err
+            os.environ.clear()
+            os.environ.update(saved_env)
+        conn.send(("exit", code))
+
+
+class WarmTask:
+    """Popen-like handle for one job running in a pool process."""
+
+    def __init__(self, process, args):
+        self.args = args
+        self.returncode = None
+        self._process = process
+        self._done = threading.Event()
+
+    def poll(self):
+        return self.returncode
+
+    def wait(self, timeout=None):
+        if not self._done.wait(timeout):
+            raise subprocess.TimeoutExpired(self.args, timeout)
+        return self.returncode
+
+    def kill(self):
+        if self.returncode is None:
+            self._process.kill()
+
+    terminate = kill
+
+    def _finish(self, code: int):
+        self.returncode = code
+        self._done.set()
+
+
+class _PoolProcess:
+    def __init__(self, ctx, preload):
+        self.conn, child = ctx.Pipe()
+        self.process = ctx.Process(target=_serve, args=(child, str(REPO_ROOT), tuple(preload)),
+                                   name="warm-job", daemon=True)
+        self.process.start()
+        child.close()
+        self.tasks = 0
+
+    def wait_ready(self, timeout: float = START_TIMEOUT_SEC) -> bool:
+        try:
+            return self.conn.poll(timeout) and self.conn.recv() == ("ready",)
+        except (EOFError, OSError):
+            return False
+
+    def kill(self):
+        if self.process.is_alive():
+            self.process.kill()
+
+    def close(self):
+        try:
+            self.conn.send(None)
+        except (BrokenPipeError, OSError):
+            pass
+        self.process.join(5)
+        self.kill()
+        self.conn.close()
+
+
+class WarmPool:
+    """
+    Up to size idle, pre-imported processes. submit() takes an idle one, or starts one if all
+    are busy (that job pays the cold start). A finished process goes back to the pool; it is
+    dropped when the pool is already full or the process has run its MAX_TASKS_PER_PROCESS.
+    """
+
+    def __init__(self, size: int = DEFAULT_SIZE, preload=PRELOAD):
+        self.size = max(0, size)
+        self.preload = tuple(preload)
+        self._ctx = multiprocessing.get_context("spawn")
+        self._idle = []
+        self._lock = threading.Lock()
+        self._closed = False
+
+    def start(self):
+        """Spawn the idle processes in the background (imports take a few seconds)."""
+        threading.Thread(target=self._fill, name="warm-pool-fill", daemon=True).start()
+        return self
+
+    def _fill(self):
+        while True:
+            with self._lock:
+                if self._closed or len(self._idle) >= self.size:
+                    return
+            proc = _PoolProcess(self._ctx, self.preload)
+            if not proc.wait_ready():
+                proc.close()
+                return
+            with self._lock:
+                if self._closed or len(self._idle) >= self.size:
+                    proc.close()
+                    return
+                self._idle.append(proc)
+
+    def _take(self) -> _PoolProcess:
+        with self._lock:
+            while self._idle:
+                proc = self._idle.pop()
+                if proc.process.is_alive():
+                    return proc
+                proc.close()
+        proc = _PoolProcess(self._ctx, self.preload)
+        if not proc.wait_ready():
+            proc.close()
+            raise RuntimeError("warm pool process failed to start")
+        return proc
+
+    def _release(self, proc: _PoolProcess, healthy: bool):
+        with self._lock:
+            if healthy and not self._closed and proc.tasks < MAX_TASKS_PER_PROCESS and len(self._idle) < self.size:
+                self._idle.append(proc)
+                return
+        proc.close()
+        if not self._closed:
+            self.start()  # replace it in the background
+
+    def submit(self, module: str, argv: list, env: dict | None = None, on_line=None, on_close=None) -> WarmTask:
+        """
+        Run module.main(argv) in a pool process with env added to os.environ. on_line(line, stderr)
+        gets each output line; on_close() is called twice (stdout, stderr) at the end, like two
+        pipes reaching EOF.
+        """
+        proc = self._take()
+        proc.tasks += 1
+        task = WarmTask(proc, [module, *argv])
+        proc.conn.send((module, list(argv), dict(env or {})))
+
+        def read():
+            code, healthy = None, False
+            try:
+                while True:
+                    msg = proc.conn.recv()
+                    if msg[0] == "exit":
+                        code, healthy = msg[1], True
+                        break
+                    if on_line is not None:
+                        on_line(msg[1], msg[0] == "err")
+            except (EOFError, OSError):  # killed
+                proc.process.join(5)
+                code = proc.process.exitcode if proc.process.exitcode is not None else -signal.SIGKILL
+            finally:
+                if on_close is not None:
+                    on_close()
+                    on_close()
+                task._finish(code if code is not None else 1)
+                self._release(proc, healthy)
+
+        threading.Thread(target=read, name=f"warm-{module}", daemon=True).start()
+        return task
+
+    def close(self):
+        with self._lock:
+            self._closed = True
+            idle, self._idle = self._idle, []
+        for proc in idle:
+            proc.close()
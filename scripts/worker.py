@@ -1,22 +1,86 @@
 #!/usr/bin/env python3
 """
 Worker: poll Supabase for pending jobs, run the matching script, update status/log/error.
-Run from repo root: python scripts/worker.py
+Run from repo root: python scripts/worker.py [--max-jobs 4] [--limit send_campaign_dry_run=8] [--actions run_cbc]
 Env: SUPABASE_URL (or NEXT_PUBLIC_SUPABASE_URL), SUPABASE_SERVICE_ROLE_KEY.
-Optional for send_campaign: TWILIO_ACCOUNT_SID, TWILIO_AUTH_TOKEN, TWILIO_FROM.
+Optional for send_campaign: TWILIO_ACCOUNT_SID, TWILIO_AUTH_TOKEN, TWILIO_FROM (payload.from_number overrides).
 Loads .env from repo root if present (python-dotenv optional).
+
+Jobs run concurrently on a JobPool, up to --max-jobs at once and LANE_LIMITS per lane: run_cbc,
+builds and quality-lead parsing one at a time, sends one at a time per sending number, dry
+runs in parallel. A long run_cbc no longer holds up a build or a dry run. A build never runs
+alongside a send or dry run, because they read the sms_cell_list.csv it rewrites.
+Ctrl+C / SIGTERM stops claiming and waits up to --shutdown-timeout for running jobs, then stops
+the rest and puts them back to pending (run_cbc with resume; a requeued send skips only the
+numbers the ledger saw it try, since each is marked queued right before its request).
+A second Ctrl+C does that right away.
+
+Several workers (processes or hosts) can share the queue: jobs are claimed with the claim_job
+RPC (app/supabase/schema.sql: one UPDATE ... FOR UPDATE SKIP LOCKED, so two workers never get
+the same job), with a LEASE_SEC lease the worker renews every HEARTBEAT_SEC. A job's lane is
+stored on it at insert (jobs.lane), so all workers agree on it, and a unique index on the lanes
+of running sends keeps two workers from sending from one number at once. Every worker
+periodically calls requeue_expired_jobs, which puts jobs of crashed workers back to pending.
+A worker that finds its lease gone stops that job without writing a result. Until the schema
+has claim_job, the worker falls back to select + conditional update, without leases.
+
+A job's stdout/stderr is streamed into jobs.log while it runs (bounded, see scripts/job_progress.py)
+and "##progress stage done/total" lines from report_progress() into jobs.progress.
+Builds, dry runs, sends and quality-lead parsing run in a pool of pre-warmed processes that keep
+pandas imported and the parsed CSVs / suppression keys cached (scripts/warm_pool.py); run_cbc and
+--subprocess use a fresh subprocess per job.
+
+With SUPABASE_DB_URL (or DATABASE_URL) and psycopg2, the worker LISTENs for new jobs and starts
+them at once (scripts/job_wakeup.py); otherwise, or while that connection is down, it polls
+adaptively: every second after finding work, backing off to once a minute when idle.
 """
+import argparse
 import os
+import signal
+import socket
 import subprocess
 import sys
+import threading
 import time
+import uuid
 from datetime import datetime, timezone
 from pathlib import Path
 
+from bulk_load import call_with_retry
+from job_progress import LOG_FLUSH_SEC, PROGRESS_ENV, JobOutput
+from job_wakeup import LISTEN_POLL_SEC, AdaptivePoll, database_url, start_listener
+from list_sync import sync_sms_cell_list
+from table_export import OPT_OUTS, WARM_LEADS, export_all
+from warm_pool import DEFAULT_SIZE as DEFAULT_WARM_PROCESSES, WarmPool, entry_point
+
 # Repo root (parent of scripts/)
 REPO_ROOT = Path(__file__).resolve().parent.parent
-POLL_INTERVAL_SEC = 15
+POLL_INTERVAL_SEC = 15  # after an error; idle polling is adaptive (job_wakeup.AdaptivePoll)
 JOB_TIMEOUT_SEC = 3600  # 1 hour for long runs (e.g. run_cbc)
+LOG_FLUSH_MIN_SEC = 0.5  # least time between two live log writes for one job
+DEFAULT_MAX_JOBS = 4
+SHUTDOWN_TIMEOUT_SEC = 30
+CLAIM_SCAN = 20  # pending jobs looked at per claim, so a job stuck behind a busy lane doesn't block others
+# Jobs running at once per lane (job_lane); unlisted actions get DEFAULT_LANE_LIMIT
+LANE_LIMITS = {
+    "run_cbc": 1,
+    "build_sms_list": 1,
+    "parse_quality_leads": 1,
+    "send": 1,  # per sending number
+    "send_campaign_dry_run": 4,
+}
+DEFAULT_LANE_LIMIT = 2
+KNOWN_ACTIONS = ("build_sms_list", "parse_quality_leads", "run_cbc", "send_campaign_dry_run", "send_campaign")
+LEASE_SEC = 120
+HEARTBEAT_SEC = 30
+REAP_INTERVAL_SEC = 60
+MAX_ATTEMPTS = 3  # claims before a job whose workers keep dying is failed
+# Actions that must not overlap: build_sms_list rewrites sms_cell_list.csv, which these read
+CONFLICTS = {
+    "build_sms_list": {"send_campaign", "send_campaign_dry_run"},
+    "send_campaign": {"build_sms_list"},
+    "send_campaign_dry_run": {"build_sms_list"},
+}
 
 
 def get_supabase():
@@ -32,54 +96,88 @@ def get_supabase():
         return None
 
 
-WORKER_OPT_OUTS_CSV = "_worker_opt_outs.csv"
-WORKER_WARM_LEADS_CSV = "_worker_warm_leads.csv"
+WORKER_OPT_OUTS_CSV = OPT_OUTS["csv"]
+WORKER_WARM_LEADS_CSV = WARM_LEADS["csv"]
 
 
-def export_opt_outs_and_warm_leads(supabase, dest_dir: Path):
-    """Write opt_outs and warm_leads from Supabase to CSVs for send_campaign script."""
-    import csv
-    opt_path = dest_dir / WORKER_OPT_OUTS_CSV
-    warm_path = dest_dir / WORKER_WARM_LEADS_CSV
-    try:
-        r_opt = supabase.table("opt_outs").select("phone_number,date,source").execute()
-        with open(opt_path, "w", newline="") as f:
-            w = csv.writer(f)
-            w.writerow(["Phone_Number", "Date", "Source"])
-            for row in (r_opt.data or []):
-                w.writerow([
-                    row.get("phone_number", ""),
-                    row.get("date", ""),
-                    row.get("source", "SMS reply"),
-                ])
-    except Exception as e:
-        print(f"Export opt_outs: {e}", file=sys.stderr)
-        opt_path.write_text("Phone_Number,Date,Source\n")
-    try:
-        r_warm = supabase.table("warm_leads").select("phone_number").execute()
-        with open(warm_path, "w", newline="") as f:
-            w = csv.writer(f)
-            w.writerow(["phone_number"])
-            for row in (r_warm.data or []):
-                w.writerow([row.get("phone_number", "")])
-    except Exception as e:
-        print(f"Export warm_leads: {e}", file=sys.stderr)
-        warm_path.write_text("phone_number\n")
+_export_lock = threading.Lock()
 
 
-def claim_pending_job(supabase):
-    """Fetch one pending job and set it to running. Returns (job, True) if we claimed it."""
-    r = supabase.table("jobs").select("id,action,payload").eq("status", "pending").order("created_at").limit(1).execute()
+def export_opt_outs_and_warm_leads(supabase, dest_dir: Path):
+    """Bring the opt_outs / warm_leads CSVs for send_campaign up to date (new rows only, see scripts/table_export.py)."""
+    with _export_lock:  # concurrent jobs share the two CSVs
+        for s in export_all(supabase, dest_dir):
+            if s["mode"] == "full" or s["new"]:
+                print(f"  {s['table']}: {s['new']} new, {s['rows']} rows ({s['mode']} export, {s['pages']} pages)")
+
+
+def claim_pending_job(supabase, can_run=None):
+    """
+    Claim the oldest pending job that can_run(job) accepts (any job if can_run is None) by
+    setting it to running. Returns (job, True) if we claimed one.
+    """
+    r = supabase.table("jobs").select("id,action,payload").eq("status", "pending").order("created_at").limit(CLAIM_SCAN).execute()
     if not r.data or len(r.data) == 0:
         return None, False
-    job = r.data[0]
-    job_id = job["id"]
     now = datetime.now(timezone.utc).isoformat().replace("+00:00", "Z")
-    up = supabase.table("jobs").update({"status": "running", "started_at": now}).eq("id", job_id).eq("status", "pending").execute()
-    # If no row was updated (someone else claimed it), data is empty
-    if not getattr(up, "data", None) or len(up.data) == 0:
-        return None, False
-    return job, True
+    for job in r.data:
+        if can_run is not None and not can_run(job):
+            continue
+        up = supabase.table("jobs").update({"status": "running", "started_at": now}).eq("id", job["id"]).eq("status", "pending").execute()
+        # If no row was updated (someone else claimed it), data is empty
+        if getattr(up, "data", None):
+            return job, True
+    return None, False
+
+
+def claim_job_rpc(supabase, worker_id: str, actions=None, exclude_actions=(), blocked_lanes=(),
+                  lease_sec: int = LEASE_SEC) -> dict | None:
+    """Claim the oldest runnable pending job in one round trip (claim_job in schema.sql), with a lease."""
+    r = supabase.rpc("claim_job", {
+        "p_worker_id": worker_id,
+        "p_lease_seconds": lease_sec,
+        "p_actions": list(actions) if actions else None,
+        "p_exclude_actions": list(exclude_actions),
+        "p_blocked_lanes": list(blocked_lanes),
+        "p_default_from": os.environ.get("TWILIO_FROM", ""),
+    }).execute()
+    return r.data[0] if r.data else None
+
+
+def requeue_job(supabase, job: dict, note: str):
+    """Put a running job back to pending (run_cbc picks up where it stopped via its journal)."""
+    payload = dict(job.get("payload") or {})
+    if job.get("action") == "run_cbc":
+        payload["resume"] = True
+    q = supabase.table("jobs").update({
+        "status": "pending",
+        "started_at": None,
+        "payload": payload,
+        "log": note,
+        "worker_id": None,
+        "lease_expires_at": None,
+        # A shutdown isn't a failed attempt
+        **({"attempts": max(0, job["attempts"] - 1)} if "attempts" in job else {}),
+    }).eq("id", job["id"])
+    if job.get("worker_id"):
+        q = q.eq("worker_id", job["worker_id"])
+    q.execute()
+
+
+def job_lane(action: str, payload: dict) -> str:
+    """Concurrency lane: sends share one lane per sending number, everything else one per action."""
+    if action in ("send_campaign", "send_warm_lead_message"):
+        return f"send:{(payload or {}).get('from_number') or os.environ.get('TWILIO_FROM', '')}"
+    return action
+
+
+def lane_of(job: dict) -> str:
+    """The lane stored on the job at insert (schema.sql), so all workers agree; job_lane() on older schemas."""
+    return job.get("lane") or job_lane(job.get("action", ""), job.get("payload") or {})
+
+
+def lane_limit(lane: str, limits: dict) -> int:
+    return limits.get(lane, limits.get(lane.split(":", 1)[0], DEFAULT_LANE_LIMIT))
 
 
 def build_cmd(action: str, payload: dict) -> list | None:
@@ -110,6 +208,8 @@ def build_cmd(action: str, payload: dict) -> list | None:
             cmd.extend(["--state", state[:2]])
         if zip_code:
             cmd.extend(["--zip", zip_code])
+        if payload.get("stream"):
+            cmd.append("--stream")
         return cmd
 
     if action == "parse_quality_leads":
@@ -119,12 +219,19 @@ def build_cmd(action: str, payload: dict) -> list | None:
         script = REPO_ROOT / "run_cbc_only.sh"
         if not script.exists():
             return None
+        if payload.get("resume"):
+            # Continue an interrupted/timed-out run from cbc_journal.jsonl
+            return ["/usr/bin/env", "RESUME=1", "bash", str(script), addresses_csv]
         return ["/usr/bin/env", "bash", str(script), addresses_csv]
 
     # Shared args for send_campaign: use Supabase-exported opt_outs and warm_leads, daily batch limit
-    worker_opt_outs = REPO_ROOT / "_worker_opt_outs.csv"
-    worker_warm_leads = REPO_ROOT / "_worker_warm_leads.csv"
+    worker_opt_outs = REPO_ROOT / WORKER_OPT_OUTS_CSV
+    worker_warm_leads = REPO_ROOT / WORKER_WARM_LEADS_CSV
     daily_limit = payload.get("daily_batch_limit") or 450
+    # Same campaign id across re-runs so the send ledger skips numbers already texted
+    campaign = payload.get("campaign_id") or ""
+    # payload.audience == "db": campaign_audience() selects the audience, no CSV export needed
+    from_db = ["--from-db"] if payload.get("audience") == "db" else []
 
     if action == "send_campaign_dry_run":
         cmd = [
@@ -135,11 +242,13 @@ def build_cmd(action: str, payload: dict) -> list | None:
             "--delay", str(delay),
             "--opt-outs", str(worker_opt_outs),
             "--warm-leads", str(worker_warm_leads),
-            "--limit", str(daily_limit),
+            "--daily-cap", str(daily_limit),
         ]
         if message:
             cmd.extend(["--message", message])
-        return cmd
+        if campaign:
+            cmd.extend(["--campaign", str(campaign)])
+        return cmd + from_db
 
     if action == "send_campaign":
         cmd = [
@@ -150,102 +259,143 @@ def build_cmd(action: str, payload: dict) -> list | None:
             "--delay", str(delay),
             "--opt-outs", str(worker_opt_outs),
             "--warm-leads", str(worker_warm_leads),
-            "--limit", str(daily_limit),
+            "--daily-cap", str(daily_limit),
+            "--sync-ledger",
         ]
         if message:
             cmd.extend(["--message", message])
-        return cmd
+        if campaign:
+            cmd.extend(["--campaign", str(campaign)])
+        return cmd + from_db
 
     return None
 
 
-def run_job(job_id: str, action: str, payload: dict) -> tuple[bool, str, str]:
-    """Run the job; return (success, stdout, stderr)."""
+def _pump(stream, output: JobOutput, stderr: bool):
+    for line in stream:
+        output.add(line, stderr=stderr)
+    stream.close()
+    output.close()
+
+
+def _wait_exit(proc, timeout: float):
+    try:
+        proc.wait(max(0.0, timeout))
+    except subprocess.TimeoutExpired:
+        pass
+
+
+def run_job(job_id: str, action: str, payload: dict, on_start=None, on_output=None,
+            warm: WarmPool | None = None) -> tuple[bool, str, str]:
+    """
+    Run the job; return (success, log, error). on_start(proc) gets the Popen or WarmTask (to stop it).
+    With warm, scripts that have an entry point (warm_pool.ENTRY_POINTS) run in a pre-warmed pool
+    process instead of a new interpreter. stdout and stderr are read line by line into a bounded
+    JobOutput; on_output(log, progress) is called every LOG_FLUSH_LINES lines or LOG_FLUSH_SEC.
+    """
     cmd = build_cmd(action, payload)
     if cmd is None:
         return False, "", f"Unknown action: {action}"
 
+    # JOB_PROGRESS turns on report_progress(); unbuffered so subprocess output arrives as it is printed
+    job_env = {PROGRESS_ENV: "1"}
+    if (payload or {}).get("from_number"):
+        job_env["TWILIO_FROM"] = str(payload["from_number"])
+    entry = entry_point(cmd) if warm is not None else None
     try:
-        proc = subprocess.run(
-            cmd,
-            cwd=str(REPO_ROOT),
-            capture_output=True,
-            text=True,
-            timeout=JOB_TIMEOUT_SEC,
-        )
-        out = (proc.stdout or "").strip()
-        err = (proc.stderr or "").strip()
+        output = JobOutput()
+        readers = []
+        if entry is not None:
+            proc = warm.submit(*entry, env=job_env, on_line=output.add, on_close=output.close)
+        else:
+            # Own session: a Ctrl+C on the worker's terminal must not kill running jobs mid-write
+            proc = subprocess.Popen(
+                cmd,
+                cwd=str(REPO_ROOT),
+                stdout=subprocess.PIPE,
+                stderr=subprocess.PIPE,
+                text=True,
+                errors="replace",
+                bufsize=1,
+                env={**os.environ, "PYTHONUNBUFFERED": "1", **job_env},
+                start_new_session=True,
+            )
+            readers = [threading.Thread(target=_pump, args=(proc.stdout, output, False), daemon=True),
+                       threading.Thread(target=_pump, args=(proc.stderr, output, True), daemon=True)]
+            for t in readers:
+                t.start()
+        if on_start is not None:
+            on_start(proc)
+        deadline = time.monotonic() + JOB_TIMEOUT_SEC
+        next_flush = time.monotonic() + LOG_FLUSH_SEC
+        timed_out = False
+        sent_progress = None
+        while proc.poll() is None and not output.eof.is_set():
+            now = time.monotonic()
+            if now >= deadline:
+                proc.kill()
+                timed_out = True
+                break
+            if on_output is None:
+                _wait_exit(proc, deadline - now)
+                continue
+            output.ready.wait(min(next_flush, deadline) - now)
+            if output.eof.is_set():
+                break
+            if output.ready.is_set() or time.monotonic() >= next_flush:
+                if output.dirty:
+                    log, sent_progress = output.snapshot()
+                    on_output(log, sent_progress)
+                next_flush = time.monotonic() + LOG_FLUSH_SEC
+                _wait_exit(proc, LOG_FLUSH_MIN_SEC)  # a chatty job still gets at most two writes a second
+        if not timed_out:
+            try:
+                proc.wait(max(0.0, deadline - time.monotonic()))
+            except subprocess.TimeoutExpired:  # closed its output but kept running
+                proc.kill()
+                timed_out = True
+        proc.wait()
+        for t in readers:
+            t.join(5)  # a leftover grandchild may hold the pipes open
+        log, progress = output.snapshot()
+        if on_output is not None and progress is not sent_progress:
+            on_output(log, progress)  # progress that came after the last flush; the log goes in with the result
+        if timed_out:
+            return False, log, f"Job timed out after {JOB_TIMEOUT_SEC}s"
+        err = output.error_text()
         if proc.returncode != 0:
             err = err or f"Exit code {proc.returncode}"
-        return proc.returncode == 0, out, err
-    except subprocess.TimeoutExpired:
-        return False, "", f"Job timed out after {JOB_TIMEOUT_SEC}s"
+        return proc.returncode == 0, log, err
     except Exception as e:
         return False, "", str(e)
 
 
-def set_job_result(supabase, job_id: str, success: bool, log: str, error: str):
+def set_job_result(supabase, job_id: str, success: bool, log: str, error: str, worker_id: str | None = None):
+    """Store the outcome; with worker_id only while this worker still holds the job."""
     now = datetime.now(timezone.utc).isoformat().replace("+00:00", "Z")
-    supabase.table("jobs").update({
+    values = {
         "status": "success" if success else "failed",
         "finished_at": now,
         "log": log or None,
         "error": error if not success else None,
-    }).eq("id", job_id).execute()
+    }
+    if worker_id:
+        values["lease_expires_at"] = None
+    q = supabase.table("jobs").update(values).eq("id", job_id)
+    if worker_id:
+        q = q.eq("worker_id", worker_id)
+    call_with_retry(q.execute)  # a lost result leaves the job running until its lease runs out
 
 
 def update_list_after_build_sms(supabase, job_id: str):
-    """After build_sms_list success: write full list to sms_cell_list_rows, update list_metadata and list_preview."""
-    import json
+    """After build_sms_list success: push the list's changes to sms_cell_list_rows, list_metadata and list_preview."""
     csv_path = REPO_ROOT / "sms_cell_list.csv"
     if not csv_path.exists():
         return
     try:
-        import pandas as pd
-        df = pd.read_csv(csv_path)
-        row_count = len(df)
-        now = datetime.now(timezone.utc).isoformat().replace("+00:00", "Z")
-
-        # 1. Map CSV columns to table columns (build_sms_list outputs Full_Name, Address, Phone_Number, etc.)
-        rename = {"Phone_Number": "phone_number", "Full_Name": "full_name", "Address": "address", "Source_Address": "source_address", "Lead_Type": "lead_type", "Resident_Type": "resident_type"}
-        df_out = df.rename(columns={k: v for k, v in rename.items() if k in df.columns})
-        cols = [c for c in ["phone_number", "full_name", "address", "source_address", "lead_type", "resident_type"] if c in df_out.columns]
-        if not cols:
-            cols = list(df_out.columns)[:6]
-
-        # 2. Delete all existing rows (Supabase: delete with filter that matches all)
-        supabase.table("sms_cell_list_rows").delete().neq("id", "00000000-0000-0000-0000-000000000000").execute()
-
-        # 3. Insert all rows in batches of 100
-        rows_data = df_out[cols].replace({pd.NA: None}).to_dict(orient="records")
-        for r in rows_data:
-            for k, v in list(r.items()):
-                if v is not None and not isinstance(v, str):
-                    r[k] = str(v)
-        for i in range(0, len(rows_data), 100):
-            chunk = rows_data[i : i + 100]
-            supabase.table("sms_cell_list_rows").insert(chunk).execute()
-
-        # 4. Update list_metadata
-        supabase.table("list_metadata").upsert({
-            "id": "sms_cell_list",
-            "name": "SMS campaign list",
-            "list_type": "sms_cell",
-            "source": "table",
-            "source_identifier": "sms_cell_list_rows",
-            "row_count": row_count,
-            "last_updated_at": now,
-            "updated_by_job_id": job_id,
-        }, on_conflict="id").execute()
-
-        # 5. Update list_preview (first 200 rows for quick display)
-        preview_size = min(200, row_count)
-        rows = json.loads(df.head(preview_size).to_json(orient="records", date_format="iso"))
-        supabase.table("list_preview").upsert({
-            "list_id": "sms_cell_list",
-            "rows": rows,
-            "updated_at": now,
-        }, on_conflict="list_id").execute()
+        stats = sync_sms_cell_list(supabase, csv_path, job_id)
+        print(f"  SMS list synced: {stats['upserted']} upserted, {stats['deleted']} deleted, "
+              f"{stats['unchanged']} unchanged of {stats['rows']} ({stats['mode']}, {stats['seconds']}s)")
     except Exception as e:
         print(f"Failed to update list in Supabase: {e}", file=sys.stderr)
 
@@ -273,41 +423,306 @@ def load_dotenv():
         pass
 
 
+def _rpc_missing(error: Exception, name: str) -> bool:
+    """PostgREST error for a function that isn't in the schema yet."""
+    return "PGRST202" in str(error) or f"function public.{name}" in str(error)
+
+
+class JobPool:
+    """
+    Runs claimed jobs on their own threads: at most max_jobs at once, lane_limit() per lane and
+    never two CONFLICTS together. Each thread exports opt-outs when needed, runs the script
+    (streaming its log and progress into the job row), stores the result and does the post-job
+    list update; wake is set whenever a slot frees up.
+    With the claim_job RPC, a heartbeat thread renews the leases of running jobs.
+    """
+
+    def __init__(self, supabase, max_jobs: int = DEFAULT_MAX_JOBS, limits: dict | None = None,
+                 worker_id: str | None = None, actions=None, use_rpc: bool = True, warm: WarmPool | None = None):
+        self.supabase = supabase
+        self.max_jobs = max(1, max_jobs)
+        self.limits = {**LANE_LIMITS, **(limits or {})}
+        self.worker_id = worker_id or f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:6]}"
+        self.actions = tuple(actions) if actions else None
+        self.use_rpc = use_rpc
+        self.warm = warm
+        self.running = {}  # job id -> {"job", "lane", "proc", "thread", "requeue", "lost"}
+        self.wake = threading.Event()
+        self._lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._heartbeat = None
+        self._progress_column = True
+
+    def has_capacity(self) -> bool:
+        with self._lock:
+            return len(self.running) < self.max_jobs
+
+    def can_run(self, job: dict) -> bool:
+        action = job.get("action", "")
+        if self.actions is not None and action not in self.actions:
+            return False
+        lane = lane_of(job)
+        with self._lock:
+            if len(self.running) >= self.max_jobs:
+                return False
+            in_lane = sum(1 for r in self.running.values() if r["lane"] == lane)
+            if in_lane >= lane_limit(lane, self.limits):
+                return False
+            blocked = CONFLICTS.get(action, set())
+            return not any(r["job"].get("action") in blocked for r in self.running.values())
+
+    def _claim_filters(self) -> tuple[list, list]:
+        """(actions that conflict with running jobs, lanes that are full) for the claim_job RPC."""
+        with self._lock:
+            running_actions = {r["job"].get("action") for r in self.running.values()}
+            lanes = {}
+            for r in self.running.values():
+                lanes[r["lane"]] = lanes.get(r["lane"], 0) + 1
+        exclude = sorted(a for a, blocked in CONFLICTS.items() if blocked & running_actions)
+        full = sorted(lane for lane, n in lanes.items() if n >= lane_limit(lane, self.limits))
+        # A lane limited to 0 is never claimed, whether or not anything runs in it
+        full += sorted(lane for lane, n in self.limits.items() if n <= 0 and lane not in full)
+        return exclude, full
+
+    def claim(self) -> dict | None:
+        """Claim the next job there is room for: claim_job RPC, else the select + update fallback."""
+        if not self.has_capacity():
+            return None
+        if self.use_rpc:
+            exclude, full = self._claim_filters()
+            try:
+                return claim_job_rpc(self.supabase, self.worker_id, self.actions, exclude, full)
+            except Exception as e:
+                if not _rpc_missing(e, "claim_job"):
+                    raise
+                print("claim_job RPC not found (apply app/supabase/schema.sql); claiming without leases.",
+                      file=sys.stderr)
+                self.use_rpc = False
+        job, claimed = claim_pending_job(self.supabase, self.can_run)
+        return job if claimed else None
+
+    def start(self, job: dict):
+        entry = {"job": job, "lane": lane_of(job),
+                 "proc": None, "requeue": False, "lost": False}
+        entry["thread"] = threading.Thread(target=self._run, args=(entry,), name=f"job-{job['id']}", daemon=True)
+        with self._lock:
+            self.running[job["id"]] = entry
+        entry["thread"].start()
+        if job.get("lease_expires_at") and self._heartbeat is None:
+            self._heartbeat = threading.Thread(target=self._heartbeat_loop, name="job-heartbeat", daemon=True)
+            self._heartbeat.start()
+
+    def _run(self, entry: dict):
+        job = entry["job"]
+        job_id = job["id"]
+        action = job.get("action", "")
+        payload = job.get("payload") or {}
+        owner = job.get("worker_id")
+        try:
+            needs_export = action in ("build_sms_list", "send_warm_lead_message") or (
+                action in ("send_campaign", "send_campaign_dry_run") and payload.get("audience") != "db")
+            if needs_export:
+                export_opt_outs_and_warm_leads(self.supabase, REPO_ROOT)
+            print(f"Running job {job_id}: {action}")
+            t0 = time.monotonic()
+            success, log, err = run_job(job_id, action, payload, on_start=lambda proc: self._started(entry, proc),
+                                        on_output=lambda log, progress: self._write_output(entry, log, progress),
+                                        warm=self.warm)
+            if entry["lost"]:
+                print(f"  {job_id} ({action}) -> stopped: lease lost (requeued by another worker)")
+                return
+            if entry["requeue"]:
+                requeue_job(self.supabase, job, "Requeued: worker shut down while the job was running.")
+                print(f"  {job_id} ({action}) -> requeued")
+                return
+            set_job_result(self.supabase, job_id, success, log, err, worker_id=owner)
+            if action == "build_sms_list" and success:
+                update_list_after_build_sms(self.supabase, job_id)
+            print(f"  {job_id} ({action}) -> {'success' if success else 'failed'} in {time.monotonic() - t0:.0f}s")
+        except Exception as e:
+            print(f"Job {job_id} ({action}): {e}", file=sys.stderr)
+        finally:
+            with self._lock:
+                self.running.pop(job_id, None)
+            self.wake.set()
+
+    def _write_output(self, entry: dict, log: str, progress: dict | None):
+        """Live log / progress of a running job; errors are only reported, the job carries on."""
+        if entry["lost"] or entry["requeue"]:
+            return
+        job = entry["job"]
+        values = {"log": log or None}
+        if progress is not None and self._progress_column:
+            values["progress"] = progress
+        try:
+            q = self.supabase.table("jobs").update(values).eq("id", job["id"]).eq("status", "running")
+            if job.get("worker_id"):
+                q = q.eq("worker_id", job["worker_id"])
+            q.execute()
+        except Exception as e:
+            if "progress" in values and "progress" in str(e):
+                print("jobs.progress column not found (apply app/supabase/schema.sql); streaming the log only.",
+                      file=sys.stderr)
+                self._progress_column = False
+                return
+            print(f"Job {job['id']}: live log update failed: {e}", file=sys.stderr)
+
+    def _started(self, entry: dict, proc):
+        with self._lock:
+            entry["proc"] = proc
+            if entry["requeue"] or entry["lost"]:  # stopped while the job was still exporting
+                proc.terminate()
+
+    def heartbeat(self):
+        """Renew the leases of running jobs; stop any job whose lease another worker's reaper took."""
+        with self._lock:
+            leased = [jid for jid, r in self.running.items() if r["job"].get("lease_expires_at")]
+        if not leased:
+            return
+        r = self.supabase.rpc("heartbeat_jobs", {
+            "p_worker_id": self.worker_id, "p_job_ids": leased, "p_lease_seconds": LEASE_SEC,
+        }).execute()
+        kept = {row if isinstance(row, str) else next(iter(row.values())) for row in (r.data or [])}
+        with self._lock:
+            for jid in leased:
+                entry = self.running.get(jid)
+                if entry is not None and jid not in kept:
+                    entry["lost"] = True
+                    if entry["proc"] is not None and entry["proc"].poll() is None:
+                        entry["proc"].terminate()
+
+    def _heartbeat_loop(self):
+        while not self._stopped.wait(HEARTBEAT_SEC):
+            try:
+                self.heartbeat()
+            except Exception as e:  # lease runs out only if this keeps failing for LEASE_SEC
+                print(f"Heartbeat failed: {e}", file=sys.stderr)
+
+    def reap(self) -> int:
+        """Requeue jobs whose worker stopped renewing its lease (any worker may do this)."""
+        try:
+            r = self.supabase.rpc("requeue_expired_jobs", {"p_max_attempts": MAX_ATTEMPTS}).execute()
+        except Exception as e:
+            if not _rpc_missing(e, "requeue_expired_jobs"):
+                raise
+            return 0  # older schema: claim() falls back and reaping stops
+        for job in r.data or []:
+            print(f"Reaped job {job['id']} ({job.get('action')}) -> {job.get('status')}")
+        return len(r.data or [])
+
+    def stop_running(self):
+        """Terminate every running job; their threads put them back to pending."""
+        with self._lock:
+            for entry in self.running.values():
+                proc = entry["proc"]
+                if proc is None or proc.poll() is None:
+                    entry["requeue"] = True
+                    if proc is not None:
+                        proc.terminate()
+
+    def shutdown(self, timeout: float, force: threading.Event):
+        """Wait up to timeout for running jobs (or until force is set), then stop and requeue the rest."""
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline and not force.is_set():
+            with self._lock:
+                threads = [r["thread"] for r in self.running.values()]
+            if not threads:
+                break
+            threads[0].join(0.5)
+        if self.running:
+            print(f"Stopping {len(self.running)} running job(s) and requeueing them...")
+            self.stop_running()
+        with self._lock:
+            threads = [r["thread"] for r in self.running.values()]
+        for t in threads:
+            t.join(30)
+        self._stopped.set()
+
+
+def _parse_limits(values: list[str]) -> dict:
+    limits = {}
+    for v in values or []:
+        lane, _, n = v.partition("=")
+        if not lane or not n.isdigit():
+            raise SystemExit(f"--limit expects lane=N (e.g. send_campaign_dry_run=8), got {v!r}")
+        limits[lane] = int(n)
+    return limits
+
+
 def main():
+    parser = argparse.ArgumentParser(description="Run dashboard jobs from Supabase")
+    parser.add_argument("--max-jobs", type=int, default=DEFAULT_MAX_JOBS,
+                        help=f"Jobs running at once (default {DEFAULT_MAX_JOBS})")
+    parser.add_argument("--limit", action="append", default=[], metavar="LANE=N",
+                        help="Per-lane concurrency override, e.g. send_campaign_dry_run=8 or send=1 (repeatable)")
+    parser.add_argument("--actions", default="",
+                        help=f"Comma-separated actions this worker runs (default all: {','.join(KNOWN_ACTIONS)})")
+    parser.add_argument("--no-listen", action="store_true",
+                        help="Don't LISTEN for new jobs even if SUPABASE_DB_URL / DATABASE_URL is set (poll only)")
+    parser.add_argument("--warm", type=int, default=DEFAULT_WARM_PROCESSES, metavar="N",
+                        help=f"Pre-warmed processes for Python jobs (default {DEFAULT_WARM_PROCESSES}; scripts/warm_pool.py)")
+    parser.add_argument("--subprocess", action="store_true",
+                        help="Run every job in a fresh subprocess (full isolation, no warm pool)")
+    parser.add_argument("--shutdown-timeout", type=float, default=SHUTDOWN_TIMEOUT_SEC,
+                        help=f"Seconds to let running jobs finish on Ctrl+C/SIGTERM before requeueing them (default {SHUTDOWN_TIMEOUT_SEC})")
+    args = parser.parse_args()
+
     load_dotenv()
     supabase = get_supabase()
     if not supabase:
         print("Set SUPABASE_URL (or NEXT_PUBLIC_SUPABASE_URL) and SUPABASE_SERVICE_ROLE_KEY.", file=sys.stderr)
         sys.exit(1)
 
-    print("Worker started. Polling for pending jobs (Ctrl+C to stop).")
-    while True:
+    actions = [a.strip() for a in args.actions.split(",") if a.strip()] or None
+    warm = None if args.subprocess else WarmPool(args.warm).start()
+    pool = JobPool(supabase, args.max_jobs, _parse_limits(args.limit), actions=actions, warm=warm)
+    stopping = threading.Event()
+    force = threading.Event()
+
+    def on_signal(signum, frame):
+        if stopping.is_set():
+            force.set()
+            return
+        print("\nStopping: no new jobs; waiting for running ones (Ctrl+C again to requeue them now).")
+        stopping.set()
+        pool.wake.set()
+
+    signal.signal(signal.SIGINT, on_signal)
+    signal.signal(signal.SIGTERM, on_signal)
+
+    listener = None if args.no_listen else start_listener(database_url(), pool.wake)
+    poll = AdaptivePoll()
+    mode = "listening for new jobs" if listener else "polling for pending jobs"
+    print(f"Worker {pool.worker_id} started, {mode}, up to {pool.max_jobs} at once (Ctrl+C to stop).")
+    next_reap = 0.0
+    found = True
+    while not stopping.is_set():
         try:
-            job, claimed = claim_pending_job(supabase)
-            if claimed and job:
-                job_id = job["id"]
-                action = job.get("action", "")
-                payload = job.get("payload") or {}
-                if action in ("send_campaign", "send_campaign_dry_run"):
-                    export_opt_outs_and_warm_leads(supabase, REPO_ROOT)
-                if action == "build_sms_list":
-                    export_opt_outs_and_warm_leads(supabase, REPO_ROOT)
-                if action == "send_warm_lead_message":
-                    export_opt_outs_and_warm_leads(supabase, REPO_ROOT)
-                print(f"Running job {job_id}: {action}")
-                success, log, err = run_job(job_id, action, payload)
-                set_job_result(supabase, job_id, success, log, err)
-                if action == "build_sms_list" and success:
-                    update_list_after_build_sms(supabase, job_id)
-                print(f"  -> {'success' if success else 'failed'}")
-            else:
-                time.sleep(POLL_INTERVAL_SEC)
-        except KeyboardInterrupt:
-            print("\nWorker stopped.")
-            break
+            if pool.use_rpc and time.monotonic() >= next_reap:
+                next_reap = time.monotonic() + REAP_INTERVAL_SEC
+                pool.reap()
+            job = pool.claim()
+            if job:
+                pool.start(job)
+                found = True
+                continue  # fill the other free slots right away
+            # Woken by a notification or a finished job; otherwise poll (rarely while the channel is up)
+            wait = LISTEN_POLL_SEC if listener and listener.connected.is_set() else poll.next(found)
+            found = False
+            if pool.use_rpc:
+                wait = min(wait, max(0.0, next_reap - time.monotonic()))
+            pool.wake.wait(wait)
+            pool.wake.clear()
         except Exception as e:
             print(f"Error: {e}", file=sys.stderr)
-            time.sleep(POLL_INTERVAL_SEC)
+            pool.wake.wait(POLL_INTERVAL_SEC)
+            pool.wake.clear()
+    if listener is not None:
+        listener.stop()
+    pool.shutdown(args.shutdown_timeout, force)
+    if warm is not None:
+        warm.close()
+    print("Worker stopped.")
 
 
 if __name__ == "__main__":
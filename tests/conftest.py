@@ -0,0 +1,138 @@
+import re
+import sys
+import threading
+from collections import defaultdict
+from pathlib import Path
+
+import pytest
+
+ROOT = Path(__file__).resolve().parent.parent
+for p in (ROOT, ROOT / "scripts"):
+    if str(p) not in sys.path:
+        sys.path.insert(0, str(p))
+
+
+class _Result:
+    def __init__(self, data, count=None):
+        self.data, self.count = data, count
+
+
+class _Query:
+    """One PostgREST request: table() or rpc() plus the builder calls the scripts use, run on execute()."""
+
+    def __init__(self, db, name, op="select", payload=None):
+        self.db, self.name, self.op, self.payload = db, name, op, payload
+        self.filters, self.orders, self.n, self.count, self.on_conflict = [], [], None, None, None
+
+    def select(self, _cols="*", count=None):
+        self.count = count
+        return self
+
+    def insert(self, rows):
+        self.op, self.payload = "insert", rows if isinstance(rows, list) else [rows]
+        return self
+
+    def upsert(self, rows, on_conflict=None):
+        self.insert(rows)
+        self.op, self.on_conflict = "upsert", on_conflict or "id"
+        return self
+
+    def update(self, values):
+        self.op, self.payload = "update", values
+        return self
+
+    def delete(self):
+        self.op = "delete"
+        return self
+
+    def eq(self, col, value):
+        self.filters.append(lambda r: r.get(col) == value)
+        return self
+
+    def neq(self, col, value):
+        self.filters.append(lambda r: r.get(col) != value)
+        return self
+
+    def gt(self, col, value):
+        self.filters.append(lambda r: r.get(col) is not None and r[col] > value)
+        return self
+
+    def gte(self, col, value):
+        self.filters.append(lambda r: r.get(col) is not None and r[col] >= value)
+        return self
+
+    def or_(self, expr):
+        # Only the keyset form table_export sends: ts.gt."T",and(ts.eq."T",id.gt.ID)
+        col, ts, _, last = re.fullmatch(r'(\w+)\.gt\."([^"]+)",and\(\w+\.eq\."([^"]+)",id\.gt\.(.+)\)', expr).groups()
+        self.filters.append(lambda r: r.get(col) is not None and (r[col] > ts or (r[col] == ts and r["id"] > last)))
+        return self
+
+    def order(self, col, desc=False):
+        self.orders.append(col)
+        return self
+
+    def limit(self, n):
+        self.n = n
+        return self
+
+    def execute(self):
+        db = self.db
+        with db.lock:
+            db.requests += 1
+            db.calls.append(self.name)
+            if db.fail is not None:
+                db.fail(self)
+            if self.op == "rpc":
+                db.rpc_calls.append((self.name, self.payload))
+                return _Result(db.rpcs[self.name](self.payload))
+            rows = db.tables[self.name]
+            if self.op == "insert":
+                rows.extend(dict(r) for r in self.payload)
+                return _Result(self.payload)
+            if self.op == "upsert":
+                index = {r.get(self.on_conflict): r for r in rows}
+                for r in self.payload:
+                    if r[self.on_conflict] in index:
+                        index[r[self.on_conflict]].update(r)
+                    else:
+                        index[r[self.on_conflict]] = dict(r)
+                        rows.append(index[r[self.on_conflict]])
+                return _Result(self.payload)
+            matched = [r for r in rows if all(f(r) for f in self.filters)]
+            if self.op == "update":
+                for r in matched:
+                    r.update(self.payload)
+                return _Result([dict(r) for r in matched])
+            if self.op == "delete":
+                db.tables[self.name] = [r for r in rows if not any(r is m for m in matched)]
+                return _Result(matched)
+            matched.sort(key=lambda r: tuple((r.get(c) is None, r.get(c) or "") for c in self.orders))
+            count = len(matched) if self.count else None
+            return _Result([dict(r) for r in matched[: self.n]], count=count)
+
+
+class FakeSupabase:
+    """In-memory PostgREST client.
+
+    Tables are plain lists of row dicts in ``tables``. A test sets only what it needs: ``rpcs[name]``
+    takes the params and returns the data, and ``fail(query)`` runs before every request and raises
+    to fail it. ``calls`` logs each table / function requested, ``rpc_calls`` the (name, params) pairs.
+    """
+
+    def __init__(self):
+        self.tables = defaultdict(list)
+        self.rpcs = {}
+        self.fail = None
+        self.calls, self.rpc_calls, self.requests = [], [], 0
+        self.lock = threading.RLock()
+
+    def table(self, name):
+        return _Query(self, name)
+
+    def rpc(self, name, params=None):
+        return _Query(self, name, "rpc", params)
+
+
+@pytest.fixture
+def supabase():
+    return FakeSupabase()
@@ -0,0 +1,28 @@
+"""
+Address parsing: City/State/Zip for the address formats in the lead files (tests/fixtures/addresses.csv,
+synthetic addresses in the shapes sms_cell_list.csv / quality_leads.csv, Propwire and CBC use).
+"""
+from pathlib import Path
+
+import pandas as pd
+
+from address_utils import add_address_columns, parse_address_columns
+from build_sms_list import _filter_by_location
+
+FIXTURE = Path(__file__).parent / "fixtures" / "addresses.csv"
+
+
+def test_city_has_no_house_number_or_street():
+    fx = pd.read_csv(FIXTURE, dtype=str, keep_default_na=False)
+    parsed = parse_address_columns(fx["Address"])
+    assert parsed.to_dict("records") == fx[["City", "State", "Zip"]].to_dict("records")
+
+
+def test_city_filter_skips_residents_of_a_street_named_after_it():
+    fx = pd.read_csv(FIXTURE, dtype=str, keep_default_na=False)
+    # City as stored by the old parser: reparsed instead of kept
+    leads = pd.DataFrame({"Address": fx["Address"], "City": fx["Address"].str.rpartition(" TN ")[0]})
+    assert list(add_address_columns(leads.copy())["City"][:2]) == ["Germantown", "Germantown"]
+    for df in (fx.drop(columns=["City", "State", "Zip"]), leads):
+        cordova = _filter_by_location(df, "Address", "Cordova", None, None)
+        assert list(cordova["Address"]) == ["2100 N Germantown Pkwy Apt 4 Cordova TN 38016"]
@@ -0,0 +1,44 @@
+"""Database audience: RPC pages by phone key within the daily cap; send_campaign --from-db skips the CSVs."""
+import pandas as pd
+
+import audience
+import send_campaign
+from audience import fetch_audience
+
+
+def _campaign_audience(keys, sent_today=0):
+    """campaign_audience over an in-memory list: keyset by key, cap minus rows already returned."""
+    keys = sorted(keys)
+
+    def campaign_audience(params):
+        left = max(0, params["p_daily_cap"] - params["p_fetched"] - sent_today)
+        page = [k for k in keys if params["p_after"] is None or k > params["p_after"]]
+        page = page[: min(params["p_limit"], left)]
+        return [{"key": k, "phone_number": f"({str(k)[:3]}) {str(k)[3:6]}-{str(k)[6:]}", "full_name": f"N{k}",
+                 "address": None, "source_address": None, "lead_type": None, "resident_type": None} for k in page]
+    return campaign_audience
+
+
+def test_rpc_pages_stop_at_the_daily_cap(monkeypatch, supabase):
+    monkeypatch.setattr(audience, "FETCH_PAGE", 100)
+    supabase.rpcs["campaign_audience"] = _campaign_audience(range(9015550000, 9015551000), sent_today=20)
+    df = fetch_audience("c1", "+19015550000", daily_cap=270, supabase=supabase, dsn="")
+    assert len(df) == 250 and df["_key"].is_monotonic_increasing and df["_key"].dtype == "int64"
+    assert [params["p_after"] for _, params in supabase.rpc_calls] == [None, 9015550099, 9015550199]
+    assert list(df.columns[:2]) == ["Phone_Number", "Full_Name"] and df["Full_Name"][0] == "N9015550000"
+    assert len(fetch_audience("c1", daily_cap=0, limit=0, supabase=supabase, dsn="")) == 0
+
+
+def test_send_campaign_from_db_dry_run(tmp_path, monkeypatch, capsys, supabase):
+    supabase.rpcs["campaign_audience"] = _campaign_audience([9015550001, 9015550002, 9015550003])
+    monkeypatch.setattr(send_campaign, "get_supabase", lambda: supabase)
+    monkeypatch.setattr(audience, "database_url", lambda: "")
+    opt = tmp_path / "opt.csv"
+    pd.DataFrame({"Phone_Number": ["901-555-0002"]}).to_csv(opt, index=False)  # a local STOP not yet in Supabase
+    send_campaign.main(["--dry-run", "--from-db", "--list", str(tmp_path / "missing.csv"), "--opt-outs", str(opt),
+                        "--suppression-index", str(tmp_path / "supp.sqlite3"),
+                        "--ledger", str(tmp_path / "ledger.sqlite3"), "--campaign", "db-test"])
+    out = capsys.readouterr().out
+    assert "campaign_audience(): 3 numbers" in out and "would send to 2 numbers" in out
+    name, params = supabase.rpc_calls[0]
+    assert params["p_campaign_id"] == "db-test" and params["p_daily_cap"] == 450
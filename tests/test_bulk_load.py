@@ -0,0 +1,53 @@
+"""Bulk loader: adaptive PostgREST batches, too-large splits and transient retries."""
+import httpx
+import pandas as pd
+import pytest
+
+import bulk_load
+from bulk_load import BulkLoader, call_with_retry
+
+
+def _flaky(max_rows):
+    """The first request times out and any batch over max_rows is rejected as too large."""
+    failed_once = []
+
+    def fail(query):
+        assert query.on_conflict == "id"
+        if not failed_once:
+            failed_once.append(True)
+            raise httpx.ReadTimeout("timed out")
+        if len(query.payload) > max_rows:
+            raise Exception({"message": "Payload Too Large", "code": "413"})
+    return fail
+
+
+@pytest.fixture(autouse=True)
+def _no_backoff(monkeypatch):
+    monkeypatch.setattr(bulk_load, "backoff", lambda attempt: 0)
+
+
+def test_postgrest_batches_split_retry_and_grow(supabase):
+    supabase.fail = _flaky(max_rows=300)
+    df = pd.DataFrame({"id": range(5000), "name": [f"n{i}" for i in range(5000)]})
+    stats = BulkLoader(supabase, dsn="", concurrency=3, initial_batch=100, max_batch=1000).load("t", df, on_conflict="id")
+    assert stats["method"] == "postgrest" and stats["rows"] == 5000 and stats["retries"] == 1
+    rows = {r["id"]: r for r in supabase.tables["t"]}
+    assert sorted(rows) == list(range(5000)) and rows[42]["name"] == "n42"
+    sizes = [b["rows"] for b in stats["batch_log"]]
+    assert max(sizes) > 100 and max(sizes) <= 300  # grew on fast batches, capped by the splits
+
+
+def test_iterator_of_dicts_and_fatal_errors(supabase):
+    supabase.fail = _flaky(max_rows=10_000)
+    stats = BulkLoader(supabase, dsn="").load("t", ({"id": i} for i in range(1234)), on_conflict="id")
+    assert stats["rows"] == 1234 and len(supabase.tables["t"]) == 1234
+
+    calls = []
+
+    def bad():
+        calls.append(1)
+        raise ValueError("duplicate key value violates unique constraint")
+
+    with pytest.raises(ValueError):
+        call_with_retry(bad)
+    assert len(calls) == 1
@@ -0,0 +1,31 @@
+"""CBC journal: --resume skips journaled addresses but retries ones whose lookup came back empty."""
+import importlib
+
+from cbc_journal import CbcJournal
+
+
+def test_resume_retries_empty_lookups(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)  # importing the script opens its log file in the working directory
+    tsla = importlib.import_module("tree_service_lead_automation")
+    monkeypatch.setattr(tsla, "human_delay", lambda *a, **k: None)
+    timed_out = {"2 Oak Ln, Germantown, TN"}  # cbc_lookup_address returns [] on a TimeoutException
+    looked_up = []
+
+    def lookup(_driver, address, parse_mode=None):
+        looked_up.append(address)
+        return [] if address in timed_out else [{"Address": address, "Phone_Number": "(901) 555-0100"}]
+
+    monkeypatch.setattr(tsla, "cbc_lookup_address", lookup)
+    addresses = ["1 Elm St, Germantown, TN", "2 Oak Ln, Germantown, TN"]
+    journal = CbcJournal(tmp_path / "journal.jsonl")
+    assert len(tsla.run_cbc_lookups(addresses, None, journal=journal)) == 1
+    journal.close()
+
+    timed_out.clear()
+    looked_up.clear()
+    journal = CbcJournal(tmp_path / "journal.jsonl", resume=True)
+    assert not journal.is_done("2 Oak Ln, Germantown, TN")
+    assert len(tsla.run_cbc_lookups(addresses, None, journal=journal)) == 1
+    assert looked_up == ["2 Oak Ln, Germantown, TN"]
+    assert len(journal.rows(addresses)) == 2
+    journal.close()
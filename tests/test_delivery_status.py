@@ -0,0 +1,79 @@
+"""Status callback ingestion: per-SID state, campaign counters and the /sms-status endpoint."""
+from inbound_sms_handler import StatusWriter, create_app
+from send_ledger import SendLedger, status_event
+
+
+def _event(sid, status, code="", campaign="spring"):
+    return status_event({"MessageSid": sid, "MessageStatus": status, "ErrorCode": code}, campaign)
+
+
+def test_counters_follow_latest_status_and_ignore_stale_events(tmp_path):
+    ledger = SendLedger(tmp_path / "ledger.sqlite3")
+    ledger.mark_queued("spring", [9015550001, 9015550002, 9015550003], "+19015550000")
+    for key, sid in ((9015550001, "SM1"), (9015550002, "SM2"), (9015550003, "SM3")):
+        ledger.record("spring", key, True, sid)
+    applied = ledger.apply_status_events([
+        _event("SM1", "sent", campaign=""),  # campaign resolved from the ledger row
+        _event("SM1", "delivered"),
+        _event("SM1", "sent"),  # late, would move it backwards
+        _event("SM1", "delivered"),  # duplicate
+        _event("SM2", "sent"),
+        _event("SM3", "undelivered", "30003"),
+    ])
+    ledger.apply_status_events([_event("SM2", "failed", "30007"), _event("SM2", "sent")])
+    assert applied == 4
+    assert ledger.delivery_counts("spring") == {"delivered": 1, "failed": 1, "undelivered": 1, "total": 3}
+    assert ledger.delivery_errors("spring") == {30003: 1, 30007: 1}
+    assert ledger.failure_rate("spring") == 2 / 3
+    assert ledger.failure_rate("spring", min_final=10) == 0.0
+    assert ledger.status_counts("spring") == {"delivered": 1, "failed": 1, "undelivered": 1}
+    ledger.close()
+
+
+def test_status_endpoint_batches_events(tmp_path):
+    ledger = SendLedger(tmp_path / "ledger.sqlite3")
+    writer = StatusWriter(ledger=ledger)
+    app = create_app(status_writer=writer)
+    client = app.test_client()
+    for i in range(50):
+        sid = f"SM{i}"
+        assert client.post("/sms-status?campaign=fall", data={"MessageSid": sid, "MessageStatus": "sent"}).status_code == 204
+        final = {"MessageStatus": "undelivered", "ErrorCode": "30005"} if i % 10 == 0 else {"MessageStatus": "delivered"}
+        client.post("/sms-status?campaign=fall", data={"MessageSid": sid, **final})
+    assert client.post("/sms-status", data={"MessageSid": "SMx", "MessageStatus": "bogus"}).status_code == 400
+    writer.stop()
+    assert writer.flushed == 100
+    body = client.get("/sms-status/fall").get_json()
+    assert body["counts"] == {"delivered": 45, "undelivered": 5, "total": 50}
+    assert body["errors"] == {"30005": 5}
+    assert body["failure_rate"] == 0.1
+    ledger.close()
+
+
+class _FlakyConn:
+    """Forwards to the ledger's connection; the third executemany (mid-transaction) fails once."""
+
+    def __init__(self, conn):
+        self.conn, self.calls = conn, 0
+
+    def executemany(self, *args):
+        self.calls += 1
+        if self.calls == 3:
+            raise OSError("disk I/O error")
+        return self.conn.executemany(*args)
+
+    def __getattr__(self, name):
+        return getattr(self.conn, name)
+
+
+def test_failed_status_batch_is_retried_without_drifting_counters(tmp_path):
+    ledger = SendLedger(tmp_path / "ledger.sqlite3")
+    ledger.conn = _FlakyConn(ledger.conn)
+    writer = StatusWriter(ledger=ledger, flush_interval=0.05, retry_interval=0.05).start()
+    for i in range(10):
+        writer.submit(_event(f"SM{i}", "undelivered", "30003") if i < 2 else _event(f"SM{i}", "delivered"))
+    writer.stop()
+    assert (writer.failures, writer.flushed) == (1, 10)
+    assert ledger.delivery_counts("spring") == {"delivered": 8, "undelivered": 2, "total": 10}
+    assert ledger.delivery_errors("spring") == {30003: 2}
+    ledger.close()
@@ -0,0 +1,98 @@
+"""Inbound replies: one CSV row per phone, and batched writes that survive errors and flush on stop."""
+import threading
+import time
+
+import pandas as pd
+import pytest
+
+import inbound_sms_handler as inbound
+from inbound_sms_handler import ReplyWriter
+
+
+@pytest.fixture
+def data_dir(tmp_path, monkeypatch):
+    monkeypatch.setenv("INBOUND_DATA_DIR", str(tmp_path))
+    monkeypatch.setattr(inbound, "_indexes", {})  # process-wide indexes point at the old dir otherwise
+    yield tmp_path
+    for idx in inbound._indexes.values():
+        idx.close()
+
+
+def _phones(path):
+    return list(pd.read_csv(path, dtype=str)["Phone_Number"]) if path.exists() else []
+
+
+def _fails(n):
+    left = [n]
+
+    def fail(query):
+        if left[0]:
+            left[0] -= 1
+            raise ConnectionError("supabase down")
+    return fail
+
+
+@pytest.mark.parametrize("existing_csv", [False, True])
+def test_duplicate_replies_write_one_row(data_dir, existing_csv):
+    opt_csv, warm_csv = data_dir / "opt_outs.csv", data_dir / "warm_leads.csv"
+    if existing_csv:  # written by an earlier process, no index yet: the STOP phone is already in it
+        pd.DataFrame({"Phone_Number": ["9015550009", "9015550001"], "Date": "2026-10-01",
+                      "Source": "SMS reply"}).to_csv(opt_csv, index=False)
+        pd.DataFrame({"Phone_Number": ["9015550008"], "First_Reply_Text": "yes"}).reindex(
+            columns=inbound.WARM_LEAD_FIELDS).to_csv(warm_csv, index=False)
+
+    # Duplicate STOPs and warm replies, several arriving at once on the threaded server
+    replies = [("+19015550001", "STOP"), ("(901) 555-0002", "Yes please call me")] * 8
+    threads = [threading.Thread(target=inbound.handle_inbound, args=r) for r in replies]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    inbound.handle_inbound("901-555-0001", "stop")
+    assert not inbound.append_opt_out("9015550001") and not inbound.append_warm_lead("9015550002", "yes")
+
+    assert _phones(opt_csv) == (["9015550009", "9015550001"] if existing_csv else ["9015550001"])
+    assert _phones(warm_csv) == (["9015550008", "9015550002"] if existing_csv else ["9015550002"])
+
+
+def test_batched_replies_survive_errors_and_flush_on_stop(data_dir, monkeypatch, supabase):
+    real_append = inbound._append_rows
+    failures = {"n": 1}
+
+    def flaky_append(path, fields, rows):
+        if failures["n"]:
+            failures["n"] -= 1
+            raise OSError("disk full")
+        real_append(path, fields, rows)
+
+    monkeypatch.setattr(inbound, "_append_rows", flaky_append)
+    supabase.fail = _fails(1)
+    writer = ReplyWriter(batch_size=100, flush_interval=0.05, retry_interval=0.05, supabase=supabase).start()
+    for _ in range(3):
+        writer.submit("opt_out", "9015550001", "STOP")
+    writer.submit("warm_lead", "9015550002", "yes please")
+    deadline = time.monotonic() + 5
+    while writer.flushed < 4:
+        assert time.monotonic() < deadline, "batch was not retried"
+        time.sleep(0.02)
+    # The failed CSV append rolled the index back, so the retry still wrote the STOP; the failed
+    # Supabase insert was redone without appending the CSV twice
+    assert writer.failures == 2
+    assert _phones(data_dir / "opt_outs.csv") == ["9015550001"]
+    assert _phones(data_dir / "warm_leads.csv") == ["9015550002"]
+    assert [r["phone_number"] for r in supabase.tables["opt_outs"]] == ["9015550001"]
+    assert [r["phone_number"] for r in supabase.tables["warm_leads"]] == ["9015550002"]
+
+    # Queued replies still waiting for their batch are written by stop()
+    writer.flush_interval, writer.batch_size = 60, 10_000
+    writer.submit("opt_out", "9015550003", "unsubscribe")
+    writer.stop()
+    assert _phones(data_dir / "opt_outs.csv") == ["9015550001", "9015550003"]
+    assert inbound.suppression_index().contains("9015550003")
+
+
+def test_stop_writes_replies_when_the_thread_never_ran(data_dir):
+    writer = ReplyWriter()  # not started: stop() drains the queue itself
+    writer.submit("opt_out", "9015550004", "STOP")
+    writer.stop()
+    assert _phones(data_dir / "opt_outs.csv") == ["9015550004"] and writer.flushed == 1
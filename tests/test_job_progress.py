@@ -0,0 +1,64 @@
+"""Live job output: bounded log buffer, progress lines, and run_job streaming while the script runs."""
+import sys
+import time
+
+import job_progress
+import worker
+from job_progress import JobOutput, LogBuffer, parse_progress
+
+
+def test_log_buffer_keeps_head_and_tail_within_cap():
+    buf = LogBuffer(max_chars=1000, head_chars=200)
+    for i in range(10_000):
+        buf.add(f"line {i:05d}\n")
+    text = buf.text()
+    assert len(text) < 1100
+    assert text.startswith("line 00000\nline 00001")
+    assert text.endswith("line 09999")
+    assert f"[{buf.dropped} lines omitted]" in text and buf.dropped > 9000
+    assert len(buf.tail) < 100  # memory stays bounded too
+
+
+def test_progress_lines_fill_progress_not_the_log():
+    assert parse_progress("##progress addresses 340/1000 12 leads")["total"] == 1000
+    assert parse_progress("##progress rows 5")["total"] is None
+    assert parse_progress("progress addresses 1/2") is None
+    out = JobOutput()
+    out.add("starting\n")
+    out.add("##progress addresses 3/10\n")
+    out.add("warning: slow\n", stderr=True)
+    log, progress = out.snapshot()
+    assert log == "starting\nwarning: slow"
+    assert (progress["stage"], progress["done"], progress["total"]) == ("addresses", 3, 10)
+    assert out.error_text() == "warning: slow"
+
+
+def test_run_job_streams_output_before_the_script_exits(monkeypatch):
+    script = (
+        "import sys, time\n"
+        "for i in range(3):\n"
+        "    print(f'step {i}'); print(f'##progress items {i + 1}/3'); time.sleep(0.4)\n"
+        "print('oops', file=sys.stderr)\n"
+        "sys.exit(2)\n"
+    )
+    monkeypatch.setattr(worker, "build_cmd", lambda action, payload: [sys.executable, "-c", script])
+    monkeypatch.setattr(worker, "LOG_FLUSH_MIN_SEC", 0.05)
+    calls = []
+    t0 = time.monotonic()
+    ok, log, err = worker.run_job("j1", "run_cbc", {}, on_output=lambda log, p: calls.append((time.monotonic() - t0, log, p)))
+    assert not ok and err == "oops"
+    assert log == "step 0\nstep 1\nstep 2\noops"
+    # Progress reached the row while the script was still running, and the final report made it too
+    assert calls[0][0] < 0.6 and calls[0][2]["done"] == 1
+    assert calls[-1][2]["done"] == 3
+
+
+def test_report_progress_is_silent_outside_the_worker(monkeypatch, capsys):
+    monkeypatch.delenv(job_progress.PROGRESS_ENV, raising=False)
+    job_progress.report_progress("rows", 1, 2)
+    monkeypatch.setenv(job_progress.PROGRESS_ENV, "1")
+    for i in range(100):
+        job_progress.report_progress("rows", i, 100)
+    job_progress.report_progress("rows", 100, 100)
+    lines = capsys.readouterr().out.splitlines()
+    assert lines == ["##progress rows 0/100", "##progress rows 100/100"]
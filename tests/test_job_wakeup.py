@@ -0,0 +1,92 @@
+"""Job wakeup: adaptive poll intervals and the LISTEN thread (wake on notify, reconnect after a drop)."""
+import socket
+import threading
+import time
+
+import job_wakeup
+from job_wakeup import AdaptivePoll, JobListener
+
+
+class _Cursor:
+    def __init__(self, conn):
+        self.conn = conn
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def execute(self, sql):
+        self.conn.executed.append(sql)
+
+
+class FakeConnection:
+    """psycopg2-like connection: each byte written to .server is one notification."""
+
+    def __init__(self):
+        self.sock, self.server = socket.socketpair()
+        self.notifies = []
+        self.executed = []
+        self.closed = False
+
+    def fileno(self):
+        return self.sock.fileno()
+
+    def cursor(self):
+        return _Cursor(self)
+
+    def poll(self):
+        data = self.sock.recv(1024)
+        if not data:
+            raise ConnectionError("server closed the connection")
+        self.notifies.extend(data)
+
+    def close(self):
+        self.closed = True
+        self.sock.close()
+
+
+def _until(cond, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not cond():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.01)
+
+
+def test_adaptive_poll_backs_off_while_idle():
+    poll = AdaptivePoll(1, 8)
+    assert [poll.next(False) for _ in range(5)] == [1, 2, 4, 8, 8]
+    assert poll.next(True) == 1
+    assert poll.next(False) == 1 and poll.next(False) == 2
+
+
+def test_listener_wakes_on_notify_and_reconnects(monkeypatch):
+    monkeypatch.setattr(job_wakeup, "RECONNECT_MIN_SEC", 0.05)
+    conns = []
+
+    def connect(dsn):
+        if len(conns) == 1 and conns[0].closed:
+            conns.append(None)
+            raise ConnectionError("db down")  # first reconnect attempt fails
+        conn = FakeConnection()
+        conns.append(conn)
+        return conn
+
+    wake = threading.Event()
+    listener = JobListener("postgres://x", wake, connect=connect).start()
+    _until(listener.connected.is_set)
+    assert conns[0].executed == ["LISTEN jobs_pending"]
+    wake.clear()
+    conns[0].server.send(b"\x01\x01")
+    _until(wake.is_set)
+    _until(lambda: listener.notifications == 2)
+
+    conns[0].server.close()  # connection drops: worker falls back to polling, listener retries
+    _until(lambda: not listener.connected.is_set())
+    _until(lambda: len(conns) == 3 and listener.connected.is_set())
+    wake.clear()
+    conns[2].server.send(b"\x01")
+    _until(wake.is_set)
+    listener.stop()
+    assert conns[2].closed
@@ -0,0 +1,70 @@
+"""Parquet lead store: round trip through State/Zip partitions, partition-scoped appends, dedupe on (Address, phone)."""
+import pandas as pd
+import pytest
+
+pytest.importorskip("pyarrow")
+
+from lead_store import append_leads, export_csv, read_leads, save_leads
+
+GERMANTOWN = "1 Elm St, Germantown, TN 38138"
+SENATOBIA = "2 Oak Ln, Senatobia, MS 38668"
+
+
+def _leads(rows):
+    return pd.DataFrame(rows, columns=["Full_Name", "Address", "Phone_Number", "Phone_Type"])
+
+
+def test_round_trip_through_partitions(tmp_path):
+    store = tmp_path / "store"
+    df = _leads([
+        ("Ann Lee", GERMANTOWN, "(901) 555-0001", "Mobile"),
+        ("Ann Lee", GERMANTOWN, "901-555-0001", "Mobile"),  # same phone, other format
+        ("Bo Cox", SENATOBIA, "(662) 555-0002", "Landline"),
+        ("Cy Day", "3 Pine Rd", "(662) 555-0003", "Mobile"),  # no state / zip: null partition
+    ])
+    assert save_leads(df, store) == 3
+    parts = sorted(str(p.relative_to(store)) for p in store.rglob("*.parquet"))
+    assert parts == ["State=MS/Zip=38668/part-0.parquet", "State=TN/Zip=38138/part-0.parquet",
+                     "State=__HIVE_DEFAULT_PARTITION__/Zip=__HIVE_DEFAULT_PARTITION__/part-0.parquet"]
+
+    back = read_leads(store).sort_values("Phone_Key", ignore_index=True)
+    assert list(back["Phone_Key"]) == [6625550002, 6625550003, 9015550001]
+    assert list(back["Full_Name"]) == ["Bo Cox", "Cy Day", "Ann Lee"]
+    assert str(back["Phone_Key"].dtype) == "Int64" and str(back["Phone_Type"].dtype) == "string"
+    assert list(read_leads(store, state="tn")["Full_Name"]) == ["Ann Lee"]
+    assert list(read_leads(store, city="senatobia")["Full_Name"]) == ["Bo Cox"]
+    assert sorted(read_leads(store, phone_types="mobile|cell")["Full_Name"]) == ["Ann Lee", "Cy Day"]
+
+    out = tmp_path / "leads.csv"
+    assert export_csv(out, store, zip_code="38138") == 1
+    csv = pd.read_csv(out, dtype=str)
+    assert list(csv.columns) == ["Full_Name", "Address", "Phone_Number", "Phone_Type", "City", "State", "Zip"]
+    assert csv.iloc[0].tolist() == ["Ann Lee", GERMANTOWN, "(901) 555-0001", "Mobile", "Germantown", "TN", "38138"]
+
+
+def test_append_rewrites_only_touched_partitions(tmp_path):
+    store = tmp_path / "store"
+    save_leads(_leads([("Ann Lee", GERMANTOWN, "(901) 555-0001", "Mobile"),
+                       ("Bo Cox", SENATOBIA, "(662) 555-0002", "Mobile")]), store)
+    ms = store / "State=MS" / "Zip=38668" / "part-0.parquet"
+    before = ms.stat().st_mtime_ns
+    added = append_leads(_leads([("Ann Lee", GERMANTOWN, "9015550001", "Mobile"),  # already stored
+                                 ("Di Fox", "4 Ash Ct, Germantown, TN 38138", "(901) 555-0004", "Mobile")]), store)
+    assert added == 1
+    assert ms.stat().st_mtime_ns == before
+    assert sorted(read_leads(store)["Full_Name"]) == ["Ann Lee", "Bo Cox", "Di Fox"]
+
+
+def test_invalid_phones_at_one_address_are_kept_apart(tmp_path):
+    store = tmp_path / "store"
+    df = _leads([
+        ("Ann Lee", GERMANTOWN, "555-0101", "Mobile"),  # no area code: Phone_Key 0
+        ("Al Lee", GERMANTOWN, "555-0102", "Mobile"),
+        ("Ann Lee", GERMANTOWN, "555-0101", "Mobile"),  # true duplicate
+    ])
+    assert save_leads(df, store) == 2
+    assert append_leads(_leads([("Ed Lee", GERMANTOWN, "555-0103", "Mobile"),
+                                ("Al Lee", GERMANTOWN, "555-0102", "Mobile")]), store) == 1
+    back = read_leads(store)
+    assert sorted(back["Phone_Number"]) == ["555-0101", "555-0102", "555-0103"]
+    assert set(back["Phone_Key"]) == {0}
@@ -0,0 +1,108 @@
+"""SMS list sync: only changed rows are staged, applied in one call, and the local state is checked against the server."""
+import hashlib
+
+import pandas as pd
+import pytest
+
+from list_sync import FETCH_PAGE, list_rows, sync_sms_cell_list
+
+
+def _set_hash(supabase, value):
+    supabase.tables["list_metadata"] = [{"id": "sms_cell_list", "content_hash": value}]
+
+
+@pytest.fixture
+def supabase(supabase):
+    """apply_sms_cell_list_sync as in schema.sql: apply the staged rows, store the new content hash."""
+
+    def apply_sms_cell_list_sync(params):
+        tables = supabase.tables
+        rows = {r["phone_number"]: r for r in tables["sms_cell_list_rows"]}
+        for s in tables["sms_cell_list_stage"]:
+            if s["sync_id"] == params["p_sync_id"]:
+                if s["op"] == "delete":
+                    rows.pop(s["phone_number"], None)
+                else:
+                    rows[s["phone_number"]] = {k: v for k, v in s.items() if k not in ("sync_id", "op")}
+        tables["sms_cell_list_stage"] = []
+        tables["sms_cell_list_rows"] = list(rows.values())
+        content = ",".join(f"{p}:{rows[p]['row_hash']}" for p in sorted(rows))
+        _set_hash(supabase, hashlib.md5(content.encode()).hexdigest())
+        return tables["list_metadata"][0]["content_hash"]
+
+    supabase.rpcs["apply_sms_cell_list_sync"] = apply_sms_cell_list_sync
+    return supabase
+
+
+class _ApiError(Exception):
+    """Like postgrest's APIError: the PostgREST / SQLSTATE code on .code."""
+
+    def __init__(self, message, code):
+        super().__init__(message)
+        self.code = code
+
+
+def _sync_fails(message, code):
+    def fail(query):
+        if query.name == "apply_sms_cell_list_sync":
+            raise _ApiError(message, code)
+    return fail
+
+
+def _write(path, phones, names):
+    pd.DataFrame({"Phone_Number": phones, "Full_Name": names}).to_csv(path, index=False)
+
+
+def test_rows_are_one_per_phone_with_stable_hashes():
+    df = pd.DataFrame({"Phone_Number": ["9015550001", "9015550001", None], "Full_Name": ["A", "B", "C"]})
+    rows = list_rows(df)
+    assert list(rows["phone_number"]) == ["9015550001"] and rows["full_name"][0] == "A"
+    assert rows["row_hash"][0] == list_rows(df.head(1))["row_hash"][0]
+
+
+def test_rebuild_sends_only_the_changes(tmp_path, supabase):
+    csv, state = tmp_path / "sms.csv", tmp_path / "state.json"
+    phones = [f"90155{i:05d}" for i in range(3000)]
+    _write(csv, phones, [f"Name {i}" for i in range(3000)])
+    stats = sync_sms_cell_list(supabase, csv, state_path=state)
+    assert (stats["upserted"], stats["deleted"]) == (3000, 0)
+    assert len(supabase.tables["sms_cell_list_rows"]) == 3000
+
+    # Two renamed, one dropped, one new: four staged rows, no read of the 3000 remote hashes
+    names = [f"Name {i}" for i in range(3000)]
+    names[5], names[7] = "Renamed 5", "Renamed 7"
+    _write(csv, phones[1:] + ["9015599999"], names[1:] + ["New"])
+    supabase.calls.clear()
+    stats = sync_sms_cell_list(supabase, csv, state_path=state)
+    assert (stats["upserted"], stats["deleted"], stats["unchanged"], stats["mode"]) == (3, 1, 2997, "diff")
+    assert supabase.calls == ["list_metadata", "sms_cell_list_stage", "apply_sms_cell_list_sync"]
+    rows = {r["phone_number"]: r for r in supabase.tables["sms_cell_list_rows"]}
+    assert len(rows) == 3000 and phones[0] not in rows
+    assert rows[phones[5]]["full_name"] == "Renamed 5" and rows["9015599999"]["full_name"] == "New"
+
+    # Someone else changed the table: the local state isn't trusted, remote hashes are paged in
+    supabase.tables["sms_cell_list_rows"] = [r for r in supabase.tables["sms_cell_list_rows"] if r["phone_number"] != phones[9]]
+    _set_hash(supabase, "edited")
+    supabase.calls.clear()
+    stats = sync_sms_cell_list(supabase, csv, state_path=state)
+    assert (stats["upserted"], stats["deleted"]) == (1, 0) and stats["mode"].startswith("diff (remote")
+    assert supabase.calls.count("sms_cell_list_rows") == 2999 // FETCH_PAGE + 1
+    assert len(supabase.tables["sms_cell_list_rows"]) == 3000
+
+
+def test_only_schema_error_codes_replace_the_whole_list(tmp_path, supabase):
+    csv, state = tmp_path / "sms.csv", tmp_path / "state.json"
+    _write(csv, ["9015550001", "9015550002"], ["A", "B"])
+    sync_sms_cell_list(supabase, csv, state_path=state)
+    _write(csv, ["9015550001", "9015550003"], ["A", "C"])
+
+    # A runtime error that only mentions row_hash / the stage table must not delete the live list
+    supabase.fail = _sync_fails('null value in column "row_hash" of relation "sms_cell_list_stage"', "23502")
+    with pytest.raises(_ApiError):
+        sync_sms_cell_list(supabase, csv, state_path=state)
+    assert sorted(r["phone_number"] for r in supabase.tables["sms_cell_list_rows"]) == ["9015550001", "9015550002"]
+
+    supabase.fail = _sync_fails("Could not find the function public.apply_sms_cell_list_sync", "PGRST202")
+    stats = sync_sms_cell_list(supabase, csv, state_path=state)
+    assert stats["mode"] == "full replace"
+    assert sorted(r["phone_number"] for r in supabase.tables["sms_cell_list_rows"]) == ["9015550001", "9015550003"]
@@ -0,0 +1,50 @@
+"""
+Parser regression tests against the result pages in tests/fixtures (manifest.json). The pages are
+synthetic: hand-written to follow the live Propwire / CBC markup, not captured from the sites, so
+they catch selector regressions in page_parsers but not changes on the sites themselves.
+"""
+import pytest
+
+from page_parsers import format_phone, parse_cbc_results, parse_propwire_results, phone_type_from_text
+from parser_harness import count_regressions, extraction_counts, load_fixtures, parse_fixture
+
+FIXTURES = load_fixtures()
+
+
+@pytest.mark.parametrize("fx", FIXTURES, ids=[fx["name"] for fx in FIXTURES])
+def test_extraction_counts_do_not_drop(fx):
+    counts = extraction_counts(fx, parse_fixture(fx))
+    assert count_regressions(fx, counts) == []
+
+
+def test_cbc_rows_scoped_to_their_block():
+    fx = next(f for f in FIXTURES if f["name"] == "cbc/germantown_cards.html")
+    rows = parse_cbc_results(fx["html"], fx["address"])
+    by_name = {}
+    for r in rows:
+        by_name.setdefault(r["Full_Name"], set()).add((r["Phone_Number"], r["Phone_Type"]))
+    assert by_name["Joe E Baker"] == {("(901) 216-4993", "Mobile"), ("(901) 752-4443", "Landline")}
+    assert by_name["Karen Ed Dhilly"] == {("(901) 752-4443", "Landline")}
+    assert all(r["Address"] == fx["address"] for r in rows)
+
+
+def test_propwire_fields_and_page_order():
+    fx = next(f for f in FIXTURES if f["name"] == "propwire/germantown_cards.html")
+    rows = parse_propwire_results(fx["html"])
+    assert rows[0]["Address"] == "7038 Huntcliff Cv, Germantown, TN 38138"
+    assert rows[0]["Lead_Type"] == "High Equity; Absentee Owner"
+    assert rows[0]["Est_Value"] == "$512,300"
+    assert rows[0]["Equity_Pct"] == "72"
+    assert rows[2]["Lot_Size"] == "4,200 sq ft"
+
+
+def test_phone_helpers():
+    assert format_phone("Cell: 662.555.0143") == "(662) 555-0143"
+    assert phone_type_from_text("Wireless") == "Mobile"
+    assert phone_type_from_text("Home: 662-555-0188") == "Landline"
+    assert phone_type_from_text("662-555-0188") == "Unknown"
+
+
+def test_empty_page():
+    assert parse_cbc_results("", "x") == []
+    assert parse_propwire_results("") == []
@@ -0,0 +1,23 @@
+"""
+pytest-benchmark suite for the page parsers: one benchmark per fixture page (synthetic, see
+test_page_parsers), with rows
+extracted attached to the results (extra_info) and a failure if counts drop.
+Run: python -m pytest tests/test_parser_benchmarks.py --benchmark-columns=mean,ops,rounds
+(ops = pages/sec).
+"""
+import pytest
+
+pytest.importorskip("pytest_benchmark")
+
+from parser_harness import count_regressions, extraction_counts, load_fixtures, parse_fixture  # noqa: E402
+
+FIXTURES = load_fixtures()
+
+
+@pytest.mark.parametrize("fx", FIXTURES, ids=[fx["name"] for fx in FIXTURES])
+def test_parse_fixture_benchmark(benchmark, fx):
+    benchmark.group = fx["parser"]
+    rows = benchmark(parse_fixture, fx)
+    counts = extraction_counts(fx, rows)
+    benchmark.extra_info.update(counts)
+    assert count_regressions(fx, counts) == []
@@ -0,0 +1,125 @@
+"""Send ledger across a crashed run or a timed-out request: only numbers actually tried are skipped and counted on resume."""
+import pandas as pd
+import pytest
+import requests
+
+import send_campaign
+import sms_dispatch
+from send_ledger import SendLedger
+
+
+class _Crash(BaseException):
+    pass
+
+
+class FakeSender:
+    """Sends `fail_after` messages, then the process "dies" on the next request."""
+
+    sent = []
+
+    def __init__(self, *args, **kwargs):
+        self.fail_after = FakeSender.fail_after
+
+    def send(self, to, body):
+        if self.fail_after is not None and len(FakeSender.sent) >= self.fail_after:
+            FakeSender.crashed = True
+            raise _Crash()
+        FakeSender.sent.append(to)
+        return {"ok": True, "sid": f"SM{len(FakeSender.sent)}", "status": "queued", "http_status": 201,
+                "error_code": None, "error": "", "retryable": False, "retry_after": None, "latency_ms": 1.0}
+
+    def close(self):
+        pass
+
+
+def test_crashed_run_resumes_with_untried_numbers(tmp_path, monkeypatch):
+    phones = [f"90155500{i:02d}" for i in range(10, 20)]
+    pd.DataFrame({"Phone_Number": phones}).to_csv(tmp_path / "sms.csv", index=False)
+    monkeypatch.setattr(send_campaign, "TwilioSender", FakeSender)
+    monkeypatch.setenv("TWILIO_ACCOUNT_SID", "AC1")
+    monkeypatch.setenv("TWILIO_AUTH_TOKEN", "token")
+    monkeypatch.setenv("TWILIO_FROM", "+19015550000")
+    ledger_path = tmp_path / "ledger.sqlite3"
+    argv = ["--send", "--list", str(tmp_path / "sms.csv"), "--opt-outs", str(tmp_path / "none.csv"),
+            "--suppression-index", str(tmp_path / "supp.sqlite3"), "--ledger", str(ledger_path),
+            "--campaign", "resume", "--rate", "1000", "--concurrency", "1"]
+    FakeSender.sent, FakeSender.crashed, FakeSender.fail_after = [], False, 2
+    # After the crash the remaining messages are cancelled before their first request
+    original = send_campaign.dispatch
+    monkeypatch.setattr(send_campaign, "dispatch",
+                        lambda *a, **kw: original(*a, **{**kw, "stop": lambda: FakeSender.crashed}))
+    with pytest.raises(_Crash):
+        send_campaign.main(argv)
+
+    ledger = SendLedger(ledger_path)
+    # 2 sent + the 1 request in flight when it died; the 7 never tried are neither skipped nor counted
+    assert ledger.status_counts("resume") == {"queued": 1, "sent": 2}
+    assert ledger.remaining_today(450, "+19015550000") == 447
+    ledger.close()
+
+    FakeSender.sent, FakeSender.crashed, FakeSender.fail_after = [], False, None
+    send_campaign.main(argv)
+    assert sorted(FakeSender.sent) == ["+1" + p for p in phones[3:]]
+    ledger = SendLedger(ledger_path)
+    assert ledger.status_counts("resume") == {"queued": 1, "sent": 9}
+    assert ledger.remaining_today(450, "+19015550000") == 440
+    ledger.close()
+
+
+class _Response:
+    status_code, headers = 201, {}
+
+    def __init__(self, to):
+        self.to = to
+
+    def json(self):
+        return {"sid": "SM" + self.to[-4:], "status": "queued"}
+
+
+class _FlakySession:
+    """Stands in for TwilioSender's requests session: a read timeout for one number, no route for another."""
+
+    posted = []
+
+    def post(self, url, data, timeout):
+        _FlakySession.posted.append(data["To"])
+        if data["To"].endswith("0011"):
+            raise requests.ReadTimeout("read timed out")  # Twilio may have the message
+        if data["To"].endswith("0012"):
+            raise requests.ConnectionError("connection refused")  # never left this host
+        return _Response(data["To"])
+
+    def close(self):
+        pass
+
+
+def test_read_timeout_is_not_resent_on_resume(tmp_path, monkeypatch):
+    phones = ["9015550010", "9015550011", "9015550012"]
+    pd.DataFrame({"Phone_Number": phones}).to_csv(tmp_path / "sms.csv", index=False)
+    monkeypatch.setattr(sms_dispatch, "_backoff", lambda *a: 0)
+
+    class Sender(sms_dispatch.TwilioSender):
+        def __init__(self, *args, **kwargs):
+            super().__init__(*args, **kwargs)
+            self.session = _FlakySession()
+
+    monkeypatch.setattr(send_campaign, "TwilioSender", Sender)
+    monkeypatch.setenv("TWILIO_ACCOUNT_SID", "AC1")
+    monkeypatch.setenv("TWILIO_AUTH_TOKEN", "token")
+    monkeypatch.setenv("TWILIO_FROM", "+19015550000")
+    ledger_path = tmp_path / "ledger.sqlite3"
+    argv = ["--send", "--list", str(tmp_path / "sms.csv"), "--opt-outs", str(tmp_path / "none.csv"),
+            "--suppression-index", str(tmp_path / "supp.sqlite3"), "--ledger", str(ledger_path),
+            "--campaign", "timeouts", "--rate", "1000", "--concurrency", "1"]
+    _FlakySession.posted = []
+    send_campaign.main(argv)
+    assert _FlakySession.posted.count("+19015550011") == 1  # not retried within the run either
+    ledger = SendLedger(ledger_path)
+    assert ledger.status_counts("timeouts") == {"failed": 1, "queued": 1, "sent": 1}
+    assert ledger.remaining_today(450, "+19015550000") == 448  # the timed-out send counts
+    ledger.close()
+
+    # Resume: only the number whose request never got out is tried again
+    _FlakySession.posted = []
+    send_campaign.main(argv)
+    assert set(_FlakySession.posted) == {"+19015550012"}
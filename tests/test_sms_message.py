@@ -0,0 +1,40 @@
+"""Encoding detection, segment counts, GSM-7 substitutions and vectorized rendering."""
+import random
+
+import pandas as pd
+
+from send_campaign import DEFAULT_MESSAGE
+from sms_message import (GSM_BASIC, GSM_EXTENSION, encoding, gsm_safe, gsm_safe_series, render,
+                         segment_counts, segments, summarize)
+
+
+def test_segment_boundaries():
+    assert [segments("a" * n) for n in (160, 161, 306, 307)] == [1, 2, 2, 3]
+    assert [segments("–" * n) for n in (70, 71, 134, 135)] == [1, 2, 2, 3]
+    # Extension characters cost two septets and an escape pair never straddles two parts
+    assert segments("^" * 80) == 1 and segments("^" * 81) == 2
+    assert segments("a" + "^" * 80) == 2 and segments("a" * 152 + "^" + "a" * 10) == 2
+    assert segments("😀" * 35) == 1 and segments("😀" * 36) == 2  # surrogate pairs
+
+
+def test_default_message_becomes_single_gsm_segment():
+    message = DEFAULT_MESSAGE.format(company="Tree Service")
+    assert encoding(message) == "UCS-2" and segments(message) == 2
+    safe = gsm_safe(message)
+    assert encoding(safe) == "GSM-7" and segments(safe) == 1
+    assert gsm_safe("“Café” — naïve") == '"Café" - naive'  # é is GSM-7, ï is not
+
+
+def test_vectorized_render_and_counts_match_scalar():
+    df = pd.DataFrame({"Full_Name": ["José Ruiz", None, "ANN LEE  "]})
+    bodies = render("Hi {Full_Name}, {company} here – ok?", df, company="Tree Co")
+    assert list(bodies) == ["Hi José Ruiz, Tree Co here – ok?", "Hi , Tree Co here – ok?", "Hi ANN LEE, Tree Co here – ok?"]
+    assert list(gsm_safe_series(bodies)) == [b.replace("–", "-") for b in bodies]
+
+    rng = random.Random(1)
+    alphabet = GSM_BASIC + GSM_EXTENSION + "–é😀"
+    bodies = pd.Series(["".join(rng.choice(alphabet) for _ in range(rng.randrange(1, 400))) for _ in range(2000)])
+    assert (segment_counts(bodies) == bodies.map(segments)).all()
+    summary = summarize(bodies, price_per_segment=0.01)
+    assert summary["segments"] == int(bodies.map(segments).sum())
+    assert abs(summary["cost"] - summary["segments"] * 0.01) < 1e-9
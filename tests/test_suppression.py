@@ -0,0 +1,77 @@
+"""Suppression index: CSV copies are merged incrementally (offset + prefix CRC), re-read in full when rewritten."""
+import os
+
+import pandas as pd
+
+import send_campaign
+from suppression import SuppressionIndex
+
+
+def _write(path, phones, mode="w"):
+    with open(path, mode, newline="") as f:
+        if mode == "w":
+            f.write("Phone_Number,Date,Source\n")
+        f.writelines(f"{p},2026-10-18,SMS reply\n" for p in phones)
+
+
+def _spy(idx):
+    """Record how many rows each sync_csv() hands to add_many()."""
+    reads, add_many = [], idx.add_many
+    idx.add_many = lambda phones, **kw: reads.append(len(phones)) or add_many(phones, **kw)
+    return reads
+
+
+def test_sync_reads_only_the_appended_tail(tmp_path):
+    csv = tmp_path / "opt_outs.csv"
+    _write(csv, ["9015550001", "9015550002", "9015550003"])
+    idx = SuppressionIndex(tmp_path / "supp.sqlite3")
+    reads = _spy(idx)
+    assert idx.sync_csv(csv) == 3
+    assert idx.sync_csv(csv) == 0 and reads == [3]  # unchanged file: not read at all
+
+    _write(csv, ["9015550004", "(901) 555-0001"], mode="a")  # one new, one already known
+    assert idx.sync_csv(csv) == 1 and reads == [3, 2]
+
+    # A half-written row is left for the next sync
+    with open(csv, "a") as f:
+        f.write("90155500")
+    assert idx.sync_csv(csv) == 0
+    with open(csv, "a") as f:
+        f.write("05,2026-10-18,SMS reply\n")
+    assert idx.sync_csv(csv) == 1 and reads == [3, 2, 1]
+    assert sorted(idx.keys()) == [9015550001 + i for i in range(5)]
+    idx.close()
+
+
+def test_truncated_or_rewritten_file_is_read_in_full(tmp_path):
+    csv = tmp_path / "opt_outs.csv"
+    _write(csv, ["9015550001", "9015550002", "9015550003"])
+    idx = SuppressionIndex(tmp_path / "supp.sqlite3")
+    reads = _spy(idx)
+    idx.sync_csv(csv)
+
+    _write(csv, ["9015550009"])  # shorter than the synced offset
+    assert idx.sync_csv(csv) == 1 and reads == [3, 1]
+
+    # Same size, new content (and mtime): the prefix CRC no longer matches, so the whole file is read
+    size = csv.stat().st_size
+    _write(csv, ["9015550007"])
+    os.utime(csv, ns=(csv.stat().st_atime_ns, csv.stat().st_mtime_ns + 10**9))
+    assert csv.stat().st_size == size
+    assert idx.sync_csv(csv) == 1 and reads == [3, 1, 1]
+
+    # Rewritten with more rows than before: the old prefix changed too, so nothing is skipped
+    _write(csv, ["9015550008", "9015550007", "9015550006"])
+    assert idx.sync_csv(csv) == 2 and reads == [3, 1, 1, 3]
+    assert idx.contains("9015550001") and idx.contains("9015550006")  # the index keeps the union
+    idx.close()
+
+
+def test_dry_run_creates_no_ledger_or_index(tmp_path, capsys):
+    pd.DataFrame({"Phone_Number": ["9015550001", "9015550002"]}).to_csv(tmp_path / "sms.csv", index=False)
+    _write(tmp_path / "opt.csv", ["9015550002"])
+    ledger, index = tmp_path / "ledger.sqlite3", tmp_path / "supp.sqlite3"
+    send_campaign.main(["--list", str(tmp_path / "sms.csv"), "--opt-outs", str(tmp_path / "opt.csv"),
+                        "--suppression-index", str(index), "--ledger", str(ledger), "--campaign", "dry"])
+    assert "would send to 1 numbers" in capsys.readouterr().out  # opt-outs still excluded
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["opt.csv", "sms.csv"]
@@ -0,0 +1,41 @@
+"""opt_outs export: keyset pages, only new rows fetched and appended, full re-export when the table drifts."""
+import pandas as pd
+
+import table_export
+from table_export import OPT_OUTS, export_table
+
+
+def _row(i, minute):
+    return {"id": f"{i:08d}", "phone_number": f"90155{i:05d}", "date": f"2026-10-18T12:{minute:02d}:00+00:00",
+            "source": None}
+
+
+def _phones(path):
+    return list(pd.read_csv(path, dtype=str)["Phone_Number"])
+
+
+def test_export_fetches_only_new_rows(tmp_path, monkeypatch, supabase):
+    monkeypatch.setattr(table_export, "FETCH_PAGE", 100)
+    csv, state = tmp_path / "opt.csv", {}
+    supabase.tables["opt_outs"] = [_row(i, 0) for i in range(250)]  # one bulk insert: same timestamp
+    stats = export_table(supabase, OPT_OUTS, csv, state)
+    assert (stats["mode"], stats["rows"], stats["pages"]) == ("full", 250, 3)
+    assert len(set(_phones(csv))) == 250 and pd.read_csv(csv)["Source"][0] == "SMS reply"
+
+    # 150 rows at a new time plus one batched reply stamped before the watermark
+    supabase.tables["opt_outs"] += [_row(i, 30) for i in range(1000, 1150)] + [_row(2000, 0)]
+    before = csv.read_bytes()
+    stats = export_table(supabase, OPT_OUTS, csv, state)
+    assert (stats["mode"], stats["new"], stats["rows"]) == ("incremental", 151, 401)
+    assert csv.read_bytes().startswith(before)  # appended: the suppression index reads only the tail
+    assert sorted(_phones(csv)) == sorted(r["phone_number"] for r in supabase.tables["opt_outs"])
+
+    # Nothing new: the lookback window is re-read but no row is added twice
+    supabase.requests = 0
+    stats = export_table(supabase, OPT_OUTS, csv, state)
+    assert (stats["new"], stats["rows"], supabase.requests) == (0, 401, 3)  # 2 pages in the window + count
+
+    # A deleted opt-out (or a row outside the window) breaks the count: full re-export
+    del supabase.tables["opt_outs"][0]
+    stats = export_table(supabase, OPT_OUTS, csv, state)
+    assert (stats["mode"], stats["rows"]) == ("full", 400) and len(_phones(csv)) == 400
@@ -0,0 +1,52 @@
+"""Warm job execution: entry-point mapping, mtime-invalidated caches, and jobs run in a reused pool process."""
+import os
+import sys
+
+import pandas as pd
+
+import file_cache
+import worker
+from warm_pool import REPO_ROOT, WarmPool, entry_point
+
+
+def test_entry_point_maps_python_scripts_only():
+    assert entry_point([sys.executable, str(REPO_ROOT / "scripts" / "send_campaign.py"), "--dry-run"]) == (
+        "send_campaign", ["--dry-run"])
+    assert entry_point([sys.executable, str(REPO_ROOT / "parse_quality_leads.py")]) == ("parse_quality_leads", [])
+    assert entry_point(["/usr/bin/env", "bash", str(REPO_ROOT / "run_cbc_only.sh")]) is None
+    assert entry_point([sys.executable, "-c", "print(1)"]) is None
+
+
+def test_read_csv_cached_rereads_changed_file(tmp_path):
+    path = tmp_path / "list.csv"
+    path.write_text("Phone_Number\n9015550001\n")
+    first = file_cache.read_csv_cached(path)
+    first["extra"] = 1  # callers get a copy
+    assert list(file_cache.read_csv_cached(path).columns) == ["Phone_Number"]
+    path.write_text("Phone_Number\n9015550001\n9015550002\n")
+    os.utime(path, ns=(1, 1))  # a different mtime even on coarse clocks
+    assert len(file_cache.read_csv_cached(path)) == 2
+
+
+def test_dry_runs_reuse_a_warm_process(tmp_path, monkeypatch):
+    sms_list = tmp_path / "sms.csv"
+    pd.DataFrame({"Phone_Number": ["9015550001", "9015550002"], "Full_Name": ["A", "B"]}).to_csv(sms_list, index=False)
+    argv = ["--dry-run", "--list", str(sms_list), "--opt-outs", str(tmp_path / "none.csv"),
+            "--suppression-index", str(tmp_path / "supp.sqlite3"), "--ledger", str(tmp_path / "ledger.sqlite3"),
+            "--campaign", "warm-test"]
+    script = [sys.executable, str(REPO_ROOT / "scripts" / "send_campaign.py")]
+    monkeypatch.setattr(worker, "build_cmd", lambda action, payload: script + argv + payload.get("extra", []))
+    pool = WarmPool(size=1, preload=("pandas", "send_campaign"))
+    try:
+        ok, log, err = worker.run_job("j1", "send_campaign_dry_run", {}, warm=pool)
+        assert ok and "would send to 2 numbers" in log, err
+        pids = {p.process.pid for p in pool._idle}
+        pd.DataFrame({"Phone_Number": ["9015550003"]}).to_csv(sms_list, index=False)
+        os.utime(sms_list, ns=(1, 1))
+        ok, log, err = worker.run_job("j2", "send_campaign_dry_run", {}, warm=pool)
+        assert ok and "would send to 1 numbers" in log, err
+        assert {p.process.pid for p in pool._idle} == pids  # same process, cache saw the new list
+        ok, log, err = worker.run_job("j3", "send_campaign_dry_run", {"extra": ["--bogus"]}, warm=pool)
+        assert not ok and "unrecognized arguments: --bogus" in err
+    finally:
+        pool.close()
@@ -0,0 +1,189 @@
+"""Worker JobPool: per-lane limits, conflicts and requeue on shutdown, against an in-memory jobs table."""
+import sys
+import threading
+import time
+
+import worker
+from worker import JobPool, claim_pending_job
+
+
+def _sleep_cmd(seconds):
+    return [sys.executable, "-c", f"import time; time.sleep({seconds}); print('done')"]
+
+
+def _run_pool(pool, supabase, until, timeout=10):
+    deadline = time.monotonic() + timeout
+    while not until():
+        assert time.monotonic() < deadline, "jobs did not finish"
+        if pool.has_capacity():
+            job, claimed = claim_pending_job(supabase, pool.can_run)
+            if claimed:
+                pool.start(job)
+                continue
+        pool.wake.wait(0.05)
+        pool.wake.clear()
+
+
+def test_short_jobs_are_not_blocked_by_a_long_one(monkeypatch, supabase):
+    durations = {"run_cbc": 1.5, "send_campaign_dry_run": 0.2, "build_sms_list": 0.2}
+    monkeypatch.setattr(worker, "build_cmd", lambda action, payload: _sleep_cmd(durations[action]))
+    monkeypatch.setattr(worker, "export_opt_outs_and_warm_leads", lambda *a: None)
+    jobs = [{"id": "cbc1", "action": "run_cbc"}, {"id": "cbc2", "action": "run_cbc"}]
+    jobs += [{"id": f"dry{i}", "action": "send_campaign_dry_run"} for i in range(3)]
+    jobs += [{"id": "build", "action": "build_sms_list"}]
+    for j in jobs:
+        j.update(status="pending", payload={})
+    supabase.tables["jobs"] = jobs
+    finished = {}
+    real_set = worker.set_job_result
+
+    def record(sb, job_id, success, log, error, worker_id=None):
+        finished[job_id] = time.monotonic()
+        real_set(sb, job_id, success, log, error, worker_id)
+
+    monkeypatch.setattr(worker, "set_job_result", record)
+    pool = JobPool(supabase, max_jobs=4)
+    t0 = time.monotonic()
+    _run_pool(pool, supabase, lambda: len(finished) == len(jobs))
+    assert all(j["status"] == "success" for j in jobs)
+    # Dry runs ran in parallel next to the first run_cbc; the build waited only for them, not for run_cbc
+    assert all(finished[f"dry{i}"] - t0 < 0.8 for i in range(3))
+    assert finished["build"] - t0 < 1.2
+    # run_cbc is serialized
+    assert finished["cbc2"] - finished["cbc1"] >= 1.4
+
+
+def test_shutdown_requeues_running_jobs(monkeypatch, supabase):
+    monkeypatch.setattr(worker, "build_cmd", lambda action, payload: _sleep_cmd(30))
+    monkeypatch.setattr(worker, "export_opt_outs_and_warm_leads", lambda *a: None)
+    jobs = [{"id": "cbc", "action": "run_cbc", "status": "pending", "payload": {}},
+            {"id": "send", "action": "send_campaign", "status": "pending", "payload": {"campaign_id": "c1"}}]
+    supabase.tables["jobs"] = jobs
+    pool = JobPool(supabase)
+    _run_pool(pool, supabase, lambda: len(pool.running) == 2)
+    time.sleep(0.2)
+    t0 = time.monotonic()
+    pool.shutdown(timeout=0.3, force=threading.Event())
+    assert time.monotonic() - t0 < 5
+    assert [j["status"] for j in jobs] == ["pending", "pending"]
+    assert jobs[0]["payload"] == {"resume": True} and jobs[1]["payload"] == {"campaign_id": "c1"}
+
+
+def test_claim_rpc_gets_conflicts_and_full_lanes(monkeypatch, supabase):
+    monkeypatch.setattr(worker, "build_cmd", lambda action, payload: _sleep_cmd(30))
+    monkeypatch.setattr(worker, "export_opt_outs_and_warm_leads", lambda *a: None)
+    queue = [{"id": "cbc", "action": "run_cbc", "payload": {}}, {"id": "build", "action": "build_sms_list", "payload": {}}]
+
+    def claim_job(params):
+        return [dict(queue.pop(0), status="running", worker_id=params["p_worker_id"])] if queue else []
+
+    supabase.rpcs["claim_job"] = claim_job
+    pool = JobPool(supabase, worker_id="w1")
+    pool.start(pool.claim())
+    pool.start(pool.claim())
+    assert pool.claim() is None
+    name, params = supabase.rpc_calls[-1]
+    assert name == "claim_job" and params["p_worker_id"] == "w1"
+    assert params["p_exclude_actions"] == ["send_campaign", "send_campaign_dry_run"]
+    assert params["p_blocked_lanes"] == ["build_sms_list", "run_cbc"]
+    pool.shutdown(timeout=0, force=threading.Event())
+
+
+def test_job_whose_lease_was_reaped_is_stopped_without_a_result(monkeypatch, supabase):
+    monkeypatch.setattr(worker, "build_cmd", lambda action, payload: _sleep_cmd(30))
+    job = {"id": "cbc", "action": "run_cbc", "payload": {}, "status": "running", "worker_id": "w1",
+           "lease_expires_at": "2026-01-01T00:00:00Z", "attempts": 1}
+    # Another worker's reaper requeued it and a third worker claimed it
+    supabase.tables["jobs"] = [dict(job, worker_id="w2")]
+    supabase.rpcs["heartbeat_jobs"] = lambda params: []
+    pool = JobPool(supabase, worker_id="w1")
+    pool.start(job)
+    while pool.running and pool.running["cbc"]["proc"] is None:
+        time.sleep(0.01)
+    pool.heartbeat()
+    assert supabase.rpc_calls[-1] == ("heartbeat_jobs", {"p_worker_id": "w1", "p_job_ids": ["cbc"], "p_lease_seconds": 120})
+    pool.wake.wait(5)
+    assert not pool.running
+    assert supabase.tables["jobs"][0]["status"] == "running" and supabase.tables["jobs"][0]["worker_id"] == "w2"
+    pool.shutdown(timeout=0, force=threading.Event())
+
+
+_SEND_SCRIPT = """
+import sys, time
+sys.path.insert(0, {scripts!r})
+import send_campaign
+
+class Sender:  # Twilio stand-in: each request takes `delay` seconds, then logs the number
+    def __init__(self, *args, **kwargs):
+        pass
+
+    def send(self, to, body):
+        time.sleep(float(sys.argv[1]))
+        with open({log!r}, "a") as f:
+            f.write(to + "\\n")
+        return {{"ok": True, "sid": "SM" + to, "status": "queued", "http_status": 201, "error_code": None,
+                "error": "", "retryable": False, "retry_after": None, "latency_ms": 1.0}}
+
+    def close(self):
+        pass
+
+send_campaign.TwilioSender = Sender
+send_campaign.main(["--send", "--list", {list!r}, "--opt-outs", {tmp!r} + "/none.csv",
+                    "--suppression-index", {tmp!r} + "/supp.sqlite3", "--ledger", {ledger!r},
+                    "--campaign", "c1", "--rate", "1000", "--concurrency", "1"])
+"""
+
+
+def test_requeued_send_after_kill_sends_only_untried_numbers(tmp_path, monkeypatch, supabase):
+    import pandas as pd
+    from send_ledger import SendLedger
+
+    phones = [f"90155500{i:02d}" for i in range(10, 30)]
+    pd.DataFrame({"Phone_Number": phones}).to_csv(tmp_path / "sms.csv", index=False)
+    log, ledger = tmp_path / "sent.txt", tmp_path / "ledger.sqlite3"
+    script = tmp_path / "send.py"
+    script.write_text(_SEND_SCRIPT.format(scripts=str(worker.REPO_ROOT / "scripts"), log=str(log),
+                                          list=str(tmp_path / "sms.csv"), tmp=str(tmp_path), ledger=str(ledger)))
+    for name, value in (("TWILIO_ACCOUNT_SID", "AC1"), ("TWILIO_AUTH_TOKEN", "t"), ("TWILIO_FROM", "+19015550000")):
+        monkeypatch.setenv(name, value)
+    delay = {"s": "0.1"}
+    monkeypatch.setattr(worker, "build_cmd", lambda action, payload: [sys.executable, str(script), delay["s"]])
+    monkeypatch.setattr(worker, "export_opt_outs_and_warm_leads", lambda *a: None)
+    jobs = [{"id": "send", "action": "send_campaign", "status": "pending", "payload": {"campaign_id": "c1"}}]
+    supabase.tables["jobs"] = jobs
+
+    pool = JobPool(supabase)
+    _run_pool(pool, supabase, lambda: log.exists() and len(log.read_text().split()) >= 3)
+    pool.shutdown(timeout=0, force=threading.Event())  # killed mid-campaign and requeued
+    assert jobs[0]["status"] == "pending"
+    first = log.read_text().split()
+    assert 3 <= len(first) < len(phones)
+
+    delay["s"] = "0"
+    pool = JobPool(supabase)
+    _run_pool(pool, supabase, lambda: jobs[0]["status"] == "success")
+    sent = log.read_text().split()
+    counts = SendLedger(ledger).status_counts("c1")
+    assert len(sent) == len(set(sent))  # nobody texted twice
+    # Everyone got a message except at most the one request in flight when the job was killed
+    assert counts.get("queued", 0) <= 1 and len(sent) + counts.get("queued", 0) == len(phones)
+    assert counts["sent"] == len(sent)
+
+
+def test_send_lane_is_the_one_stored_on_the_job(monkeypatch, supabase):
+    monkeypatch.setattr(worker, "build_cmd", lambda action, payload: _sleep_cmd(30))
+    monkeypatch.setattr(worker, "export_opt_outs_and_warm_leads", lambda *a: None)
+    monkeypatch.setenv("TWILIO_FROM", "+19015550000")  # this worker's default; the job was stamped for the app's
+    queue = [{"id": "s1", "action": "send_campaign", "payload": {}, "lane": "send:+16625550000"}]
+
+    def claim_job(params):
+        return [dict(queue.pop(0), status="running", worker_id=params["p_worker_id"])] if queue else []
+
+    supabase.rpcs["claim_job"] = claim_job
+    pool = JobPool(supabase, worker_id="w1")
+    pool.start(pool.claim())
+    assert pool.claim() is None
+    assert supabase.rpc_calls[-1][1]["p_blocked_lanes"] == ["send:+16625550000"]
+    assert not pool.can_run({"id": "s2", "action": "send_warm_lead_message", "payload": {}, "lane": "send:+16625550000"})
+    assert pool.can_run({"id": "s3", "action": "send_warm_lead_message", "payload": {}, "lane": "send:+19015550000"})
+    pool.shutdown(timeout=0, force=threading.Event())
@@ -10,6 +10,7 @@ Heavy automation may trigger IP blocks; consider proxies/VPN for large-scale run
 """
 
 import argparse
+import csv
 import logging
 import os
 from typing import Dict, List
@@ -17,6 +18,7 @@ import random
 import re
 import secrets
 import string
+import sys
 import time
 from pathlib import Path
 
@@ -36,6 +38,14 @@ from selenium.webdriver.support import expected_conditions as EC
 from selenium.webdriver.support.ui import WebDriverWait
 from webdriver_manager.chrome import ChromeDriverManager
 
+# Shared helpers live in scripts/ (address_utils, phone_utils)
+sys.path.insert(0, str(Path(__file__).resolve().parent / "scripts"))
+from address_utils import ADDRESS_COLUMNS, add_address_columns  # noqa: E402
+from cbc_cache import CbcCache
+from cbc_journal import CbcJournal
+from job_progress import report_progress
+from page_parsers import PROPWIRE_COLUMNS, parse_cbc_results, parse_propwire_results
+
 # ---------------------------------------------------------------------------
 # Constants
 # ---------------------------------------------------------------------------
@@ -53,6 +63,11 @@ HUMAN_DELAY_MAX = 8
 CBC_DELAY_MIN = 5
 CBC_DELAY_MAX = 15
 BATCH_SIZE_CBC = 50
+CBC_CACHE_DB = "cbc_cache.sqlite3"  # per-address lookup cache (see cbc_cache.py)
+CBC_CACHE_TTL_DAYS = 30
+CBC_CACHE_MAX_ENTRIES = 50000
+CBC_JOURNAL = "cbc_journal.jsonl"  # finished addresses of the current run (see --resume)
+CBC_PARSE_MODES = ("snapshot", "dom")  # snapshot: one page_source + lxml; dom: per-element chromedriver calls
 TARGET_LEADS_DEFAULT = 1000
 
 # User-Agent rotation (common desktop Chrome UAs)
@@ -160,6 +175,19 @@ def get_driver(headless: bool = True, stealth: bool = False, debugger_address: s
         raise
 
 
+RECORD_PAGES_DIR = None  # set by --record-pages; saved pages become parser fixtures (tests/fixtures)
+
+
+def record_page(kind: str, page_html: str, label: str = "") -> str:
+    """Return page_html unchanged; when RECORD_PAGES_DIR is set, also save it as <kind>/<time>_<label>.html."""
+    if RECORD_PAGES_DIR:
+        dest = Path(RECORD_PAGES_DIR) / kind
+        dest.mkdir(parents=True, exist_ok=True)
+        slug = re.sub(r"[^A-Za-z0-9]+", "_", label).strip("_")[:60]
+        (dest / ("%d_%s.html" % (time.time() * 1000, slug))).write_text(page_html, encoding="utf-8")
+    return page_html
+
+
 def retry_on_failure(func, *args, max_attempts=MAX_RETRIES, **kwargs):
     """Execute func with retries on exception."""
     last_err = None
@@ -319,8 +347,11 @@ def propwire_search_and_scrape(
     """
     Search Propwire for target area, apply filters, paginate, and collect addresses.
     Creates account and logs in if needed. Returns list of full addresses.
+    Each results page is parsed from one page_source snapshot and its new rows are appended
+    to a .partial file as we go; it replaces PROPWIRE_ADDRESSES_CSV once any rows exist,
+    even if the scrape fails part-way.
     """
-    addresses = []
+    seen: Dict[str, Dict] = {}  # address -> row; insertion-ordered, O(1) dedupe
     base = "https://propwire.com"
     driver.get(base)
     human_delay(4, 7)
@@ -404,65 +435,59 @@ def propwire_search_and_scrape(
         pass
 
     # Paginate and scrape table rows (or cards)
-    page = 1
-    while len(addresses) < min_leads:
-        human_delay(2, 5)
-        wait = WebDriverWait(driver, WAIT_TIMEOUT)
-        # Table rows: adjust selectors per site (Inspect → copy selector for result rows)
-        rows = driver.find_elements(
-            By.CSS_SELECTOR,
-            "table tbody tr, [data-testid='result-row'], .search-result-row, .property-row, .listing-row, [class*='ResultRow'], [class*='result-row']",
-        )
-        if not rows:
-            # Card-style results
-            rows = driver.find_elements(
-                By.CSS_SELECTOR,
-                "[class*='property-card'], [class*='listing-card'], [class*='result-card'], article",
-            )
-        for row in rows:
+    partial_path = Path(PROPWIRE_ADDRESSES_CSV + ".partial")
+    out = open(partial_path, "w", newline="", encoding="utf-8")
+    writer = csv.DictWriter(out, fieldnames=PROPWIRE_COLUMNS, extrasaction="ignore")
+    writer.writeheader()
+    try:
+        page = 1
+        while len(seen) < min_leads:
+            human_delay(2, 5)
+            # Rows/cards: adjust XPaths in page_parsers.py per site (Inspect → copy selector for result rows)
+            new_rows = []
+            for row in parse_propwire_results(record_page("propwire", driver.page_source, "page%d" % page)):
+                if row["Address"] in seen:
+                    continue
+                seen[row["Address"]] = row
+                new_rows.append(row)
+                if len(seen) >= min_leads:
+                    break
+            writer.writerows(new_rows)
+            out.flush()
+            logger.info("Propwire page %d: %d new addresses (%d total).", page, len(new_rows), len(seen))
+            if len(seen) >= min_leads:
+                break
+            # Next page
             try:
-                # Address often in first link or first column or data attribute
-                addr_el = row.find_element(
-                    By.CSS_SELECTOR,
-                    "a[href*='property'], a[href*='listing'], td:first-child, [class*='address'], [class*='Address']",
+                next_btn = driver.find_element(
+                    By.XPATH,
+                    "//a[contains(.,'Next')] | //button[contains(.,'Next')] | //li[@class='next']/a | //a[@aria-label='Next']",
                 )
-                addr_text = addr_el.text.strip()
-                if addr_text and len(addr_text) > 5 and addr_text not in addresses:
-                    addresses.append(addr_text)
-                    if len(addresses) >= min_leads:
-                        break
+                next_btn.click()
+                page += 1
+                human_delay(3, 6)
             except NoSuchElementException:
-                pass
-        if len(addresses) >= min_leads:
-            break
-        # Next page
-        try:
-            next_btn = driver.find_element(
-                By.XPATH,
-                "//a[contains(.,'Next')] | //button[contains(.,'Next')] | //li[@class='next']/a | //a[@aria-label='Next']",
-            )
-            next_btn.click()
-            page += 1
-            human_delay(3, 6)
-        except NoSuchElementException:
-            logger.info("No more Propwire pages at page %d.", page)
-            break
-
-    # Save raw addresses
-    df = pd.DataFrame({"Address": addresses})
-    df.to_csv(PROPWIRE_ADDRESSES_CSV, index=False)
-    logger.info("Saved %d addresses to %s", len(addresses), PROPWIRE_ADDRESSES_CSV)
-    return addresses
+                logger.info("No more Propwire pages at page %d.", page)
+                break
+    finally:
+        out.close()
+        if seen:
+            os.replace(partial_path, PROPWIRE_ADDRESSES_CSV)
+            logger.info("Saved %d addresses to %s", len(seen), PROPWIRE_ADDRESSES_CSV)
+        else:
+            partial_path.unlink()
+    return list(seen)
 
 
 # ---------------------------------------------------------------------------
 # Cyber Background Checks: address lookup
 # ---------------------------------------------------------------------------
-def cbc_lookup_address(driver, address: str) -> List[Dict]:
+def cbc_lookup_address(driver, address: str, parse_mode: str = "snapshot") -> List[Dict]:
     """
     Look up one address on Cyber Background Checks. Returns list of dicts
     with keys: Full_Name, Address, Phone_Number, Phone_Type.
-    Only includes mobile/cell in returned list.
+    parse_mode "snapshot" parses one driver.page_source in-process (page_parsers.parse_cbc_results);
+    "dom" uses the older per-element find_elements parsing.
     """
     results = []
     url = "https://www.cyberbackgroundchecks.com/"
@@ -504,6 +529,18 @@ def cbc_lookup_address(driver, address: str) -> List[Dict]:
         return results
 
     # Parse results page: names, phones, phone types
+    if parse_mode == "snapshot":
+        try:
+            return parse_cbc_results(record_page("cbc", driver.page_source, address), address)
+        except Exception as e:
+            logger.debug("CBC parse error for %s: %s", address[:40], e)
+            return results
+    return cbc_parse_dom(driver, address)
+
+
+def cbc_parse_dom(driver, address: str) -> List[Dict]:
+    """Parse the current CBC results page via live find_elements calls (one chromedriver round trip each)."""
+    results = []
     try:
         # Containers: //div[contains(@class,'result')] or similar
         blocks = driver.find_elements(
@@ -551,15 +588,55 @@ def cbc_lookup_address(driver, address: str) -> List[Dict]:
     return results
 
 
-def run_cbc_lookups(addresses: List[str], driver, batch_size: int = BATCH_SIZE_CBC) -> List[Dict]:
-    """Run CBC lookups for all addresses; return list of lead dicts (mobile only)."""
+def run_cbc_lookups(
+    addresses: List[str],
+    driver,
+    batch_size: int = BATCH_SIZE_CBC,
+    cache: CbcCache = None,
+    cache_only: bool = False,
+    max_age_sec: float = None,
+    journal: CbcJournal = None,
+    parse_mode: str = "snapshot",
+) -> List[Dict]:
+    """
+    Run CBC lookups for all addresses; return list of lead dicts (mobile only).
+    With cache, addresses looked up within the TTL (or max_age_sec) are served from disk
+    without navigating or pacing; cache_only skips uncached addresses instead of fetching.
+    With journal, each address with results is appended as soon as it completes and addresses
+    already in the journal (a resumed run) are skipped; empty results are looked up again.
+    """
     all_leads = []
+    hits = fetched = skipped = 0
+    if journal is not None:
+        before = len(addresses)
+        addresses = [a for a in addresses if not journal.is_done(a)]
+        if before != len(addresses):
+            logger.info("Resuming: %d of %d addresses already journaled, %d left.", before - len(addresses), before, len(addresses))
     for i, addr in enumerate(addresses):
+        report_progress("addresses", i, len(addresses))
         if (i + 1) % batch_size == 0:
             logger.info("CBC batch %d/%d completed.", (i + 1) // batch_size, (len(addresses) + batch_size - 1) // batch_size)
-        leads = retry_on_failure(cbc_lookup_address, driver, addr)
+        cached = cache.get(addr, max_age_sec=max_age_sec) if cache is not None else None
+        if cached is not None:
+            if journal is not None:
+                journal.record(addr, cached)
+            all_leads.extend(cached)
+            hits += 1
+            continue
+        if cache_only:
+            skipped += 1
+            continue
+        leads = retry_on_failure(cbc_lookup_address, driver, addr, parse_mode=parse_mode)
+        if cache is not None:
+            cache.put(addr, leads)
+        if journal is not None:
+            journal.record(addr, leads)
         all_leads.extend(leads)
+        fetched += 1
         human_delay(CBC_DELAY_MIN, CBC_DELAY_MAX)
+    report_progress("addresses", len(addresses), len(addresses), f"{len(all_leads)} leads")
+    if cache is not None:
+        logger.info("CBC lookups: %d from cache, %d fetched, %d skipped (not cached).", hits, fetched, skipped)
     return all_leads
 
 
@@ -575,7 +652,9 @@ def post_process_and_save(leads: List[Dict], output_path: str = FINAL_LEADS_CSV)
     if df.empty:
         return
     df = df.drop_duplicates(subset=["Address", "Phone_Number"], keep="first")
-    cols = [c for c in ["Full_Name", "Address", "Phone_Number", "Phone_Type"] if c in df.columns]
+    # Parse City/State/Zip once here so location filters downstream are column comparisons
+    add_address_columns(df, "Address")
+    cols = [c for c in ["Full_Name", "Address", "Phone_Number", "Phone_Type"] + ADDRESS_COLUMNS if c in df.columns]
     df[cols].to_csv(output_path, index=False)
     logger.info("Saved %d leads to %s", len(df), output_path)
 
@@ -592,16 +671,38 @@ def main():
     parser.add_argument("--addresses-csv", metavar="FILE", default="", help="Skip Propwire; load addresses from CSV (must have 'Address' column). Use when Propwire blocks automation.")
     parser.add_argument("--use-existing-browser", action="store_true", help="Attach to Chrome already open with remote debugging (you log in to Propwire there). See README.")
     parser.add_argument("--debugger-port", type=int, default=9222, help="Chrome remote-debugging port when using --use-existing-browser (default 9222)")
+    parser.add_argument("--cache-db", default=CBC_CACHE_DB, help="SQLite cache of CBC lookups (default %s)" % CBC_CACHE_DB)
+    parser.add_argument("--no-cache", action="store_true", help="Do not read or write the CBC lookup cache")
+    parser.add_argument("--cache-ttl-days", type=float, default=CBC_CACHE_TTL_DAYS, help="Re-fetch cached addresses older than this (default %d days; 0 = never expire)" % CBC_CACHE_TTL_DAYS)
+    parser.add_argument("--cache-max-entries", type=int, default=CBC_CACHE_MAX_ENTRIES, help="Evict oldest cached addresses beyond this count (default %d)" % CBC_CACHE_MAX_ENTRIES)
+    parser.add_argument("--cache-only", action="store_true", help="Use cached CBC results only; skip addresses not in the cache (no CBC requests)")
+    parser.add_argument("--refresh-older-than", type=float, metavar="DAYS", default=None, help="Re-fetch cached addresses older than DAYS (overrides --cache-ttl-days for this run)")
+    parser.add_argument("--journal", default=CBC_JOURNAL, help="Append-only journal of finished CBC lookups (default %s)" % CBC_JOURNAL)
+    parser.add_argument("--resume", action="store_true", help="Skip addresses already in the journal from an interrupted run; output is rebuilt from the journal")
+    parser.add_argument("--cbc-parse", choices=CBC_PARSE_MODES, default="snapshot", help="CBC results parsing: snapshot (one page_source, parsed in-process; default) or dom (live element queries)")
+    parser.add_argument("--record-pages", metavar="DIR", default="", help="Save every parsed Propwire/CBC results page under DIR (for offline parser fixtures)")
     args = parser.parse_args()
+    if args.cache_only and args.no_cache:
+        parser.error("--cache-only requires the cache (drop --no-cache)")
 
     logger.info("Starting tree service lead automation: %s, min_leads=%d", args.target_city, args.min_leads)
+    global RECORD_PAGES_DIR
+    RECORD_PAGES_DIR = args.record_pages or None
     driver = None
+    cache = None
+    journal = None
     try:
-        debugger_addr = ("127.0.0.1:%d" % args.debugger_port) if args.use_existing_browser else None
-        driver = get_driver(headless=not args.no_headless, stealth=args.stealth, debugger_address=debugger_addr)
+        if not args.no_cache:
+            cache = CbcCache(args.cache_db, ttl_days=args.cache_ttl_days, max_entries=args.cache_max_entries)
+            cache.evict()
+        addresses_from_csv = bool(args.addresses_csv and Path(args.addresses_csv).exists())
+        # --cache-only with an addresses CSV never touches a browser
+        if not (args.cache_only and addresses_from_csv):
+            debugger_addr = ("127.0.0.1:%d" % args.debugger_port) if args.use_existing_browser else None
+            driver = get_driver(headless=not args.no_headless, stealth=args.stealth, debugger_address=debugger_addr)
         addresses = []
 
-        if args.addresses_csv and Path(args.addresses_csv).exists():
+        if addresses_from_csv:
             logger.info("Skipping Propwire; loading addresses from %s", args.addresses_csv)
             addresses = []
             import csv as csv_mod
@@ -635,13 +736,20 @@ def main():
                 "(with an 'Address' column) and run with: --addresses-csv your_file.csv"
             )
         else:
-            leads = run_cbc_lookups(addresses, driver)
-            post_process_and_save(leads)
+            max_age_sec = args.refresh_older_than * 86400 if args.refresh_older_than is not None else None
+            journal = CbcJournal(args.journal, resume=args.resume)
+            run_cbc_lookups(addresses, driver, cache=cache, cache_only=args.cache_only, max_age_sec=max_age_sec, journal=journal, parse_mode=args.cbc_parse)
+            # Journal holds this run's rows plus any from the interrupted run being resumed
+            post_process_and_save(journal.rows(addresses))
     except RuntimeError as e:
         if "verification" in str(e).lower():
             logger.error("Exiting due to email verification requirement.")
         raise
     finally:
+        if cache is not None:
+            cache.close()
+        if journal is not None:
+            journal.close()
         if driver and not getattr(driver, "_attached", False):
             driver.quit()
         elif driver and getattr(driver, "_attached", False):